@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_remove_group_new_updates_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='captures_linked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SiteCapture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('catalog_id', models.BigIntegerField()),
+                ('acquisition_datetime', models.DateTimeField()),
+                ('cloud_cover_percent', models.FloatField(blank=True, null=True)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='site_captures', to='api.site')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['site', 'acquisition_datetime'], name='api_sitecap_site_id_52dfd3_idx')],
+                'unique_together': {('site', 'catalog_id')},
+            },
+        ),
+    ]
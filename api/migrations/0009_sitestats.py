@@ -0,0 +1,29 @@
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_site_captures_linked_at_sitecapture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteStats',
+            fields=[
+                ('site', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.site')),
+                ('acquisition_count', models.IntegerField(default=0)),
+                ('most_recent_catalog_id', models.BigIntegerField(blank=True, null=True)),
+                ('most_recent_datetime', models.DateTimeField(blank=True, null=True)),
+                ('most_recent_clear_catalog_id', models.BigIntegerField(blank=True, null=True)),
+                ('most_recent_clear_datetime', models.DateTimeField(blank=True, null=True)),
+                ('frequency', models.FloatField(default=0)),
+                ('gap', models.FloatField(default=0)),
+                ('histogram_start', models.DateField(blank=True, null=True)),
+                ('daily_histogram', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,98 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# A new group gets the ancestors of its parent plus itself
+INSERT_TRIGGER_SQL = """
+    CREATE OR REPLACE FUNCTION api_group_closure_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO api_groupclosure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1 FROM api_groupclosure WHERE descendant_id = NEW.parent_id
+        UNION ALL
+        SELECT NEW.id, NEW.id, 0;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER api_group_closure_insert AFTER INSERT ON api_group
+        FOR EACH ROW EXECUTE FUNCTION api_group_closure_insert();
+"""
+
+# A moved group takes its whole subtree along: the links to the old ancestors are dropped and the
+# subtree is linked to the new parent's ancestors. Moving a group under its own subtree is refused.
+MOVE_TRIGGER_SQL = """
+    CREATE OR REPLACE FUNCTION api_group_closure_move() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.parent_id IS NOT NULL AND EXISTS (
+            SELECT 1 FROM api_groupclosure WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+        ) THEN
+            RAISE EXCEPTION 'Group % cannot be moved under its subgroup %', NEW.id, NEW.parent_id;
+        END IF;
+
+        DELETE FROM api_groupclosure link
+        USING api_groupclosure subtree, api_groupclosure ancestors
+        WHERE subtree.ancestor_id = NEW.id
+            AND ancestors.descendant_id = NEW.id AND ancestors.depth > 0
+            AND link.ancestor_id = ancestors.ancestor_id AND link.descendant_id = subtree.descendant_id;
+
+        INSERT INTO api_groupclosure (ancestor_id, descendant_id, depth)
+        SELECT ancestors.ancestor_id, subtree.descendant_id, ancestors.depth + subtree.depth + 1
+        FROM api_groupclosure ancestors
+        CROSS JOIN api_groupclosure subtree
+        WHERE ancestors.descendant_id = NEW.parent_id AND subtree.ancestor_id = NEW.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER api_group_closure_move AFTER UPDATE OF parent_id ON api_group
+        FOR EACH ROW WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+        EXECUTE FUNCTION api_group_closure_move();
+"""
+
+# Closure of the existing groups
+BACKFILL_SQL = """
+    INSERT INTO api_groupclosure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE tree AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM api_group
+        UNION ALL
+        SELECT tree.ancestor_id, child.id, tree.depth + 1
+        FROM api_group child
+        JOIN tree ON child.parent_id = tree.descendant_id
+        WHERE tree.depth < 1000
+    )
+    SELECT ancestor_id, descendant_id, MIN(depth) FROM tree GROUP BY ancestor_id, descendant_id;
+"""
+
+DROP_TRIGGERS_SQL = """
+    DROP TRIGGER IF EXISTS api_group_closure_insert ON api_group;
+    DROP TRIGGER IF EXISTS api_group_closure_move ON api_group;
+    DROP FUNCTION IF EXISTS api_group_closure_insert();
+    DROP FUNCTION IF EXISTS api_group_closure_move();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_sitestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='api.group')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='api.group')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='api_groupcl_descend_8e4b9b_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunSQL(
+            [INSERT_TRIGGER_SQL, MOVE_TRIGGER_SQL, BACKFILL_SQL],
+            reverse_sql=DROP_TRIGGERS_SQL,
+        ),
+    ]
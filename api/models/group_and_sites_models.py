@@ -2,6 +2,8 @@ from django.contrib.gis.db import models
 from django.db import models as plane_models
 from django.utils.timezone import now
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import ValidationError
 
 
 SITE_TYPE_CHOICES = (
@@ -25,6 +27,8 @@ class Site(models.Model):
     notification = models.BooleanField(default=False)
     new_updates_count = models.IntegerField(default=0)
     last_notification_count_updated = models.DateTimeField(auto_now=True)
+    # Set once the captures intersecting the site are in SiteCapture, new captures are linked at ingest
+    captures_linked_at = models.DateTimeField(null=True, blank=True)
 
 
     def __str__(self):
@@ -50,6 +54,37 @@ class Group(plane_models.Model):
     def __str__(self):
         return self.name
 
+    def is_ancestor_of(self, group_id):
+        """True when group_id is this group or one of its subgroups, at any depth (GroupClosure)"""
+        return GroupClosure.objects.filter(ancestor_id=self.pk, descendant_id=group_id).exists()
+
+    def clean(self):
+        # The move trigger refuses a cycle too, checked here so forms report it instead of a database error
+        if self.pk and self.parent_id and self.is_ancestor_of(self.parent_id):
+            raise ValidationError({"parent": "A group cannot be moved under itself or one of its subgroups."})
+
+
+class GroupClosure(plane_models.Model):
+    # Every (ancestor, descendant) pair of the group tree, each group being its own ancestor at depth 0.
+    # Kept by triggers on api_group (migration 0010) when a group is created or its parent changes,
+    # deleting a group deletes its rows with it
+    ancestor = plane_models.ForeignKey(
+        Group, on_delete=plane_models.CASCADE, related_name="descendant_links"
+    )
+    descendant = plane_models.ForeignKey(
+        Group, on_delete=plane_models.CASCADE, related_name="ancestor_links"
+    )
+    depth = plane_models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+        indexes = [
+            plane_models.Index(fields=["descendant", "depth"]),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
 
 class GroupSite(plane_models.Model):
     group = plane_models.ForeignKey(
@@ -68,3 +103,46 @@ class GroupSite(plane_models.Model):
 
     def __str__(self):
         return f"{self.group.name} - {self.site.name}"
+
+
+class SiteCapture(plane_models.Model):
+    site = plane_models.ForeignKey(
+        Site, on_delete=plane_models.CASCADE, related_name="site_captures"
+    )
+    # CollectionCatalog id, not a foreign key: the partitioned catalog has no unique index on id alone
+    catalog_id = plane_models.BigIntegerField()
+    # Copied from the capture so counts, recency and heatmaps never go back to the catalog
+    acquisition_datetime = plane_models.DateTimeField()
+    cloud_cover_percent = plane_models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("site", "catalog_id")
+        indexes = [
+            plane_models.Index(fields=["site", "acquisition_datetime"]),
+        ]
+
+    def __str__(self):
+        return f"{self.site_id} - {self.catalog_id}"
+
+
+class SiteStats(plane_models.Model):
+    # Capture aggregates of a site, rebuilt from SiteCapture for the sites touched by each ingest chunk
+    # and for every site by the nightly compaction (core.services.site_captures.refresh_site_stats)
+    site = plane_models.OneToOneField(
+        Site, on_delete=plane_models.CASCADE, primary_key=True, related_name="stats"
+    )
+    acquisition_count = plane_models.IntegerField(default=0)
+    most_recent_catalog_id = plane_models.BigIntegerField(null=True, blank=True)
+    most_recent_datetime = plane_models.DateTimeField(null=True, blank=True)
+    most_recent_clear_catalog_id = plane_models.BigIntegerField(null=True, blank=True)
+    most_recent_clear_datetime = plane_models.DateTimeField(null=True, blank=True)
+    # Records per acquisition on the latest capture day, and days since the capture before that day
+    frequency = plane_models.FloatField(default=0)
+    gap = plane_models.FloatField(default=0)
+    # Captures per UTC day, daily_histogram[0] is histogram_start and the last entry the refresh day
+    histogram_start = plane_models.DateField(null=True, blank=True)
+    daily_histogram = ArrayField(plane_models.IntegerField(), default=list, blank=True)
+    updated_at = plane_models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for site {self.site_id}"
@@ -23,6 +23,37 @@ satellite_capture_catalog_params = [
         location=OpenApiParameter.QUERY,
         description="Number of records per page",
     ),
+    OpenApiParameter(
+        name="response_mode",
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="Set to map with source=home for a lightweight map layer: id, vendor, acquisition time, cloud cover and a simplified footprint, capped in size",
+    ),
+    OpenApiParameter(
+        name="cluster",
+        type=bool,
+        default=False,
+        location=OpenApiParameter.QUERY,
+        description="Map mode only, return record counts per grid cell instead of footprints",
+    ),
+    OpenApiParameter(
+        name="simplify_tolerance",
+        type=float,
+        location=OpenApiParameter.QUERY,
+        description="Map mode only, footprint simplification tolerance in degrees",
+    ),
+    OpenApiParameter(
+        name="cluster_grid_size",
+        type=float,
+        location=OpenApiParameter.QUERY,
+        description="Map mode only, cluster cell size in degrees",
+    ),
+    OpenApiParameter(
+        name="cursor",
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="Cursor pagination, pass an empty value for the first page then the next_cursor of the previous response. Replaces page_number, counts are only returned for the first page",
+    ),
     OpenApiParameter(
         name="vendor_id",
         type=str,
@@ -205,6 +236,27 @@ satellite_capture_catalog_params = [
 
 
 
+catalog_tile_filter_names = [
+    "start_date", "end_date", "vendor_id", "vendor_name",
+    "min_cloud_cover", "max_cloud_cover", "min_off_nadir_angle", "max_off_nadir_angle", "min_gsd", "max_gsd",
+    "user_timezone", "user_duration_type",
+    "min_azimuth_angle", "max_azimuth_angle",
+    "min_illumination_azimuth_angle", "max_illumination_azimuth_angle",
+    "min_illumination_elevation_angle", "max_illumination_elevation_angle",
+    "min_holdback_seconds", "max_holdback_seconds", "is_purchased",
+]
+
+catalog_tile_params = [
+    parameter for parameter in satellite_capture_catalog_params if parameter.name in catalog_tile_filter_names
+] + [
+    OpenApiParameter(
+        name="wkt_polygon",
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="Only draw records intersecting this WKT polygon",
+    ),
+]
+
 calendar_params = [
     OpenApiParameter(
         name="vendor_id",
@@ -40,7 +40,7 @@ class SatelliteCaptureCatalogListSerializer(serializers.ModelSerializer):
     nearest_site = serializers.JSONField(required=False)
     class Meta:
         model = CollectionCatalog
-        exclude = ["location_polygon", "created_at", "updated_at", "metadata"]
+        exclude = ["location_polygon", "created_at", "updated_at", "acquisition_minute_of_day"]
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -187,8 +187,25 @@ class UpdateGroupSerializer(serializers.Serializer):
     name = serializers.CharField()
     notification = serializers.BooleanField(default=False)
     is_deleted = serializers.BooleanField(default=False)
+    parent = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate_parent(self, value):
+        """
+        Moving a group under itself or one of its subgroups would make a cycle, refused with a 400
+        before the save reaches the closure trigger
+        """
+        if value is None:
+            return value
+        # Only under one of the user's own groups, another user's tree would list and delete the group with it
+        if not Group.objects.filter(id=value, user__id=self.context.get("user_id"), is_deleted=False).exists():
+            raise serializers.ValidationError("Invalid parent group ID")
+        if self.instance and self.instance.is_ancestor_of(value):
+            raise serializers.ValidationError("A group cannot be moved under itself or one of its subgroups.")
+        return value
 
     def update(self, instance, validated_data):
+        if "parent" in validated_data:
+            instance.parent_id = validated_data.pop("parent")
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
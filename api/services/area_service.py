@@ -1,12 +1,14 @@
 from django.contrib.gis.geos import GEOSGeometry
-from core.models import CollectionCatalog, time_ranges
+from core.models import CollectionCatalog, CollectionCatalogMetadata, time_ranges
 from shapely.geometry import shape
 from logging_module import logger
-from django.contrib.gis.geos import Point
+from django.contrib.gis.geos import Point, Polygon
 from django.contrib.gis.measure import D
 from django.core.paginator import Paginator
 from django.db.models import Q
 from core.utils import s3, bucket_name
+from api.services.catalog_cache_service import get_catalog_cache_key
+from api.services.catalog_filters import CatalogFilterSpec
 from typing import List
 from datetime import datetime, timedelta, time
 from api.serializers.area_serializer import NewestInfoSerializer, OldestInfoSerializer
@@ -20,11 +22,29 @@ from pyproj import Geod
 from api.services.vendor_service import *
 from api.models import Site, GroupSite
 import math
-from django.contrib.gis.db.models.functions import Distance
-from django.db.models import Count
+from django.contrib.gis.db.models.functions import Distance, AsGeoJSON, Centroid, SnapToGrid, GeoFunc
+from django.db.models import Count, Case, When, Value, IntegerField, Max
 from django.db.models.functions import TruncDate
-from itertools import chain
 import pytz
+import json
+import base64
+from django.db import connection
+from django.core.cache import cache
+
+MAP_MAX_RECORDS = config("MAP_MAX_RECORDS", default=5000, cast=int)
+MAP_SIMPLIFY_TOLERANCE = config("MAP_SIMPLIFY_TOLERANCE", default=0.001, cast=float)  # Degrees
+MAP_CLUSTER_GRID_SIZE = config("MAP_CLUSTER_GRID_SIZE", default=0.5, cast=float)  # Degrees
+MAP_GEOJSON_PRECISION = 5
+TILE_MAX_ZOOM = 22
+TILE_MAX_FEATURES = config("TILE_MAX_FEATURES", default=20000, cast=int)
+TILE_CACHE_SECONDS = config("TILE_CACHE_SECONDS", default=3600, cast=int)
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+
+class SimplifyPreserveTopology(GeoFunc):
+    function = "ST_SimplifyPreserveTopology"
+    geom_param_pos = (0,)
 
 def get_area_from_polygon_wkt(polygon_wkt: str):
     logger.info("Inside get area from WKT service")
@@ -61,28 +81,180 @@ def convert_geojson_to_wkt(geometry):
         logger.error(f"Error converting GeoJSON to WKT: {str(e)}")
         return {"data": [], "status_code": 400, "error": f"Error: {str(e)}"}
     
-def get_utc_time_range(time_period, user_timezone):
-    # Get user's timezone object
-    user_tz = pytz.timezone(user_timezone)
+def encode_catalog_cursor(record, sort_by, sort_order):
+    """Opaque cursor pointing right after record in the (capture tier, sort value, id) ordering."""
+    value = getattr(record, sort_by) if sort_by else None
+    cursor = {
+        "sort_by": sort_by,
+        "sort_order": sort_order,
+        "tier": record.capture_tier,
+        "value": value.isoformat() if isinstance(value, datetime) else value,
+        "id": record.id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_catalog_cursor(cursor, sort_by, sort_order):
+    """Decode a cursor from encode_catalog_cursor, raises ValueError when it does not match the requested sort."""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        tier, value, record_id = int(decoded["tier"]), decoded["value"], int(decoded["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if decoded.get("sort_by") != sort_by or decoded.get("sort_order") != sort_order:
+        raise ValueError("Cursor does not match the requested sort_by and sort_order")
+
+    if sort_by and value is not None:
+        value = CollectionCatalog._meta.get_field(sort_by).to_python(value)
+    return tier, value, record_id
+
+
+def get_catalog_keyset_filter(cursor_values, sort_by, sort_order, has_tiers):
+    """
+    Records strictly after the cursor position, matching the order_by of get_satellite_records.
+    Postgres sorts NULLs last ascending and first descending, a null sort value is handled for both.
+    """
+    tier, value, record_id = cursor_values
+    is_asc = sort_order == "asc"
+    after = "gt" if is_asc else "lt"
+    id_after = Q(**{f"id__{after}": record_id})
+
+    if sort_by and sort_order:
+        if value is None:
+            same_tier = Q(**{f"{sort_by}__isnull": True}) & id_after
+            if not is_asc:
+                same_tier |= Q(**{f"{sort_by}__isnull": False})
+        else:
+            same_tier = Q(**{f"{sort_by}__{after}": value}) | (Q(**{sort_by: value}) & id_after)
+            if is_asc:
+                same_tier |= Q(**{f"{sort_by}__isnull": True})
+    else:
+        same_tier = id_after
 
-    # Get current date in the user's timezone
-    local_now = datetime.now(user_tz).date()
+    if has_tiers:
+        return Q(capture_tier__gt=tier) | (Q(capture_tier=tier) & same_tier)
+    return same_tier
 
-    # Define start time in local timezone
-    start_hour, end_hour = time_ranges[time_period]
-    start_time = user_tz.localize(datetime.combine(local_now, time(start_hour, 0)))
 
-    # Handle overnight case (crosses midnight)
-    if time_period == "overnight":
-        end_time = user_tz.localize(datetime.combine(local_now + timedelta(days=1), time(end_hour, 0)))
+def get_satellite_map_records(captures, cluster=False, simplify_tolerance=None, cluster_grid_size=None):
+    """
+    Lightweight map layer for captures, a queryset already filtered and ordered by get_satellite_records.
+
+    Footprints are simplified and encoded as GeoJSON by PostGIS and only the fields drawn on the map are
+    selected, at most MAP_MAX_RECORDS records. With cluster, records are grouped by their footprint
+    centroid snapped to a grid of cluster_grid_size degrees and one point per cell is returned instead.
+    """
+    if cluster:
+        grid_size = float(cluster_grid_size or MAP_CLUSTER_GRID_SIZE)
+        cells = (
+            captures.order_by()
+            .annotate(cell=SnapToGrid(Centroid("location_polygon"), grid_size))
+            .values("cell")
+            .annotate(count=Count("id"), latest_acquisition_datetime=Max("acquisition_datetime"))
+            .order_by("-count")
+        )[:MAP_MAX_RECORDS + 1]
+        data = [
+            {
+                "longitude": cell["cell"].x,
+                "latitude": cell["cell"].y,
+                "count": cell["count"],
+                "latest_acquisition_datetime": cell["latest_acquisition_datetime"],
+            }
+            for cell in cells
+        ]
     else:
-        end_time = user_tz.localize(datetime.combine(local_now, time(end_hour, 0)))
+        tolerance = float(simplify_tolerance or MAP_SIMPLIFY_TOLERANCE)
+        records = captures.annotate(
+            footprint=AsGeoJSON(SimplifyPreserveTopology("location_polygon", tolerance), precision=MAP_GEOJSON_PRECISION)
+        ).values(
+            "id", "vendor_name", "vendor_id", "acquisition_datetime", "cloud_cover_percent", "footprint"
+        )[:MAP_MAX_RECORDS + 1]
+        data = []
+        for record in records:
+            record["footprint"] = json.loads(record["footprint"]) if record["footprint"] else None
+            data.append(record)
+
+    is_truncated = len(data) > MAP_MAX_RECORDS
+    return data[:MAP_MAX_RECORDS], is_truncated
+
+
+def build_satellite_records_filters(filter_spec: CatalogFilterSpec = None, **filter_params):
+    """
+    Base catalog queryset (date range) and Q filters of a catalog search, shared by the list and tile endpoints.
+    Takes a CatalogFilterSpec, or its keyword arguments to build one.
+    """
+    filter_spec = filter_spec or CatalogFilterSpec(**filter_params)
+    captures = CollectionCatalog.objects.filter(filter_spec.get_date_filters())
+    return captures, filter_spec.get_filters()
 
-    # Convert to UTC
-    start_time_utc = start_time.astimezone(pytz.utc).hour
-    end_time_utc = end_time.astimezone(pytz.utc).hour
 
-    return start_time_utc, end_time_utc
+def get_tile_bounds(z, x, y):
+    """WGS84 (min_lon, min_lat, max_lon, max_lat) of a web mercator tile."""
+    n = 2 ** z
+    min_lon = x / n * 360 - 180
+    max_lon = (x + 1) / n * 360 - 180
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def get_catalog_tile(z: int, x: int, y: int, filter_spec: CatalogFilterSpec):
+    """
+    Catalog footprints of one web mercator tile as a Mapbox Vector Tile (ST_AsMVT), layer "catalog".
+
+    Takes the same filters as get_satellite_records as a CatalogFilterSpec. At most TILE_MAX_FEATURES
+    records are drawn per tile, newest first. Tiles are cached per filter set, the generation of the
+    filtered vendors is part of the key so new records show up as soon as they are committed.
+    """
+    logger.info("Inside get catalog tile service")
+    try:
+        if not 0 <= z <= TILE_MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            return {"data": "Invalid tile coordinates", "status_code": 400}
+
+        cache_key = get_catalog_cache_key("tile", {"z": z, "x": x, "y": y}, filter_spec)
+        tile = cache.get(cache_key)
+        if tile is not None:
+            return {"data": tile, "status_code": 200, "cached": True}
+
+        captures, filters = build_satellite_records_filters(filter_spec)
+        tile_polygon = Polygon.from_bbox(get_tile_bounds(z, x, y))
+        tile_polygon.srid = 4326
+        records = (
+            captures.filter(filters & Q(location_polygon__bboverlaps=tile_polygon))
+            .order_by("-acquisition_datetime")
+            .values("id", "vendor_name", "vendor_id", "acquisition_datetime", "cloud_cover_percent", "location_polygon")
+        )[:TILE_MAX_FEATURES]
+        records_sql, records_params = records.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT ST_AsMVT(tile.*, 'catalog', {MVT_EXTENT}, 'geom') FROM (
+                    SELECT
+                        ST_AsMVTGeom(
+                            ST_Transform(records.location_polygon, 3857),
+                            ST_TileEnvelope(%s, %s, %s), {MVT_EXTENT}, {MVT_BUFFER}, true
+                        ) AS geom,
+                        records.id,
+                        records.vendor_name,
+                        records.vendor_id,
+                        EXTRACT(EPOCH FROM records.acquisition_datetime)::bigint AS acquisition_timestamp,
+                        records.cloud_cover_percent
+                    FROM ({records_sql}) AS records
+                ) AS tile;
+                """,
+                [z, x, y, *records_params],
+            )
+            row = cursor.fetchone()
+
+        tile = bytes(row[0]) if row and row[0] is not None else b""
+        cache.set(cache_key, tile, TILE_CACHE_SECONDS)
+        return {"data": tile, "status_code": 200, "cached": False}
+
+    except Exception as e:
+        logger.error(f"Error fetching catalog tile: {str(e)}")
+        return {"data": str(e), "status_code": 400, "error": f"Error: {str(e)}"}
 
 
 def get_satellite_records(
@@ -120,204 +292,138 @@ def get_satellite_records(
     min_holdback_seconds: int = None,
     max_holdback_seconds: int = None,
     is_purchased: bool = False,
+    cursor: str = None,
+    response_mode: str = None,
+    cluster: bool = False,
+    simplify_tolerance: float = None,
+    cluster_grid_size: float = None,
+    filter_spec: CatalogFilterSpec = None,
 ):
     logger.info("Inside get satellite records service")
     start_time = datetime.now()
 
     try:
-
-        if start_date and end_date:
-            captures = CollectionCatalog.objects.filter(
-                acquisition_datetime__gte=start_date,
-                acquisition_datetime__lte=end_date,
-            )
-        else:
-            captures = CollectionCatalog.objects.all()
-        filters = Q()
+        captures, filters = build_satellite_records_filters(
+            filter_spec,
+            start_date=start_date,
+            end_date=end_date,
+            wkt_polygon=wkt_polygon,
+            latitude=latitude,
+            longitude=longitude,
+            distance=distance,
+            vendor_id=vendor_id,
+            vendor_name=vendor_name,
+            min_cloud_cover=min_cloud_cover,
+            max_cloud_cover=max_cloud_cover,
+            min_off_nadir_angle=min_off_nadir_angle,
+            max_off_nadir_angle=max_off_nadir_angle,
+            min_gsd=min_gsd,
+            max_gsd=max_gsd,
+            user_timezone=user_timezone,
+            user_duration_type=user_duration_type,
+            min_azimuth_angle=min_azimuth_angle,
+            max_azimuth_angle=max_azimuth_angle,
+            min_illumination_azimuth_angle=min_illumination_azimuth_angle,
+            max_illumination_azimuth_angle=max_illumination_azimuth_angle,
+            min_illumination_elevation_angle=min_illumination_elevation_angle,
+            max_illumination_elevation_angle=max_illumination_elevation_angle,
+            min_holdback_seconds=min_holdback_seconds,
+            max_holdback_seconds=max_holdback_seconds,
+            is_purchased=is_purchased,
+        )
 
         if sort_by and sort_by == "cloud_cover":
             sort_by = "cloud_cover_percent"
 
         polygon_area = None
 
-        if latitude and longitude and distance:
-            latitude, longitude, distance = float(latitude), float(longitude), float(distance)
-            filters &= Q(
-                location_polygon__distance_lte=(
-                    Point(longitude, latitude, srid=4326),
-                    D(km=distance),
-                )
-            )
-
-        if min_azimuth_angle is not None and max_azimuth_angle is not None:
-            min_azimuth_angle, max_azimuth_angle = float(min_azimuth_angle), float(max_azimuth_angle) 
-            logger.debug(f"Azimuth angle filters: {min_azimuth_angle} to {max_azimuth_angle}")
-            azimuth_angle_filters = Q(azimuth_angle__gte=min_azimuth_angle, azimuth_angle__lte=max_azimuth_angle)
-            filters &= azimuth_angle_filters
-
-            if min_azimuth_angle == -1:
-                filters |= Q(azimuth_angle__isnull=True)
-
-        if min_illumination_azimuth_angle is not None and max_illumination_azimuth_angle is not None:
-            min_illumination_azimuth_angle, max_illumination_azimuth_angle = float(min_illumination_azimuth_angle), float(max_illumination_azimuth_angle)
-            logger.debug(f"Illumination azimuth angle filters: {min_illumination_azimuth_angle} to {max_illumination_azimuth_angle}")
-            illumination_azimuth_angle_filters = Q(illumination_azimuth_angle__gte=min_illumination_azimuth_angle, illumination_azimuth_angle__lte=max_illumination_azimuth_angle)
-            filters &= illumination_azimuth_angle_filters
-
-            if min_illumination_azimuth_angle == -1:
-                filters |= Q(illumination_azimuth_angle__isnull=True)
-
-        if min_illumination_elevation_angle is not None and max_illumination_elevation_angle is not None:
-            min_illumination_elevation_angle, max_illumination_elevation_angle = float(min_illumination_elevation_angle), float(max_illumination_elevation_angle)
-            logger.debug(f"Illumination elevation angle filters: {min_illumination_elevation_angle} to {max_illumination_elevation_angle}")
-            illumination_elevation_angle_filters = Q(illumination_elevation_angle__gte=min_illumination_elevation_angle, illumination_elevation_angle__lte=max_illumination_elevation_angle)
-            filters &= illumination_elevation_angle_filters
-
-            if min_illumination_elevation_angle == -1:
-                filters |= Q(illumination_elevation_angle__isnull=True)
-
-        if min_holdback_seconds is not None and max_holdback_seconds is not None:
-            min_holdback_seconds, max_holdback_seconds = int(min_holdback_seconds), int(max_holdback_seconds)
-            min_holdback_seconds = min_holdback_seconds * 86400
-            max_holdback_seconds = max_holdback_seconds * 86400
-
-            logger.debug(f"Holdback seconds filters: {min_holdback_seconds} to {max_holdback_seconds}")
-            holdback_seconds_filters = Q(holdback_seconds__gte=min_holdback_seconds, holdback_seconds__lte=max_holdback_seconds)
-            filters &= holdback_seconds_filters
-
-        if isinstance(is_purchased, bool):
-            filters &= Q(is_purchased=is_purchased)
-
-
-        if user_timezone and user_duration_type:
-            selected_durations = [d.strip() for d in user_duration_type.split(",") if d.strip()]
-            time_filters = Q()
-            for duration in selected_durations:
-                start_hour_utc, end_hour_utc = get_utc_time_range(duration, user_timezone)
-                logger.debug(f"User Timezone: {user_timezone}, User Duration Type: {user_duration_type}, Start Hour: {start_hour_utc}, End Hour: {end_hour_utc}")
-                if start_hour_utc < end_hour_utc:
-                    time_filters |= Q(acquisition_datetime__time__gte=time(start_hour_utc, 0)) & Q(acquisition_datetime__time__lt=time(end_hour_utc, 0))
-                else:
-                    # Overnight case (crosses midnight)
-                    time_filters |= Q(acquisition_datetime__time__gte=time(start_hour_utc, 0)) | Q(acquisition_datetime__time__lt=time(end_hour_utc, 0))
-
-            filters &= time_filters
-
-        if vendor_name and "," in vendor_name:
-            vendor_names = vendor_name.split(",")
-            filters &= Q(vendor_name__in=vendor_names)
-        elif vendor_name:
-            filters &= Q(vendor_name=vendor_name)
-
-        if wkt_polygon:
-            # try:
-            #     area_response = get_area_from_polygon_wkt(wkt_polygon)
-            #     if area_response["status_code"] == 200:
-            #         polygon_area = area_response["data"]
-            #         if polygon_area > 1000000000:
-            #             logger.warning("Area is too large for processing")
-            #             return {"data": "Area is too large for processing", "status_code": 400}
-            #     else:
-            #         logger.warning(f"Failed to calculate area: {area_response['data']}")
-            # except Exception as e:
-            #     logger.error(f"Error calculating polygon area: {str(e)}")
-            logger.debug("Polygon WKT provided")
-            wkt_polygon_geom = GEOSGeometry(wkt_polygon)
-            filters &= Q(location_polygon__intersects=wkt_polygon_geom)
-
-                    
-        if min_cloud_cover is not None and max_cloud_cover is not None:
-            min_cloud_cover, max_cloud_cover = float(min_cloud_cover), float(max_cloud_cover)
-            logger.debug(f"Cloud cover filters: {type(min_cloud_cover)} to {type(max_cloud_cover)}")
-            cloud_cover_filters = (
-                Q(~Q(vendor_name__in=[ 'capella', 'skyfi-umbra']), cloud_cover_percent__gte=min_cloud_cover, cloud_cover_percent__lte=max_cloud_cover)
-            )
-
-            if min_cloud_cover == -1:
-                cloud_cover_filters |= Q(vendor_name__in=["capella", "skyfi-umbra"])
-
-            filters &= cloud_cover_filters
-
-        if min_off_nadir_angle is not None and max_off_nadir_angle is not None:
-            logger.debug(f"Sun elevation filters: {min_off_nadir_angle} to {max_off_nadir_angle}")
-            min_off_nadir_angle, max_off_nadir_angle = float(min_off_nadir_angle), float(max_off_nadir_angle)
-            sun_elevation_filters = Q(sun_elevation__gte=min_off_nadir_angle, sun_elevation__lte=max_off_nadir_angle)
-            filters &= sun_elevation_filters
-
-        if min_gsd is not None and max_gsd is not None:
-            logger.debug(f"GSD filters: {min_gsd} to {max_gsd}")
-            min_gsd, max_gsd = float(min_gsd), float(max_gsd)
-            gsd_filters = Q(gsd__gte=min_gsd, gsd__lte=max_gsd)
-            filters &= gsd_filters
-
-        if vendor_id:
-            filters &= Q(vendor_id=vendor_id)
-
-        # Prioritized records first
-        focused_captures = []
+        # Focused records first, then records in the zoomed area, then the rest, ranked in one query
+        capture_tiers = []
+        focused_ids = []
         if focused_records_ids:
             try:
                 focused_ids = [int(id.strip()) for id in focused_records_ids.split(",")]
-                focused_captures = captures.filter(id__in=focused_ids)
-
-                focused_captures = (
-                        focused_captures.order_by(sort_by)
-                        if sort_order == "asc"
-                        else focused_captures.order_by(f"-{sort_by}")
-                    )
-
-                logger.debug(f"Focused Records IDs: {focused_ids}, Found {len(focused_captures)} records")
+                capture_tiers.append(When(id__in=focused_ids, then=Value(0)))
+                logger.debug(f"Focused Records IDs: {focused_ids}")
             except Exception as e:
                 logger.error(f"Error processing focused record IDs: {str(e)}")
                 return {"data": str(e), "status_code": 400}
 
-        zoomed_captures = []
         if zoomed_wkt:
             try:
                 zoomed_geom = GEOSGeometry(zoomed_wkt)
-                zoomed_filters = filters & Q(location_polygon__intersects=zoomed_geom)
-                zoomed_captures = captures.filter(zoomed_filters).exclude(id__in=[record.id for record in focused_captures])
-
-                if sort_by and sort_order:
-                    zoomed_captures = (
-                        zoomed_captures.order_by(sort_by)
-                        if sort_order == "asc"
-                        else zoomed_captures.order_by(f"-{sort_by}")
-                    )
-
-                logger.debug(f"Zoomed WKT matches {len(zoomed_captures)} records")
+                capture_tiers.append(When(location_polygon__intersects=zoomed_geom, then=Value(1)))
             except Exception as e:
                 logger.error(f"Error processing zoomed WKT: {str(e)}")
                 return {"data": str(e), "status_code": 400}
 
-        excluded_ids = [record.id for record in zoomed_captures] + [record.id for record in focused_captures]
-        print(filters)
-        captures = captures.filter(filters).exclude(id__in=excluded_ids)
-        if sort_by and sort_order:
-            captures = (
-                        captures.order_by(sort_by)
-                        if sort_order == "asc"
-                        else captures.order_by(f"-{sort_by}")
-                    )
+        # Focused records are returned whatever the other filters are
+        if focused_ids and filters:
+            filters |= Q(id__in=focused_ids)
 
-        regular_captures_count = captures.count()                
-        
-        if focused_captures:
-            combined_captures = list(chain(focused_captures, zoomed_captures, captures))
-        elif zoomed_captures:
-            combined_captures = list(chain(zoomed_captures, captures))
-        else:
-            combined_captures = list(captures)
+        captures = captures.filter(filters).annotate(
+            capture_tier=Case(*capture_tiers, default=Value(2), output_field=IntegerField())
+        )
+
+        # Without focused or zoomed records every row is in the same tier, leave it out so the sort can use its index
+        ordering = ["capture_tier"] if capture_tiers else []
+        if sort_by and sort_order:
+            ordering.append(sort_by if sort_order == "asc" else f"-{sort_by}")
+        ordering.append("id" if sort_order == "asc" else "-id")
+        captures = captures.order_by(*ordering)
 
         if source == "home" and not vendor_id:
             if not wkt_polygon or (latitude and longitude and distance):
                 return {"data": "Please provide a valid polygon or latitude, longitude, and distance", "status_code": 400}
 
-            total_records = len(combined_captures)
-            final_response = combined_captures
+            if response_mode == "map":
+                data, is_truncated = get_satellite_map_records(captures, cluster, simplify_tolerance, cluster_grid_size)
+                logger.info("Satellite map records fetched successfully")
+                return {
+                    "data": data,
+                    "is_clustered": bool(cluster),
+                    "is_truncated": is_truncated,
+                    "max_records": MAP_MAX_RECORDS,
+                    "time_taken": str(datetime.now() - start_time),
+                    "status_code": 200,
+                }
+
+        # Cursor mode: an empty cursor starts from the first record, counts are only computed for that first page
+        next_cursor = None
+        total_records = zoomed_captures_count = focused_captures_count = regular_captures_count = None
+        if not cursor:
+            tier_counts = captures.aggregate(
+                total_records=Count("id"),
+                focused_captures_count=Count("id", filter=Q(capture_tier=0)),
+                zoomed_captures_count=Count("id", filter=Q(capture_tier=1)),
+            )
+            total_records = tier_counts["total_records"]
+            zoomed_captures_count = tier_counts["zoomed_captures_count"]
+            focused_captures_count = tier_counts["focused_captures_count"]
+            regular_captures_count = total_records - zoomed_captures_count - focused_captures_count
+            logger.debug(f"Focused: {focused_captures_count}, Zoomed: {zoomed_captures_count}, Regular: {regular_captures_count}")
+
+        if cursor is not None:
+            if cursor:
+                try:
+                    cursor_values = decode_catalog_cursor(cursor, sort_by, sort_order)
+                except ValueError as e:
+                    return {"data": str(e), "status_code": 400}
+                captures = captures.filter(get_catalog_keyset_filter(cursor_values, sort_by, sort_order, bool(capture_tiers)))
+
+            page_size = int(page_size)
+            page = list(captures[:page_size + 1])
+            if len(page) > page_size:
+                page = page[:page_size]
+                next_cursor = encode_catalog_cursor(page[-1], sort_by, sort_order)
+
+        if source == "home" and not vendor_id:
+            final_response = page if cursor is not None else list(captures)
         else:
-            paginator = Paginator(combined_captures, page_size)
-            page = paginator.get_page(page_number)
+            if cursor is None:
+                paginator = Paginator(captures, page_size)
+                paginator.count = total_records  # Already counted above, the page itself is a LIMIT/OFFSET query
+                page = paginator.get_page(page_number)
 
             proxy_urls = {}
             missing_images = [
@@ -376,8 +482,6 @@ def get_satellite_records(
 
                 final_response.append(record)
 
-            total_records = paginator.count
-
         if vendor_id and len(final_response) == 1:
             first_record = final_response[0]
             latitude = first_record.location_polygon.centroid.y
@@ -398,14 +502,15 @@ def get_satellite_records(
         # Success response
         logger.info("Satellite records fetched successfully")
         return {
-            "zoomed_captures_count": len(zoomed_captures),
-            "focused_captures_count": len(focused_captures),
+            "zoomed_captures_count": zoomed_captures_count,
+            "focused_captures_count": focused_captures_count,
             "regular_captures_count": regular_captures_count,
             "data": final_response,
             "polygon_area_km2": polygon_area,
             "time_taken": str(datetime.now() - start_time),
             "total_records": total_records,
-            "page_number": page_number if source != "home" else None,
+            "next_cursor": next_cursor,
+            "page_number": page_number if source != "home" and cursor is None else None,
             "page_size": page_size if source != "home" else None,
             "status_code": 200,
         }
@@ -440,6 +545,19 @@ def get_presigned_url_by_vendor_name_and_id(record:List[dict]):
         return {"data": f"{str(e)}", "status_code": 400, "error": f"Error: {str(e)}"}
 
 
+def get_catalog_record_metadata(catalog_id):
+    """Raw vendor feature of one catalog record, the catalog rows themselves do not carry it"""
+    logger.info("Inside get catalog record metadata service")
+    try:
+        metadata = CollectionCatalogMetadata.objects.filter(catalog_id=catalog_id).values_list("metadata", flat=True).first()
+        if metadata is None:
+            return {"data": "Metadata not found", "status_code": 404}
+        return {"data": {"id": catalog_id, "metadata": metadata}, "status_code": 200}
+    except Exception as e:
+        logger.error(f"Error fetching catalog record metadata: {str(e)}")
+        return {"data": f"{str(e)}", "status_code": 400, "error": f"Error: {str(e)}"}
+
+
 def group_by_vendor(data):
     """
     Groups the input data by 'vendor_name' and collects IDs for each vendor.
@@ -786,8 +904,8 @@ def get_polygon_selection_acquisition_calender_days_frequency(
     max_illumination_elevation_angle: float = None,
     min_holdback_seconds: int = None,
     max_holdback_seconds: int = None,
-    is_purchased: bool = None
-
+    is_purchased: bool = None,
+    filter_spec: CatalogFilterSpec = None,
 ):
     """
     Retrieve the frequency of image captures for each calendar day in the selected area.
@@ -796,6 +914,7 @@ def get_polygon_selection_acquisition_calender_days_frequency(
         polygon_wkt (str): WKT representation of the selected area polygon.
         start_date (datetime): Start date for the acquisition range.
         end_date (datetime): End date for the acquisition range.
+        filter_spec (CatalogFilterSpec): Parsed filters, built from the other arguments when not given.
 
     Returns:
         dict: A dictionary containing the frequency of image captures for each calendar day.
@@ -806,107 +925,38 @@ def get_polygon_selection_acquisition_calender_days_frequency(
         # Start time tracking
         func_start_time = now()
 
-        # Convert WKT string to a Polygon object
-        polygon = fromstr(polygon_wkt)
+        filter_spec = filter_spec or CatalogFilterSpec(
+            start_date=start_date,
+            end_date=end_date,
+            wkt_polygon=polygon_wkt,
+            vendor_id=vendor_id,
+            vendor_name=vendor_name,
+            min_cloud_cover=min_cloud_cover,
+            max_cloud_cover=max_cloud_cover,
+            min_off_nadir_angle=min_off_nadir_angle,
+            max_off_nadir_angle=max_off_nadir_angle,
+            min_gsd=min_gsd,
+            max_gsd=max_gsd,
+            user_timezone=user_timezone,
+            user_duration_type=user_duration_type,
+            min_azimuth_angle=min_azimuth_angle,
+            max_azimuth_angle=max_azimuth_angle,
+            min_illumination_azimuth_angle=min_illumination_azimuth_angle,
+            max_illumination_azimuth_angle=max_illumination_azimuth_angle,
+            min_illumination_elevation_angle=min_illumination_elevation_angle,
+            max_illumination_elevation_angle=max_illumination_elevation_angle,
+            min_holdback_seconds=min_holdback_seconds,
+            max_holdback_seconds=max_holdback_seconds,
+            is_purchased=is_purchased,
+        )
         logger.debug(f"Polygon WKT: {polygon_wkt}")
 
-        filters = Q()
-
-        if vendor_id:
-            filters &= Q(vendor_id=vendor_id)
-
-        if vendor_name and "," in vendor_name:
-            vendor_names = vendor_name.split(",")
-            filters &= Q(vendor_name__in=vendor_names)
-        elif vendor_name:
-            filters &= Q(vendor_name=vendor_name)
-
-        if isinstance(is_purchased, bool):
-            filters &= Q(is_purchased=is_purchased)
-
-        if user_timezone and user_duration_type:
-            selected_durations = [d.strip() for d in user_duration_type.split(",") if d.strip()]
-            time_filters = Q()
-            for duration in selected_durations:
-                start_hour_utc, end_hour_utc = get_utc_time_range(duration, user_timezone)
-                logger.debug(f"User Timezone: {user_timezone}, User Duration Type: {user_duration_type}, Start Hour: {start_hour_utc}, End Hour: {end_hour_utc}")
-                if start_hour_utc < end_hour_utc:
-                    time_filters |= Q(acquisition_datetime__time__gte=time(start_hour_utc, 0)) & Q(acquisition_datetime__time__lt=time(end_hour_utc, 0))
-                else:
-                    # Overnight case (crosses midnight)
-                    time_filters |= Q(acquisition_datetime__time__gte=time(start_hour_utc, 0)) | Q(acquisition_datetime__time__lt=time(end_hour_utc, 0))
-
-            filters &= time_filters
-
-        if min_cloud_cover is not None and max_cloud_cover is not None:
-            logger.debug(f"Cloud cover filters: {min_cloud_cover} to {max_cloud_cover}")
-            min_cloud_cover, max_cloud_cover = float(min_cloud_cover), float(max_cloud_cover)
-            cloud_cover_filters = (
-                Q(~Q(vendor_name__in=['capella', 'skyfi-umbra']), cloud_cover_percent__gte=min_cloud_cover, cloud_cover_percent__lte=max_cloud_cover)
-            )
-
-            if min_cloud_cover == -1:
-                cloud_cover_filters |= Q(vendor_name__in=["capella", "skyfi-umbra"])
-
-            filters &= cloud_cover_filters
-
-        if min_off_nadir_angle is not None and max_off_nadir_angle is not None:
-            logger.debug(f"Sun elevation filters: {min_off_nadir_angle} to {max_off_nadir_angle}")
-            min_off_nadir_angle, max_off_nadir_angle = float(min_off_nadir_angle), float(max_off_nadir_angle)
-            sun_elevation_filters = Q(sun_elevation__gte=min_off_nadir_angle, sun_elevation__lte=max_off_nadir_angle)
-            filters &= sun_elevation_filters
-
-        if min_gsd is not None and max_gsd is not None:
-            logger.debug(f"GSD filters: {min_gsd} to {max_gsd}")
-            min_gsd, max_gsd = float(min_gsd), float(max_gsd)
-            gsd_filters = Q(gsd__gte=min_gsd, gsd__lte=max_gsd)
-            filters &= gsd_filters
-        
-        if min_azimuth_angle is not None and max_azimuth_angle is not None:
-            logger.debug(f"Azimuth angle filters: {min_azimuth_angle} to {max_azimuth_angle}")
-            min_azimuth_angle, max_azimuth_angle = float(min_azimuth_angle), float(max_azimuth_angle)
-            azimuth_angle_filters = Q(azimuth_angle__gte=min_azimuth_angle, azimuth_angle__lte=max_azimuth_angle)
-            filters &= azimuth_angle_filters
-
-            if min_azimuth_angle == -1:
-                filters |= Q(azimuth_angle__isnull=True)
-
-        if min_illumination_azimuth_angle is not None and max_illumination_azimuth_angle is not None:
-            logger.debug(f"Illumination azimuth angle filters: {min_illumination_azimuth_angle} to {max_illumination_azimuth_angle}")
-            min_illumination_azimuth_angle, max_illumination_azimuth_angle = float(min_illumination_azimuth_angle), float(max_illumination_azimuth_angle)
-            illumination_azimuth_angle_filters = Q(illumination_azimuth_angle__gte=min_illumination_azimuth_angle, illumination_azimuth_angle__lte=max_illumination_azimuth_angle)
-            filters &= illumination_azimuth_angle_filters
-
-            if min_illumination_azimuth_angle == -1:
-                filters |= Q(illumination_azimuth_angle__isnull=True)
-
-        if min_illumination_elevation_angle is not None and max_illumination_elevation_angle is not None:
-            logger.debug(f"Illumination elevation angle filters: {min_illumination_elevation_angle} to {max_illumination_elevation_angle}")
-            min_illumination_elevation_angle, max_illumination_elevation_angle = float(min_illumination_elevation_angle), float(max_illumination_elevation_angle)
-            illumination_elevation_angle_filters = Q(illumination_elevation_angle__gte=min_illumination_elevation_angle, illumination_elevation_angle__lte=max_illumination_elevation_angle)
-            filters &= illumination_elevation_angle_filters
-
-            if min_illumination_elevation_angle == -1:
-                filters |= Q(illumination_elevation_angle__isnull=True)
-
-        if min_holdback_seconds is not None and max_holdback_seconds is not None:
-            logger.debug(f"Holdback seconds filters: {min_holdback_seconds} to {max_holdback_seconds}")
-            min_holdback_seconds, max_holdback_seconds = int(min_holdback_seconds), int(max_holdback_seconds)
-            min_holdback_seconds = min_holdback_seconds * 86400
-            max_holdback_seconds = max_holdback_seconds * 86400
-
-            holdback_seconds_filters = Q(holdback_seconds__gte=min_holdback_seconds, holdback_seconds__lte=max_holdback_seconds)
-            filters &= holdback_seconds_filters
-
-        filters &= Q(location_polygon__intersects=polygon)
-
         # Fetch frequency data directly from the database
         frequency_data = (
             CollectionCatalog.objects.filter(
-                acquisition_datetime__gte=start_date,
-                acquisition_datetime__lte=end_date
+                filter_spec.get_date_filters()
             ).filter(
-                filters
+                filter_spec.get_filters()
             )
             .annotate(date=TruncDate('acquisition_datetime'))  # Extract the date part
             .values('date')  # Group by the date
@@ -938,6 +988,9 @@ def get_polygon_selection_acquisition_calender_days_frequency(
             "status_code": 200,
         }
 
+    except ValueError as e:
+        logger.error(f"Invalid frequency calculation filters: {str(e)}")
+        return {"data": None, "status_code": 400, "error": f"Error: {str(e)}"}
     except Exception as e:
         import traceback
         traceback.print_exc()
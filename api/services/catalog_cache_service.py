@@ -0,0 +1,86 @@
+import json
+import hashlib
+from decouple import config
+from django.core.cache import cache
+from django.contrib.gis.geos import GEOSGeometry
+from django.utils.dateparse import parse_datetime
+from core.models import VENDOR_CHOICES
+from core.utils import get_catalog_generations
+from logging_module import logger
+
+CATALOG_RESPONSE_CACHE_SECONDS = config("CATALOG_RESPONSE_CACHE_SECONDS", default=600, cast=int)
+ALL_VENDOR_NAMES = [vendor_name for vendor_name, _ in VENDOR_CHOICES]
+
+# Parameters holding a comma separated list, order and spacing do not change the result
+LIST_PARAMS = {"vendor_name", "user_duration_type", "focused_records_ids"}
+WKT_PARAMS = {"wkt_polygon", "polygon_wkt", "zoomed_wkt", "original_polygon"}
+DATETIME_PARAMS = {"start_date", "end_date"}
+
+
+def canonicalize_catalog_param(name, value):
+    """Normalize one request parameter so equivalent searches get the same cache key."""
+    if isinstance(value, bool) or value is None:
+        return value
+    value = str(value).strip()
+
+    if name in WKT_PARAMS:
+        try:
+            geometry = GEOSGeometry(value)
+            geometry.normalize()
+            return geometry.wkt
+        except Exception:
+            return value  # Invalid WKT, the search itself reports the error
+    if name in LIST_PARAMS:
+        return ",".join(sorted({item.strip() for item in value.split(",") if item.strip()}))
+    if name in DATETIME_PARAMS:
+        parsed = parse_datetime(value)
+        return parsed.isoformat() if parsed else value
+    try:
+        return repr(float(value))
+    except ValueError:
+        return value
+
+
+def get_catalog_cache_key(namespace, params, filter_spec=None):
+    """
+    Cache key of a catalog response, built from the canonical filter set and the generation of every
+    vendor the response can include. A vendor committing new records moves to a new key.
+    With a CatalogFilterSpec, its canonical filters are used and params only holds the other request parameters.
+    """
+    canonical_params = {
+        name: canonicalize_catalog_param(name, value)
+        for name, value in params.items()
+        if value is not None and value != ""
+    }
+
+    vendor_names = ALL_VENDOR_NAMES
+    if filter_spec is not None and filter_spec.vendor_names:
+        vendor_names = sorted(set(filter_spec.vendor_names) & set(ALL_VENDOR_NAMES))
+    elif filter_spec is None and canonical_params.get("vendor_name"):
+        vendor_names = sorted(set(canonical_params["vendor_name"].split(",")) & set(ALL_VENDOR_NAMES))
+    generations = get_catalog_generations(vendor_names)
+
+    key_source = json.dumps(
+        {
+            "params": canonical_params,
+            "filters": filter_spec.get_canonical_params() if filter_spec is not None else None,
+            "generations": generations,
+        },
+        sort_keys=True,
+    )
+    return f"catalog_response:{namespace}:{hashlib.md5(key_source.encode()).hexdigest()}"
+
+
+def get_cached_catalog_response(cache_key):
+    try:
+        return cache.get(cache_key)
+    except Exception as e:
+        logger.error(f"Error reading catalog response cache: {str(e)}")
+        return None
+
+
+def set_cached_catalog_response(cache_key, response_data, timeout=CATALOG_RESPONSE_CACHE_SECONDS):
+    try:
+        cache.set(cache_key, response_data, timeout)
+    except Exception as e:
+        logger.error(f"Error writing catalog response cache: {str(e)}")
@@ -0,0 +1,290 @@
+import pytz
+from datetime import datetime, timedelta, time
+from django.contrib.gis.geos import GEOSGeometry, Point
+from django.contrib.gis.measure import D
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from core.models import time_ranges
+
+# Vendors without a cloud cover value, min_cloud_cover=-1 includes them
+CLOUDLESS_VENDORS = ["capella", "skyfi-umbra"]
+
+# Range filter name: (catalog field, min=-1 also matches NULL, multiplier applied to the bounds)
+RANGE_FILTERS = {
+    "off_nadir_angle": ("sun_elevation", False, 1),
+    "gsd": ("gsd", False, 1),
+    "azimuth_angle": ("azimuth_angle", True, 1),
+    "illumination_azimuth_angle": ("illumination_azimuth_angle", True, 1),
+    "illumination_elevation_angle": ("illumination_elevation_angle", True, 1),
+    "holdback_seconds": ("holdback_seconds", False, 86400),  # Bounds are given in days
+}
+
+
+def get_local_time_range(time_period, user_timezone):
+    """Start and end of a time period today in the user's timezone, as aware datetimes."""
+    # Get user's timezone object
+    user_tz = pytz.timezone(user_timezone)
+
+    # Get current date in the user's timezone
+    local_now = datetime.now(user_tz).date()
+
+    # Define start time in local timezone
+    start_hour, end_hour = time_ranges[time_period]
+    start_time = user_tz.localize(datetime.combine(local_now, time(start_hour, 0)))
+
+    # Handle overnight case (crosses midnight)
+    if time_period == "overnight":
+        end_time = user_tz.localize(datetime.combine(local_now + timedelta(days=1), time(end_hour, 0)))
+    else:
+        end_time = user_tz.localize(datetime.combine(local_now, time(end_hour, 0)))
+    return start_time, end_time
+
+
+def get_utc_time_range(time_period, user_timezone):
+    start_time, end_time = get_local_time_range(time_period, user_timezone)
+
+    # Convert to UTC
+    start_time_utc = start_time.astimezone(pytz.utc).hour
+    end_time_utc = end_time.astimezone(pytz.utc).hour
+
+    return start_time_utc, end_time_utc
+
+
+def get_utc_minute_range(time_period, user_timezone):
+    """UTC minutes of day of the period bounds, exact for half and quarter hour offsets (Asia/Kolkata, Asia/Kathmandu)."""
+    start_time, end_time = get_local_time_range(time_period, user_timezone)
+    start_time_utc = start_time.astimezone(pytz.utc)
+    end_time_utc = end_time.astimezone(pytz.utc)
+    return start_time_utc.hour * 60 + start_time_utc.minute, end_time_utc.hour * 60 + end_time_utc.minute
+
+
+def parse_filter_datetime(name, value):
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        value = str(value).strip()
+        parsed = parse_datetime(value)
+        if parsed is None and parse_date(value) is not None:
+            parsed = datetime.combine(parse_date(value), time.min)
+        if parsed is None:
+            raise ValueError(f"Invalid {name}: {value}")
+    return parsed if parsed.tzinfo else pytz.utc.localize(parsed)
+
+
+def parse_filter_list(value):
+    return sorted({item.strip() for item in str(value).split(",") if item.strip()})
+
+
+class CatalogFilterSpec:
+    """
+    Parsed and validated filters of a catalog search, shared by the satellite catalog, tile, and
+    calendar endpoints. Parameters are parsed once when the spec is built, invalid values raise
+    ValueError. get_filters compiles them to a single Q, get_canonical_params gives the normalized
+    values used in cache keys.
+
+    Range filters only apply when both bounds are given. For azimuth and illumination angles a min
+    of -1 also matches records without a value, and for cloud cover it also matches the vendors
+    that do not report one.
+    """
+
+    PARAM_NAMES = [
+        "start_date", "end_date", "wkt_polygon", "latitude", "longitude", "distance",
+        "vendor_id", "vendor_name", "min_cloud_cover", "max_cloud_cover",
+        "user_timezone", "user_duration_type", "is_purchased",
+    ] + [f"{bound}_{name}" for name in RANGE_FILTERS for bound in ("min", "max")]
+
+    def __init__(
+        self,
+        start_date=None,
+        end_date=None,
+        wkt_polygon=None,
+        latitude=None,
+        longitude=None,
+        distance=None,
+        vendor_id=None,
+        vendor_name=None,
+        min_cloud_cover=None,
+        max_cloud_cover=None,
+        user_timezone=None,
+        user_duration_type=None,
+        is_purchased=None,
+        **range_bounds,
+    ):
+        unknown = set(range_bounds) - set(self.PARAM_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        self.start_date = self.end_date = None
+        if start_date and end_date:
+            self.start_date = parse_filter_datetime("start_date", start_date)
+            self.end_date = parse_filter_datetime("end_date", end_date)
+
+        self.polygon = None
+        if wkt_polygon:
+            try:
+                self.polygon = GEOSGeometry(str(wkt_polygon))
+            except Exception:
+                raise ValueError("Invalid wkt_polygon")
+
+        self.point_distance = None
+        if latitude and longitude and distance:
+            try:
+                self.point_distance = (float(latitude), float(longitude), float(distance))
+            except (TypeError, ValueError):
+                raise ValueError("Invalid latitude, longitude or distance")
+
+        self.vendor_id = vendor_id or None
+        self.vendor_names = parse_filter_list(vendor_name) if vendor_name else []
+
+        self.cloud_cover = self.parse_range("cloud_cover", min_cloud_cover, max_cloud_cover)
+        self.ranges = {}
+        for name in RANGE_FILTERS:
+            bounds = self.parse_range(name, range_bounds.get(f"min_{name}"), range_bounds.get(f"max_{name}"))
+            if bounds:
+                self.ranges[name] = bounds
+
+        self.user_timezone = None
+        self.durations = []
+        if user_timezone and user_duration_type:
+            if user_timezone not in pytz.all_timezones_set:
+                raise ValueError(f"Invalid user_timezone: {user_timezone}")
+            self.durations = parse_filter_list(user_duration_type)
+            for duration in self.durations:
+                if duration not in time_ranges:
+                    raise ValueError("Duration not valid")
+            self.user_timezone = user_timezone
+
+        self.is_purchased = is_purchased if isinstance(is_purchased, bool) else None
+
+    @classmethod
+    def from_query_params(cls, query_params, **overrides):
+        """Build a spec from request query params, overrides (e.g. the request body polygon) win."""
+        params = {name: query_params.get(name) for name in cls.PARAM_NAMES if query_params.get(name) not in (None, "")}
+        if isinstance(params.get("is_purchased"), str) and params["is_purchased"].lower() in ["true", "false"]:
+            params["is_purchased"] = params["is_purchased"].lower() == "true"
+        params.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(**params)
+
+    @staticmethod
+    def parse_range(name, min_value, max_value):
+        if min_value is None or max_value is None or min_value == "" or max_value == "":
+            return None
+        try:
+            min_value, max_value = float(min_value), float(max_value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {name} range")
+        if min_value > max_value:
+            raise ValueError(f"min_{name} is greater than max_{name}")
+        return min_value, max_value
+
+    def get_date_filters(self):
+        if self.start_date and self.end_date:
+            return Q(acquisition_datetime__gte=self.start_date, acquisition_datetime__lte=self.end_date)
+        return Q()
+
+    def get_time_of_day_filters(self):
+        """Indexed range predicates on the stored UTC minute of day of the acquisition."""
+        time_filters = Q()
+        for duration in self.durations:
+            start_minute, end_minute = get_utc_minute_range(duration, self.user_timezone)
+            if start_minute < end_minute:
+                time_filters |= Q(acquisition_minute_of_day__gte=start_minute, acquisition_minute_of_day__lt=end_minute)
+            else:
+                # Overnight case (crosses midnight)
+                time_filters |= Q(acquisition_minute_of_day__gte=start_minute) | Q(acquisition_minute_of_day__lt=end_minute)
+        return time_filters
+
+    def get_filters(self):
+        """Every filter except the date range (see get_date_filters) as one Q, each range scoped to its own NULL handling."""
+        filters = Q()
+
+        if self.vendor_id:
+            filters &= Q(vendor_id=self.vendor_id)
+        if len(self.vendor_names) == 1:
+            filters &= Q(vendor_name=self.vendor_names[0])
+        elif self.vendor_names:
+            filters &= Q(vendor_name__in=self.vendor_names)
+        if self.is_purchased is not None:
+            filters &= Q(is_purchased=self.is_purchased)
+
+        if self.cloud_cover:
+            min_value, max_value = self.cloud_cover
+            cloud_cover_filters = Q(~Q(vendor_name__in=CLOUDLESS_VENDORS), cloud_cover_percent__gte=min_value, cloud_cover_percent__lte=max_value)
+            if min_value == -1:
+                cloud_cover_filters |= Q(vendor_name__in=CLOUDLESS_VENDORS)
+            filters &= cloud_cover_filters
+
+        for name, (min_value, max_value) in self.ranges.items():
+            field, min_includes_null, multiplier = RANGE_FILTERS[name]
+            range_filters = Q(**{f"{field}__gte": min_value * multiplier, f"{field}__lte": max_value * multiplier})
+            if min_includes_null and min_value == -1:
+                range_filters |= Q(**{f"{field}__isnull": True})
+            filters &= range_filters
+
+        if self.durations:
+            filters &= self.get_time_of_day_filters()
+
+        if self.point_distance:
+            latitude, longitude, distance = self.point_distance
+            filters &= Q(location_polygon__distance_lte=(Point(longitude, latitude, srid=4326), D(km=distance)))
+        if self.polygon:
+            filters &= Q(location_polygon__intersects=self.polygon)
+
+        return filters
+
+    def get_canonical_params(self):
+        """Normalized filter values, equivalent searches give equal dicts."""
+        polygon_wkt = None
+        if self.polygon:
+            polygon = self.polygon.clone()
+            polygon.normalize()
+            polygon_wkt = polygon.wkt
+        return {
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "end_date": self.end_date.isoformat() if self.end_date else None,
+            "polygon": polygon_wkt,
+            "point_distance": self.point_distance,
+            "vendor_id": self.vendor_id,
+            "vendor_names": self.vendor_names,
+            "is_purchased": self.is_purchased,
+            "cloud_cover": self.cloud_cover,
+            "ranges": self.ranges,
+            "user_timezone": self.user_timezone,
+            "durations": self.durations,
+        }
+
+    def get_shape(self):
+        """Names of the active filters, without their values, e.g. "cloud_cover,date_range,polygon"."""
+        shape = [name for name, is_active in [
+            ("date_range", self.start_date),
+            ("polygon", self.polygon),
+            ("point_distance", self.point_distance),
+            ("vendor_id", self.vendor_id),
+            ("vendor_name", self.vendor_names),
+            ("cloud_cover", self.cloud_cover),
+            ("time_of_day", self.durations),
+        ] if is_active]
+        shape += list(self.ranges)
+        if self.is_purchased is not None:
+            shape.append(f"is_purchased_{str(self.is_purchased).lower()}")
+        return ",".join(sorted(shape))
+
+    def get_params(self):
+        """Keyword arguments that rebuild this spec, JSON serializable."""
+        params = {
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "end_date": self.end_date.isoformat() if self.end_date else None,
+            "wkt_polygon": self.polygon.wkt if self.polygon else None,
+            "vendor_id": self.vendor_id,
+            "vendor_name": ",".join(self.vendor_names) or None,
+            "user_timezone": self.user_timezone,
+            "user_duration_type": ",".join(self.durations) or None,
+            "is_purchased": self.is_purchased,
+        }
+        if self.point_distance:
+            params["latitude"], params["longitude"], params["distance"] = self.point_distance
+        if self.cloud_cover:
+            params["min_cloud_cover"], params["max_cloud_cover"] = self.cloud_cover
+        for name, (min_value, max_value) in self.ranges.items():
+            params[f"min_{name}"], params[f"max_{name}"] = min_value, max_value
+        return {name: value for name, value in params.items() if value is not None}
@@ -0,0 +1,59 @@
+import json
+import random
+from decouple import config
+from django_redis import get_redis_connection
+from logging_module import logger
+
+CATALOG_WORKLOAD_ENABLED = config("CATALOG_WORKLOAD_ENABLED", default=True, cast=bool)
+CATALOG_WORKLOAD_SAMPLE_RATE = config("CATALOG_WORKLOAD_SAMPLE_RATE", default=0.1, cast=float)
+
+# Redis hashes keyed by "<endpoint>|<shape>": query count, and the params of one recent query of that shape
+FILTER_SHAPE_COUNTS_KEY = "catalog_workload:shape_counts"
+FILTER_SHAPE_SAMPLES_KEY = "catalog_workload:shape_samples"
+
+
+def record_filter_shape(endpoint, filter_spec):
+    """
+    Count one database query of a catalog endpoint under the shape of its filters (which filters are
+    set, not their values). Every shape keeps the params of one recent query, refreshed at
+    CATALOG_WORKLOAD_SAMPLE_RATE, so tune_catalog_indexes can replay it in its EXPLAIN benchmarks.
+    Never raises, a Redis outage must not fail the search.
+    """
+    if not CATALOG_WORKLOAD_ENABLED:
+        return
+    try:
+        field = f"{endpoint}|{filter_spec.get_shape()}"
+        redis_conn = get_redis_connection("default")
+        count = redis_conn.hincrby(FILTER_SHAPE_COUNTS_KEY, field, 1)
+        if count == 1 or random.random() < CATALOG_WORKLOAD_SAMPLE_RATE:
+            redis_conn.hset(FILTER_SHAPE_SAMPLES_KEY, field, json.dumps(filter_spec.get_params()))
+    except Exception as e:
+        logger.error(f"Error recording catalog filter shape: {str(e)}")
+
+
+def get_filter_shape_workload():
+    """
+    Recorded workload as a list of {"endpoint", "filters", "count", "params"} dicts, most frequent first.
+    filters is the set of active filter names, params the sample query (None when it was not recorded).
+    """
+    redis_conn = get_redis_connection("default")
+    counts = redis_conn.hgetall(FILTER_SHAPE_COUNTS_KEY)
+    samples = redis_conn.hgetall(FILTER_SHAPE_SAMPLES_KEY)
+
+    workload = []
+    for field, count in counts.items():
+        sample = samples.get(field)
+        field = field.decode() if isinstance(field, bytes) else field
+        endpoint, shape = field.split("|", 1)
+        workload.append({
+            "endpoint": endpoint,
+            "filters": set(shape.split(",")) if shape else set(),
+            "count": int(count),
+            "params": json.loads(sample) if sample else None,
+        })
+    return sorted(workload, key=lambda shape: shape["count"], reverse=True)
+
+
+def reset_filter_shape_workload():
+    redis_conn = get_redis_connection("default")
+    redis_conn.delete(FILTER_SHAPE_COUNTS_KEY, FILTER_SHAPE_SAMPLES_KEY)
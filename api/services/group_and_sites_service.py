@@ -6,14 +6,180 @@ from pyproj import Geod
 from api.services import convert_geojson_to_wkt
 from core.models import CollectionCatalog
 from django.contrib.gis.geos import Polygon
-from django.db.models import Count
+from django.db.models import Count, Exists, OuterRef
 from datetime import datetime, timedelta
 from django.db.models.functions import TruncDate
 from django.db.models import Q
+from django.db import connection, transaction
 from api.serializers import SiteSerializer, NewestInfoSerializer
 from api.services.utils import generate_hexagon_geojson
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from api.tasks import link_site_captures
+
+
+SITE_HEATMAP_DAYS = 30
+
+# Groups under a set of root groups (deleted groups and their subtrees left out) with their sites and
+# capture counts, one row per group site and one for each group without sites, shallowest groups first.
+# The path guards against a parent cycle.
+GROUP_FOREST_SQL = """
+    WITH RECURSIVE tree AS (
+        SELECT id, name, description, parent_id, created_at, notification, 0 AS depth, ARRAY[id] AS path
+        FROM {group_table}
+        WHERE id = ANY(%(root_ids)s) AND NOT is_deleted
+        UNION ALL
+        SELECT
+            child.id, child.name, child.description, child.parent_id, child.created_at, child.notification,
+            tree.depth + 1, tree.path || child.id
+        FROM {group_table} child
+        JOIN tree ON child.parent_id = tree.id
+        WHERE NOT child.is_deleted AND child.id <> ALL(tree.path)
+    )
+    SELECT
+        tree.id, tree.name, tree.description, tree.parent_id, tree.created_at, tree.notification, tree.depth,
+        site.id, site.name, site.site_type, site.created_at, site.new_updates_count, group_site.site_area,
+        COALESCE(stats.acquisition_count, 0)
+    FROM tree
+    LEFT JOIN {group_site_table} group_site ON group_site.group_id = tree.id AND NOT group_site.is_deleted
+    LEFT JOIN {site_table} site ON site.id = group_site.site_id
+    LEFT JOIN {site_stats_table} stats ON stats.site_id = group_site.site_id
+    ORDER BY tree.depth, tree.id, group_site.id
+"""
+
+
+def load_group_forest(root_ids):
+    """
+    Load the groups under root_ids with their sites in one recursive CTE, then roll the surface area,
+    object and update counts up from the deepest groups. Returns the root nodes in root_ids order,
+    each with "sites", "subgroups" and the totals of its subtree.
+    """
+    if not root_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            GROUP_FOREST_SQL.format(
+                group_table=Group._meta.db_table,
+                group_site_table=GroupSite._meta.db_table,
+                site_table=Site._meta.db_table,
+                site_stats_table=SiteStats._meta.db_table,
+            ),
+            {"root_ids": list(root_ids)},
+        )
+        rows = cursor.fetchall()
+
+    nodes = {}
+    seen_group_sites = set()
+    for (
+        group_id, name, description, parent_id, created_at, notification, depth,
+        site_id, site_name, site_type, site_created_at, new_updates_count, site_area, count,
+    ) in rows:
+        node = nodes.get(group_id)
+        if node is None:
+            node = nodes[group_id] = {
+                "id": group_id,
+                "name": name,
+                "description": description,
+                "parent": parent_id,
+                "created_at": created_at,
+                "notification": notification,
+                "depth": depth,
+                "sites": [],
+                "subgroups": [],
+                "surface_area": 0,
+                "total_objects": 0,
+                "site_updates_count": 0,
+            }
+            if depth:
+                nodes[parent_id]["subgroups"].append(node)
+        if site_id is None or (group_id, site_id) in seen_group_sites:
+            continue
+        seen_group_sites.add((group_id, site_id))
+        node["sites"].append(
+            {
+                "id": site_id,
+                "name": site_name,
+                "area": site_area,
+                "site_type": site_type,
+                "date": site_created_at,
+                "count": count,
+                "new_updates": new_updates_count,
+            }
+        )
+        node["surface_area"] += site_area or 0
+        node["total_objects"] += count
+        node["site_updates_count"] += new_updates_count
+
+    # Rows come shallowest first, so walking them backwards adds every subtree before its parent's
+    for node in reversed(list(nodes.values())):
+        if node["depth"]:
+            parent = nodes[node["parent"]]
+            parent["surface_area"] += node["surface_area"]
+            parent["total_objects"] += node["total_objects"]
+            parent["site_updates_count"] += node["site_updates_count"]
+
+    return [nodes[root_id] for root_id in root_ids if root_id in nodes]
+
+
+def iter_group_nodes(node):
+    """The node and every node of its subtree."""
+    yield node
+    for subgroup in node["subgroups"]:
+        yield from iter_group_nodes(subgroup)
+
+
+def get_group_node(group_id):
+    nodes = load_group_forest([group_id])
+    if not nodes:
+        raise Group.DoesNotExist(f"Group {group_id} not found")
+    return nodes[0]
+
+
+def get_sites_capture_stats(site_ids, heatmap_days=SITE_HEATMAP_DAYS):
+    """
+    Capture statistics of many sites from their SiteStats rows (kept by ingest and the nightly
+    compact_site_stats task), two queries whatever the number of sites.
+    Returns {site_id: stats}, sites without a stats row yet get a zero count and empty heatmap.
+    """
+    start_date = (datetime.now() - timedelta(days=heatmap_days)).date()
+
+    stats = {
+        site_id: {
+            "acquisition_count": 0,
+            "most_recent_capture": None,
+            "most_recent_clear_capture": None,
+            "frequency": 0,
+            "gap": 0,
+            "heatmap_counts": {},
+        }
+        for site_id in site_ids
+    }
+    if not site_ids:
+        return stats
+
+    capture_ids = {}
+    capture_datetimes = set()
+    for site_stats in SiteStats.objects.filter(site_id__in=site_ids):
+        stats[site_stats.site_id]["acquisition_count"] = site_stats.acquisition_count
+        stats[site_stats.site_id]["frequency"] = site_stats.frequency
+        stats[site_stats.site_id]["gap"] = site_stats.gap
+        for day_index, count in enumerate(site_stats.daily_histogram):
+            date = site_stats.histogram_start + timedelta(days=day_index)
+            if count and date >= start_date:
+                stats[site_stats.site_id]["heatmap_counts"][date] = count
+        capture_ids[site_stats.site_id] = (site_stats.most_recent_catalog_id, site_stats.most_recent_clear_catalog_id)
+        capture_datetimes |= {site_stats.most_recent_datetime, site_stats.most_recent_clear_datetime}
+
+    # The acquisition datetimes let the catalog query skip the partitions that cannot hold the captures
+    captures = CollectionCatalog.objects.filter(
+        id__in={capture_id for ids in capture_ids.values() for capture_id in ids if capture_id},
+        acquisition_datetime__in={value for value in capture_datetimes if value},
+    ).only("id", "vendor_name", "vendor_id", "acquisition_datetime", "cloud_cover_percent")
+    captures_by_id = {capture.id: capture for capture in captures}
+    for site_id, (most_recent_id, most_recent_clear_id) in capture_ids.items():
+        stats[site_id]["most_recent_capture"] = captures_by_id.get(most_recent_id)
+        stats[site_id]["most_recent_clear_capture"] = captures_by_id.get(most_recent_clear_id)
+    return stats
 
 
 def get_all_sites(user_id, name=None, page_number: int = 1, per_page: int = 10, site_id=None, group_id=None):
@@ -34,52 +200,23 @@ def get_all_sites(user_id, name=None, page_number: int = 1, per_page: int = 10,
         sites = sites.order_by("id")[(page_number - 1) * per_page : page_number * per_page]
 
         final_sites = []
+        sites = list(sites)
+        sites_stats = get_sites_capture_stats([site.id for site in sites])
 
         for site in sites:
-            coordinates = site.coordinates_record["coordinates"][0]
-            polygon = Polygon(coordinates)
-            captures = CollectionCatalog.objects.filter(location_polygon__intersects=polygon)
-
-            total_records = captures.count()
-            most_recent_capture = captures.order_by("-acquisition_datetime").first()
-            most_recent_clear_capture = captures.filter(cloud_cover_percent__lte=30).order_by("-acquisition_datetime").first()
+            site_stats = sites_stats[site.id]
+            total_records = site_stats["acquisition_count"]
+            most_recent_capture = site_stats["most_recent_capture"]
+            most_recent_clear_capture = site_stats["most_recent_clear_capture"]
+            records_per_acquisition = site_stats["frequency"]
+            time_between_acquisitions = site_stats["gap"]
 
             if not most_recent_capture:
                 logger.warning(f"No captures found for site {site.id}")
-                records_per_acquisition = 0
-                time_between_acquisitions = 0
-            else:
-                latest_capture_date = most_recent_capture.acquisition_datetime.date()
-                latest_day_captures = captures.filter(acquisition_datetime__date=latest_capture_date)
-                prior_day_captures = captures.filter(acquisition_datetime__date__lt=latest_capture_date)
-
-                # Calculate records per acquisition
-                acquisitions_today = latest_day_captures.values("acquisition_datetime").distinct().count()
-                records_per_acquisition = latest_day_captures.count() / acquisitions_today if acquisitions_today else 0
-
-                # Calculate time between acquisitions
-                if prior_day_captures.exists():
-                    last_prior_capture = prior_day_captures.order_by("-acquisition_datetime").first()
-                    first_latest_capture = latest_day_captures.order_by("acquisition_datetime").first()
-                    time_between_acquisitions = (
-                        first_latest_capture.acquisition_datetime - last_prior_capture.acquisition_datetime
-                    ).total_seconds() / 86400 
-                else:
-                    time_between_acquisitions = 0
 
-            start_date = (datetime.now() - timedelta(days=30))
+            start_date = (datetime.now() - timedelta(days=SITE_HEATMAP_DAYS))
             end_date = datetime.now()
-            # Generate heatmap
-            heatmap = (
-                captures.filter(acquisition_datetime__gte=start_date)
-                .annotate(date=TruncDate("acquisition_datetime"))  # Truncate datetime to date
-                .values("date")  # Group by date
-                .annotate(count=Count("acquisition_datetime"))  # Count records for each date
-                .order_by("date")  # Sort by date
-            )
-
-
-            heatmap_dict = {entry["date"]: entry["count"] for entry in heatmap}
+            heatmap_dict = site_stats["heatmap_counts"]
             # Fill in missing dates with zero counts
             heatmap_data = {}
             current_date = start_date.date()
@@ -141,23 +278,22 @@ def get_group_hierarchy_recursive(group_id):
         if not group:
             return {"error": "Group not found", "status_code": 404}
 
-        def fetch_subgroups(group):
-            subgroups = Group.objects.filter(parent=group, is_deleted=False)
+        def format_subgroups(node):
             return [
                 {
-                    "id": subgroup.id,
-                    "name": subgroup.name,
-                    "description": subgroup.description,
-                    "subgroups": fetch_subgroups(subgroup),  # Recursive call
+                    "id": subgroup["id"],
+                    "name": subgroup["name"],
+                    "description": subgroup["description"],
+                    "subgroups": format_subgroups(subgroup),
                 }
-                for subgroup in subgroups
+                for subgroup in node["subgroups"]
             ]
 
         return {
             "id": group.id,
             "name": group.name,
             "description": group.description,
-            "subgroups": fetch_subgroups(group),
+            "subgroups": format_subgroups(get_group_node(group.id)),
             "status_code": 200,
         }
     except Exception as e:
@@ -211,16 +347,20 @@ def get_sites_in_group(group_id, user_id):
 
 def get_subgroups_recursive(group):
     """
-    Recursively retrieve all subgroups for a given group, including indirect subgroups.
+    Retrieve all subgroups for a given group, including indirect subgroups, in one query on GroupClosure.
+    Subgroups that are deleted or under a deleted subgroup are left out.
     """
-    subgroups = Group.objects.filter(parent=group, is_deleted=False)
-    all_subgroups = list(subgroups)
-    
-    # Recursively get subgroups of each subgroup
-    for subgroup in subgroups:
-        all_subgroups.extend(get_subgroups_recursive(subgroup))
-    
-    return all_subgroups
+    deleted_on_path = GroupClosure.objects.filter(
+        descendant_id=OuterRef("pk"),
+        ancestor__is_deleted=True,
+        ancestor__ancestor_links__ancestor_id=group.id,
+        ancestor__ancestor_links__depth__gt=0,
+    )
+    return list(
+        Group.objects.filter(ancestor_links__ancestor_id=group.id, ancestor_links__depth__gt=0)
+        .exclude(Exists(deleted_on_path))
+        .order_by("id")
+    )
 
 
 def total_surface_area_of_group_and_its_subgroups(group_id):
@@ -233,27 +373,14 @@ def total_surface_area_of_group_and_its_subgroups(group_id):
         if not group:
             return {"error": "Group not found", "status_code": 404}
         
-        # Get all subgroups recursively
-        all_groups = [group] + get_subgroups_recursive(group)
-
-        # Now go through each group and calculate the total surface area
-        total_surface_area = 0
-        total_objects = 0
-        site_updates_count = 0
-        site_objects_count = {}
-        for group in all_groups:
-            sites = GroupSite.objects.filter(group=group, is_deleted=False)
-            if not sites:
-                continue
-            for site in sites:
-                total_surface_area += site.site_area
-                coordinates = site.site.coordinates_record['coordinates'][0]
-                polygon = Polygon(coordinates)
-                count = CollectionCatalog.objects.filter(location_polygon__intersects=polygon).count()
-                total_objects += count
-                site_objects_count[site.site.id] = count
-                site_updates_count += site.site.new_updates_count
-        
+        node = get_group_node(group.id)
+        total_surface_area = node["surface_area"]
+        total_objects = node["total_objects"]
+        site_updates_count = node["site_updates_count"]
+        site_objects_count = {
+            site["id"]: site["count"] for subgroup in iter_group_nodes(node) for site in subgroup["sites"]
+        }
+
         return {
             "data": {"total_surface_area": total_surface_area, "total_objects": total_objects, "site_objects_count": site_objects_count, "site_updates_count": site_updates_count},
             "message": "Total surface area calculated successfully",
@@ -278,19 +405,18 @@ def get_parent_groups_with_details(user_id, group_name=None):
         if group_name:
             filters["name__icontains"] = group_name
         
-        parent_groups = Group.objects.filter(**filters)
+        parent_group_ids = list(Group.objects.filter(**filters).values_list("id", flat=True))
         groups = []
-        for group in parent_groups:
-            area_response = total_surface_area_of_group_and_its_subgroups(group.id)
+        for node in load_group_forest(parent_group_ids):
             groups.append(
                 {
-                    "id": group.id,
-                    "name": group.name,
-                    "created_at": group.created_at,
-                    "surface_area": area_response["data"]["total_surface_area"],
-                    "total_objects": area_response["data"]["total_objects"],
-                    "new_updates_count": area_response["data"]["site_updates_count"],
-                    "notification": group.notification,
+                    "id": node["id"],
+                    "name": node["name"],
+                    "created_at": node["created_at"],
+                    "surface_area": node["surface_area"],
+                    "total_objects": node["total_objects"],
+                    "new_updates_count": node["site_updates_count"],
+                    "notification": node["notification"],
                 }
             )
         return {
@@ -322,61 +448,31 @@ def get_area_from_geojson(geometry):
         return {"area": 0, "status_code": 500, "error": f"Error calculating area from GeoJSON: {str(e)}"}
 
 
-def get_full_hierarchy(group):
+def format_group_hierarchy(node):
     """
-    Recursive function to build the hierarchy of a group and its subgroups.
+    Nested hierarchy of a node loaded by load_group_forest, with its sites and subtree totals.
     """
-    children = Group.objects.filter(parent=group, is_deleted=False)
-
-    area_response = total_surface_area_of_group_and_its_subgroups(group.id)
-
-    # Get sites assigned to the group
-    sites = GroupSite.objects.filter(group=group, is_deleted=False)
-    site_details = []
-    for site in sites:
-        site_details.append(
-            {
-                "id": site.site.id,
-                "name": site.site.name,
-                "area": site.site_area,
-                "site_type": site.site.site_type,
-                "date": site.site.created_at,
-                "count": area_response["data"]["site_objects_count"].get(site.site.id, 0),
-            }
-        )
-
     return {
-        "id": group.id,
-        "name": group.name,
-        "parent": group.parent.id if group.parent else None,
-        "created_at": group.created_at,
-        "sites": site_details,
-        "surface_area": area_response["data"]["total_surface_area"],
-        "total_objects": area_response["data"]["total_objects"],
-        "subgroups": [get_full_hierarchy(child) for child in children],
+        "id": node["id"],
+        "name": node["name"],
+        "parent": node["parent"],
+        "created_at": node["created_at"],
+        "sites": [
+            {key: site[key] for key in ("id", "name", "area", "site_type", "date", "count")}
+            for site in node["sites"]
+        ],
+        "surface_area": node["surface_area"],
+        "total_objects": node["total_objects"],
+        "subgroups": [format_group_hierarchy(subgroup) for subgroup in node["subgroups"]],
     }
 
 
-def prune_hierarchy(group_hierarchy, matched_ids):
+def get_full_hierarchy(group):
     """
-    Recursively prune the hierarchy to include only matched groups or their ancestors.
+    Build the hierarchy of a group and its subgroups.
     """
-    is_match = group_hierarchy["id"] in matched_ids
+    return format_group_hierarchy(get_group_node(group.id))
 
-    pruned_subgroups = [
-        prune_hierarchy(subgroup, matched_ids)
-        for subgroup in group_hierarchy["subgroups"]
-    ]
-
-    pruned_subgroups = [subgroup for subgroup in pruned_subgroups if subgroup]
-
-    if is_match or pruned_subgroups:
-        return {
-            "id": group_hierarchy["id"],
-            "name": group_hierarchy["name"],
-            "subgroups": pruned_subgroups,
-        }
-    return None
 
 def filter_subgroups_by_name(group_hierarchy, name):
     """
@@ -402,9 +498,45 @@ def filter_subgroups_by_name(group_hierarchy, name):
     return None
 
 def get_top_level_parent(group):
-    while group.parent:
-        group = group.parent
-    return group
+    """
+    Root of the tree holding the group, one indexed query on GroupClosure.
+    """
+    return Group.objects.filter(descendant_links__descendant_id=group.id, parent__isnull=True).first() or group
+
+
+def get_matching_groups_with_ancestors(group_name, user_id):
+    """
+    Groups of the user whose name contains group_name, nested under their ancestors as
+    {"id", "name", "subgroups"} trees, one query on GroupClosure.
+    Matches under a deleted group are left out, like the hierarchies they would be part of.
+    """
+    links = GroupClosure.objects.filter(
+        descendant__name__icontains=group_name, descendant__user__id=user_id, descendant__is_deleted=False
+    ).values("descendant_id", "ancestor_id", "ancestor__name", "ancestor__parent_id", "ancestor__is_deleted")
+
+    links_by_match = {}
+    for link in links:
+        links_by_match.setdefault(link["descendant_id"], []).append(link)
+
+    nodes = {}
+    for match_links in links_by_match.values():
+        if any(link["ancestor__is_deleted"] for link in match_links):
+            continue
+        for link in match_links:
+            nodes.setdefault(
+                link["ancestor_id"],
+                {"id": link["ancestor_id"], "name": link["ancestor__name"], "parent": link["ancestor__parent_id"], "subgroups": []},
+            )
+
+    roots = []
+    for node in sorted(nodes.values(), key=lambda node: node["id"]):
+        if node["parent"] in nodes:
+            nodes[node["parent"]]["subgroups"].append(node)
+        else:
+            roots.append(node)
+    for node in nodes.values():
+        del node["parent"]
+    return links_by_match.keys(), roots
 
 
 def group_searching_and_hierarchy_creation(group_id=None, group_name=None, user_id=None):
@@ -425,18 +557,9 @@ def group_searching_and_hierarchy_creation(group_id=None, group_name=None, user_
             return {"data": group_hierarchy, "status_code": 200}
 
         if group_name:
-            matching_groups = Group.objects.filter(name__icontains=group_name, user__id=user_id, is_deleted=False)
-            if not matching_groups.exists():
+            matched_ids, results = get_matching_groups_with_ancestors(group_name, user_id)
+            if not matched_ids:
                 return {"error": "No groups found with the given name.", "status_code": 404, "data":[]}
-            top_level_parents = {get_top_level_parent(group) for group in matching_groups}
-
-            matched_ids = set(group.id for group in matching_groups)
-            results = [
-                prune_hierarchy(get_full_hierarchy(parent), matched_ids)
-                for parent in top_level_parents
-            ]
-
-            results = [result for result in results if result]
 
             return {"data": results, "status_code": 200}
     except Exception as e:
@@ -446,39 +569,22 @@ def group_searching_and_hierarchy_creation(group_id=None, group_name=None, user_
 
 def get_full_hierarchy_by_group(group):
     """
-    Recursive function to build the hierarchy of a group and its subgroups.
+    Build the hierarchy of a group and its subgroups, with the update counts of the group and its sites.
     """
-    children = Group.objects.filter(parent=group, is_deleted=False)
-
-    area_response = total_surface_area_of_group_and_its_subgroups(group.id)
-
-    # Get sites assigned to the group
-    sites = GroupSite.objects.filter(group=group, is_deleted=False)
-    site_details = []
-    for site in sites:
-        site_details.append(
-            {
-                "id": site.site.id,
-                "name": site.site.name,
-                "area": site.site_area,
-                "site_type": site.site.site_type,
-                "date": site.site.created_at,
-                "count": area_response["data"]["site_objects_count"].get(site.site.id, 0),
-                "new_updates": site.site.new_updates_count,
-            }
-        )
-
+    node = get_group_node(group.id)
     return {
-        "id": group.id,
-        "name": group.name,
-        "parent": group.parent.id if group.parent else None,
-        "created_at": group.created_at,
-        "sites": site_details,
-        "site_objects_count": area_response["data"]["site_objects_count"],
-        "surface_area": area_response["data"]["total_surface_area"],
-        "total_objects": area_response["data"]["total_objects"],
-        "subgroups": [get_full_hierarchy(child) for child in children],
-        "new_updates_count": area_response["data"]["site_updates_count"],
+        "id": node["id"],
+        "name": node["name"],
+        "parent": node["parent"],
+        "created_at": node["created_at"],
+        "sites": node["sites"],
+        "site_objects_count": {
+            site["id"]: site["count"] for subgroup in iter_group_nodes(node) for site in subgroup["sites"]
+        },
+        "surface_area": node["surface_area"],
+        "total_objects": node["total_objects"],
+        "subgroups": [format_group_hierarchy(subgroup) for subgroup in node["subgroups"]],
+        "new_updates_count": node["site_updates_count"],
     }
 
 def get_groups_list_without_nesting(search:str):
@@ -521,20 +627,15 @@ def remove_group_and_its_sites(group_id: int):
         if not group:
             return {"error": "Group not found", "status_code": 404}
 
-        # Get all subgroups recursively
-        all_groups = [group] + get_subgroups_recursive(group)
+        # The group and every subgroup, resolved by the database inside each UPDATE
+        subtree_ids = GroupClosure.objects.filter(ancestor_id=group.id).values("descendant_id")
 
-        # Now go through each group and delete all sites
-        for group in all_groups:
-            sites = GroupSite.objects.filter(group=group)
-            for site in sites:
-                site.is_deleted = True
-                site.save()
-
-            group.is_deleted = True
-            group.save()
+        with transaction.atomic():
+            sites_removed = GroupSite.objects.filter(group_id__in=subtree_ids, is_deleted=False).update(is_deleted=True)
+            groups_removed = Group.objects.filter(id__in=subtree_ids, is_deleted=False).update(is_deleted=True)
 
         return {
+            "data": {"groups_removed": groups_removed, "sites_removed": sites_removed},
             "message": "Group and its sites removed successfully",
             "status_code": 200,
         }
@@ -555,6 +656,7 @@ def add_sites_to_group_in_bulk(sites_info, group_id, user_id):
             return {"error": "Group not found", "status_code": 404}
 
         results = []
+        created_site_ids = []
 
         for i, site_info in enumerate(sites_info):
             try:
@@ -583,6 +685,7 @@ def add_sites_to_group_in_bulk(sites_info, group_id, user_id):
                 )
                 if serializer.is_valid():
                     site = serializer.save()
+                    created_site_ids.append(site.id)
                     response = assign_site_to_group(group, site, user_id)
                     logger.info(
                         f"Assigned site {site.id} to group {group.id}: {response}"
@@ -619,6 +722,10 @@ def add_sites_to_group_in_bulk(sites_info, group_id, user_id):
                     }
                 )
 
+        # Non-blocking, one backfill for the whole upload
+        if created_site_ids:
+            link_site_captures.delay(created_site_ids)
+
         return {
             "data": results,
             "message": "Sites added to group in bulk",
@@ -674,8 +781,8 @@ def check_updates_in_notification_enabled_groups(user_id):
                 end_date = current_time
                 start_date = site.last_notification_count_updated
                 
-                most_recent_capture_count = CollectionCatalog.objects.filter(
-                    location_polygon__intersects=site.location_polygon,
+                most_recent_capture_count = SiteCapture.objects.filter(
+                    site=site,
                     acquisition_datetime__gte=start_date,
                     acquisition_datetime__lt=end_date,
                 ).count()
@@ -2,6 +2,7 @@
 from celery import shared_task
 from api.services.vendor_service import *
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.services.site_captures import link_sites_to_captures, compact_site_stats
 
 
 @shared_task
@@ -43,4 +44,24 @@ def run_image_seeder(captures):
         
         return final_output
     except Exception as e:
-        return f"Error occurred: {str(e)}"
\ No newline at end of file
+        return f"Error occurred: {str(e)}"
+
+
+@shared_task
+def link_site_captures(site_ids, replace=False):
+    """Backfill SiteCapture for new (or redrawn, replace=True) sites, captures ingested later are linked at ingest"""
+    try:
+        linked = link_sites_to_captures(site_ids, replace=replace)
+        return f"Linked {linked} of sites {site_ids} to captures"
+    except Exception as e:
+        return f"Error occurred: {str(e)}"
+
+
+@shared_task
+def compact_site_stats_task():
+    """Nightly rebuild of every SiteStats row (CELERY_BEAT_SCHEDULE), relinking the recently backfilled sites first"""
+    try:
+        refreshed = compact_site_stats()
+        return f"Compacted stats of {refreshed} sites"
+    except Exception as e:
+        return f"Error occurred: {str(e)}"
@@ -1,3 +1,403 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Polygon
+from django.db import connection, transaction
+from django.db.models import IntegerField, Value
+from django.db.utils import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone as django_timezone
+
+from api.models import Group, GroupClosure, GroupSite, Site, SiteCapture, SiteStats
+from core.models import CollectionCatalog
+from core.services.site_captures import (
+    SITE_STATS_HISTOGRAM_DAYS,
+    compact_site_stats,
+    link_sites_to_captures,
+    link_unlinked_sites,
+    relink_recent_sites,
+)
+from core.utils import bump_catalog_generation, insert_catalog_records_chunk
+from api.serializers import UpdateGroupSerializer
+from api.services.area_service import decode_catalog_cursor, encode_catalog_cursor, get_catalog_keyset_filter
+from api.services.catalog_cache_service import get_catalog_cache_key
+from api.services.catalog_filters import CatalogFilterSpec, get_utc_minute_range
+from api.services.group_and_sites_service import remove_group_and_its_sites
+
+
+def create_site(name, user):
+    return Site.objects.create(
+        name=name,
+        location_polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+        user=user,
+    )
+
+
+def create_catalog_record(vendor_id, acquisition_datetime, cloud_cover_percent=None, location_polygon=None):
+    return CollectionCatalog.objects.create(
+        vendor_name="planet",
+        vendor_id=vendor_id,
+        acquisition_datetime=acquisition_datetime,
+        cloud_cover_percent=cloud_cover_percent,
+        location_polygon=location_polygon or Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+    )
+
+
+class RemoveGroupAndItsSitesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.root = Group.objects.create(name="root", user=self.user)
+        self.child = Group.objects.create(name="child", parent=self.root, user=self.user)
+        self.grandchild = Group.objects.create(name="grandchild", parent=self.child, user=self.user)
+        self.other = Group.objects.create(name="other", user=self.user)
+
+        for index, group in enumerate([self.root, self.child, self.grandchild, self.other]):
+            GroupSite.objects.create(group=group, site=create_site(f"site {index}", self.user), user=self.user)
+        # Already removed before, not counted again
+        GroupSite.objects.create(
+            group=self.child, site=create_site("removed site", self.user), user=self.user, is_deleted=True
+        )
+
+    def test_removes_the_subtree_and_returns_the_counts(self):
+        response = remove_group_and_its_sites(self.root.id)
+
+        self.assertEqual(response["status_code"], 200)
+        self.assertEqual(response["data"], {"groups_removed": 3, "sites_removed": 3})
+        self.assertEqual(
+            set(Group.objects.filter(is_deleted=True).values_list("id", flat=True)),
+            {self.root.id, self.child.id, self.grandchild.id},
+        )
+        self.assertFalse(GroupSite.objects.filter(group=self.other, is_deleted=True).exists())
+        self.assertEqual(GroupSite.objects.filter(is_deleted=False).count(), 1)
+
+    def test_removing_a_subgroup_leaves_its_parent(self):
+        response = remove_group_and_its_sites(self.child.id)
+
+        self.assertEqual(response["data"], {"groups_removed": 2, "sites_removed": 2})
+        self.assertFalse(Group.objects.get(id=self.root.id).is_deleted)
+
+    def test_removed_group_is_not_found(self):
+        remove_group_and_its_sites(self.root.id)
+
+        response = remove_group_and_its_sites(self.root.id)
+
+        self.assertEqual(response["status_code"], 404)
+
+
+class GroupClosureTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.root = Group.objects.create(name="root", user=self.user)
+        self.child = Group.objects.create(name="child", parent=self.root, user=self.user)
+        self.grandchild = Group.objects.create(name="grandchild", parent=self.child, user=self.user)
+        self.other = Group.objects.create(name="other", user=self.user)
+
+    def get_links(self):
+        return set(GroupClosure.objects.values_list("ancestor_id", "descendant_id", "depth"))
+
+    def test_insert_links_the_ancestors(self):
+        self.assertEqual(
+            self.get_links(),
+            {
+                (self.root.id, self.root.id, 0),
+                (self.root.id, self.child.id, 1),
+                (self.root.id, self.grandchild.id, 2),
+                (self.child.id, self.child.id, 0),
+                (self.child.id, self.grandchild.id, 1),
+                (self.grandchild.id, self.grandchild.id, 0),
+                (self.other.id, self.other.id, 0),
+            },
+        )
+
+    def test_move_takes_the_subtree_along(self):
+        self.child.parent = self.other
+        self.child.save()
+
+        links = self.get_links()
+        self.assertIn((self.other.id, self.child.id, 1), links)
+        self.assertIn((self.other.id, self.grandchild.id, 2), links)
+        self.assertNotIn((self.root.id, self.child.id, 1), links)
+        self.assertNotIn((self.root.id, self.grandchild.id, 2), links)
+        self.assertIn((self.child.id, self.grandchild.id, 1), links)
+
+    def test_move_to_the_top_level_drops_the_old_ancestors(self):
+        self.child.parent = None
+        self.child.save()
+
+        self.assertEqual(
+            set(GroupClosure.objects.filter(descendant=self.grandchild).values_list("ancestor_id", "depth")),
+            {(self.child.id, 1), (self.grandchild.id, 0)},
+        )
+
+    def test_move_under_its_own_subgroup_is_refused(self):
+        serializer = UpdateGroupSerializer(
+            self.root,
+            data={"group_id": self.root.id, "name": "root", "parent": self.grandchild.id},
+            context={"user_id": self.user.id},
+        )
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("parent", serializer.errors)
+
+        # The trigger still refuses the cycle for a save that skips the validation
+        self.root.parent = self.grandchild
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            self.root.save()
+        self.assertIsNone(Group.objects.get(id=self.root.id).parent_id)
+
+    def test_move_through_the_serializer(self):
+        serializer = UpdateGroupSerializer(
+            self.child,
+            data={"group_id": self.child.id, "name": "child", "parent": self.other.id},
+            context={"user_id": self.user.id},
+        )
+
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertTrue(self.other.is_ancestor_of(self.grandchild.id))
+        self.assertFalse(self.root.is_ancestor_of(self.grandchild.id))
+
+    def test_move_under_another_users_group_is_refused(self):
+        other_user = User.objects.create_user(username="other owner", password="password")
+        other_users_group = Group.objects.create(name="other users group", user=other_user)
+        serializer = UpdateGroupSerializer(
+            self.child,
+            data={"group_id": self.child.id, "name": "child", "parent": other_users_group.id},
+            context={"user_id": self.user.id},
+        )
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("parent", serializer.errors)
+        self.assertFalse(other_users_group.is_ancestor_of(self.child.id))
+
+    def test_backfill_rebuilds_the_closure(self):
+        links = self.get_links()
+        GroupClosure.objects.all().delete()
+
+        with connection.cursor() as cursor:
+            cursor.execute(import_module("api.migrations.0010_groupclosure").BACKFILL_SQL)
+
+        self.assertEqual(self.get_links(), links)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CatalogCacheKeyTests(TestCase):
+    def test_equivalent_params_share_a_key(self):
+        key = get_catalog_cache_key(
+            "satellite_catalog",
+            {"vendor_name": "planet,maxar", "wkt_polygon": "POLYGON((0 0, 0 1, 1 1, 1 0, 0 0))", "page_size": "10"},
+        )
+        equivalent_key = get_catalog_cache_key(
+            "satellite_catalog",
+            {"vendor_name": " maxar, planet", "wkt_polygon": "POLYGON((1 1, 1 0, 0 0, 0 1, 1 1))", "page_size": "10.0", "cursor": ""},
+        )
+
+        self.assertEqual(key, equivalent_key)
+        self.assertNotEqual(key, get_catalog_cache_key("tile", {"vendor_name": "planet,maxar"}))
+
+    def test_new_records_of_a_vendor_in_the_search_change_the_key(self):
+        params = {"vendor_name": "planet"}
+        key = get_catalog_cache_key("satellite_catalog", params)
+
+        bump_catalog_generation("maxar")
+        self.assertEqual(get_catalog_cache_key("satellite_catalog", params), key)
+
+        bump_catalog_generation("planet")
+        self.assertNotEqual(get_catalog_cache_key("satellite_catalog", params), key)
+
+    def test_filter_spec_keys_follow_the_parsed_filters(self):
+        key = get_catalog_cache_key("satellite_catalog", {}, CatalogFilterSpec(vendor_name="planet,maxar", min_cloud_cover="0", max_cloud_cover="20"))
+        equivalent_key = get_catalog_cache_key("satellite_catalog", {}, CatalogFilterSpec(vendor_name="maxar, planet", min_cloud_cover="0.0", max_cloud_cover="20"))
+
+        self.assertEqual(key, equivalent_key)
+
+    def test_user_timezone_is_part_of_the_key_without_a_duration_filter(self):
+        # The spec drops the timezone without user_duration_type, the response times are still converted to it
+        filter_spec = CatalogFilterSpec(vendor_name="planet", user_timezone="Asia/Kolkata")
+
+        self.assertNotEqual(
+            get_catalog_cache_key("satellite_catalog", {"user_timezone": "Asia/Kolkata"}, filter_spec),
+            get_catalog_cache_key("satellite_catalog", {"user_timezone": "America/New_York"}, filter_spec),
+        )
+
+
+class TimeOfDayFilterTests(TestCase):
+    def test_utc_bounds_keep_the_minutes_of_the_offset(self):
+        self.assertEqual(get_utc_minute_range("morning", "UTC"), (5 * 60, 11 * 60))
+        # 05:00-11:00 IST is 23:30-05:30 UTC, 05:00 NPT is 23:15 UTC
+        self.assertEqual(get_utc_minute_range("morning", "Asia/Kolkata"), (23 * 60 + 30, 5 * 60 + 30))
+        self.assertEqual(get_utc_minute_range("morning", "Asia/Kathmandu")[0], 23 * 60 + 15)
+
+    def test_period_crossing_midnight_utc(self):
+        day = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        matching = [
+            create_catalog_record("before-midnight", day.replace(hour=23, minute=40)),
+            create_catalog_record("after-midnight", day.replace(hour=5, minute=20)),
+        ]
+        create_catalog_record("after-the-period", day.replace(hour=5, minute=40))
+        create_catalog_record("midday", day.replace(hour=12))
+
+        filter_spec = CatalogFilterSpec(user_timezone="Asia/Kolkata", user_duration_type="morning")
+
+        self.assertEqual(
+            set(CollectionCatalog.objects.filter(filter_spec.get_time_of_day_filters()).values_list("id", flat=True)),
+            {record.id for record in matching},
+        )
+
+
+class CatalogKeysetCursorTests(TestCase):
+    def setUp(self):
+        day = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        # Ties and missing values on the sort column, the id breaks them
+        for index, cloud_cover_percent in enumerate([10, None, 10, 5, None, 20, 10]):
+            create_catalog_record(f"scene-{index}", day.replace(hour=index), cloud_cover_percent)
+
+    def get_captures(self, sort_by, sort_order):
+        ordering = [sort_by if sort_order == "asc" else f"-{sort_by}", "id" if sort_order == "asc" else "-id"]
+        return CollectionCatalog.objects.annotate(capture_tier=Value(2, output_field=IntegerField())).order_by(*ordering)
+
+    def paginate(self, sort_by, sort_order, page_size=2):
+        ids = []
+        cursor = None
+        while True:
+            captures = self.get_captures(sort_by, sort_order)
+            if cursor:
+                cursor_values = decode_catalog_cursor(cursor, sort_by, sort_order)
+                captures = captures.filter(get_catalog_keyset_filter(cursor_values, sort_by, sort_order, False))
+            page = list(captures[:page_size + 1])
+            ids += [record.id for record in page[:page_size]]
+            if len(page) <= page_size:
+                return ids
+            cursor = encode_catalog_cursor(page[page_size - 1], sort_by, sort_order)
+
+    def test_pages_follow_the_full_ordering(self):
+        for sort_by in ["cloud_cover_percent", "acquisition_datetime"]:
+            for sort_order in ["asc", "desc"]:
+                with self.subTest(sort_by=sort_by, sort_order=sort_order):
+                    self.assertEqual(
+                        self.paginate(sort_by, sort_order),
+                        list(self.get_captures(sort_by, sort_order).values_list("id", flat=True)),
+                    )
+
+    def test_cursor_of_another_sort_is_refused(self):
+        record = self.get_captures("cloud_cover_percent", "asc").first()
+        cursor = encode_catalog_cursor(record, "cloud_cover_percent", "asc")
+
+        with self.assertRaises(ValueError):
+            decode_catalog_cursor(cursor, "cloud_cover_percent", "desc")
+        with self.assertRaises(ValueError):
+            decode_catalog_cursor("not a cursor", "cloud_cover_percent", "asc")
+
+
+def square(x, y, size=1):
+    return Polygon(((x, y), (x, y + size), (x + size, y + size), (x + size, y), (x, y)))
+
+
+def build_catalog_record(vendor_id, acquisition_datetime, location_polygon, cloud_cover_percent=None):
+    record = CollectionCatalog(
+        vendor_name="planet",
+        vendor_id=vendor_id,
+        acquisition_datetime=acquisition_datetime,
+        cloud_cover_percent=cloud_cover_percent,
+        location_polygon=location_polygon,
+    )
+    record.populate_derived_fields()
+    return record
+
+
+class SiteCaptureTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.site = Site.objects.create(name="site", location_polygon=square(0, 0, 2), user=self.user)
+        self.far_site = Site.objects.create(name="far site", location_polygon=square(50, 50), user=self.user)
+        self.acquisition_datetime = django_timezone.now() - timedelta(hours=1)
+
+    def get_linked_vendor_ids(self, site):
+        catalog_ids = SiteCapture.objects.filter(site=site).values_list("catalog_id", flat=True)
+        return set(CollectionCatalog.objects.filter(id__in=catalog_ids).values_list("vendor_id", flat=True))
+
+    def test_ingest_links_the_intersecting_sites(self):
+        insert_catalog_records_chunk([
+            build_catalog_record("inside", self.acquisition_datetime, square(1, 1)),
+            build_catalog_record("outside", self.acquisition_datetime, square(10, 10)),
+        ])
+
+        self.assertEqual(self.get_linked_vendor_ids(self.site), {"inside"})
+        self.assertEqual(self.get_linked_vendor_ids(self.far_site), set())
+        capture = SiteCapture.objects.get(site=self.site)
+        self.assertEqual(capture.acquisition_datetime, self.acquisition_datetime)
+
+    def test_backfill_links_the_stored_captures(self):
+        create_catalog_record("stored", self.acquisition_datetime, location_polygon=square(1, 1))
+
+        self.assertEqual(link_unlinked_sites(), 1)
+        self.assertEqual(self.get_linked_vendor_ids(self.site), {"stored"})
+        self.assertFalse(Site.objects.filter(captures_linked_at__isnull=True).exists())
+
+        # Linked sites are not backfilled again
+        self.assertEqual(link_unlinked_sites(), 0)
+
+    def test_redrawn_site_replaces_its_links(self):
+        create_catalog_record("old area", self.acquisition_datetime, location_polygon=square(1, 1))
+        create_catalog_record("new area", self.acquisition_datetime, location_polygon=square(20, 20))
+        link_sites_to_captures([self.site.id])
+
+        Site.objects.filter(id=self.site.id).update(location_polygon=square(20, 20))
+        link_sites_to_captures([self.site.id], replace=True)
+
+        self.assertEqual(self.get_linked_vendor_ids(self.site), {"new area"})
+
+    def test_compaction_relinks_captures_missed_by_a_new_site_backfill(self):
+        link_sites_to_captures([self.site.id])
+        # Stored by an ingest transaction that matched the sites before this one existed
+        create_catalog_record("missed", self.acquisition_datetime, location_polygon=square(1, 1))
+
+        self.assertEqual(relink_recent_sites(), {self.site.id})
+        self.assertEqual(self.get_linked_vendor_ids(self.site), {"missed"})
+
+    def test_older_sites_are_not_relinked(self):
+        link_sites_to_captures([self.site.id])
+        Site.objects.filter(id=self.site.id).update(captures_linked_at=django_timezone.now() - timedelta(days=30))
+        create_catalog_record("missed", self.acquisition_datetime, location_polygon=square(1, 1))
+
+        self.assertEqual(relink_recent_sites(), set())
+
+
+class SiteStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.site = Site.objects.create(name="site", location_polygon=square(0, 0, 2), user=self.user)
+        self.empty_site = Site.objects.create(name="empty site", location_polygon=square(50, 50), user=self.user)
+        self.today = django_timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def test_ingest_refreshes_the_stats_of_the_matched_sites(self):
+        earlier = build_catalog_record("earlier", self.today - timedelta(days=3) + timedelta(minutes=1), square(1, 1), 5)
+        insert_catalog_records_chunk([earlier])
+        # A later chunk adds to the links of the earlier ones
+        clear = build_catalog_record("clear", self.today + timedelta(minutes=1), square(1, 1), 10)
+        cloudy = build_catalog_record("cloudy", self.today + timedelta(minutes=2), square(1, 1), 80)
+        insert_catalog_records_chunk([clear, cloudy])
+
+        stats = SiteStats.objects.get(site=self.site)
+        self.assertEqual(stats.acquisition_count, 3)
+        self.assertEqual(stats.most_recent_datetime, cloudy.acquisition_datetime)
+        self.assertEqual(stats.most_recent_clear_datetime, clear.acquisition_datetime)
+        self.assertEqual(stats.frequency, 1)
+        self.assertEqual(stats.gap, 3)
+        self.assertEqual(len(stats.daily_histogram), SITE_STATS_HISTOGRAM_DAYS)
+        self.assertEqual(stats.daily_histogram[-1], 2)
+        self.assertEqual(stats.daily_histogram[-4], 1)
+        self.assertEqual(sum(stats.daily_histogram), 3)
+        self.assertFalse(SiteStats.objects.filter(site=self.empty_site).exists())
+
+    def test_compaction_builds_every_site(self):
+        create_catalog_record("stored", self.today + timedelta(minutes=1), location_polygon=square(1, 1))
+        link_sites_to_captures([self.site.id])
+
+        self.assertEqual(compact_site_stats(), 2)
+        self.assertEqual(SiteStats.objects.get(site=self.site).acquisition_count, 1)
+        empty_stats = SiteStats.objects.get(site=self.empty_site)
+        self.assertEqual(empty_stats.acquisition_count, 0)
+        self.assertIsNone(empty_stats.most_recent_datetime)
+        self.assertEqual(empty_stats.daily_histogram, [0] * SITE_STATS_HISTOGRAM_DAYS)
@@ -8,6 +8,16 @@ urlpatterns = [
         SatelliteCaptureCatalogView.as_view(),
         name="satellite-capture-list",
     ),
+    path(
+        "tiles/<int:z>/<int:x>/<int:y>.pbf",
+        CatalogVectorTileView.as_view(),
+        name="catalog-vector-tile",
+    ),
+    path(
+        "catalog/<int:catalog_id>/metadata",
+        CatalogRecordMetadataView.as_view(),
+        name="catalog-record-metadata",
+    ),
     path(
         "get-satellite-captured-images",
         GetSatelliteCapturedImageByIdAndVendorView.as_view(),
@@ -1,5 +1,6 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.http import HttpResponse
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from api.services.area_service import *
 from api.serializers.area_serializer import *
@@ -8,6 +9,9 @@ from rest_framework.permissions import IsAuthenticated
 from logging_module import logger
 from api.tasks import run_image_seeder
 from core.models import time_ranges
+from api.services.catalog_filters import CatalogFilterSpec
+from api.services.catalog_cache_service import get_catalog_cache_key, get_cached_catalog_response, set_cached_catalog_response
+from api.services.catalog_workload import record_filter_shape
 
 class GeoJSONToWKTView(APIView):
     permission_classes = [IsAuthenticated]
@@ -108,6 +112,11 @@ class SatelliteCaptureCatalogView(APIView):
             min_holdback_seconds = (request.query_params.get("min_holdback_seconds"))
             max_holdback_seconds = (request.query_params.get("max_holdback_seconds"))
             is_purchased = request.query_params.get("is_purchased")
+            cursor = request.query_params.get("cursor")
+            response_mode = request.query_params.get("response_mode")
+            cluster = str(request.query_params.get("cluster", "false")).lower() == "true"
+            simplify_tolerance = request.query_params.get("simplify_tolerance")
+            cluster_grid_size = request.query_params.get("cluster_grid_size")
 
             if is_purchased:
                 if is_purchased.lower() in ["true", "false"]:
@@ -146,6 +155,31 @@ class SatelliteCaptureCatalogView(APIView):
 
             logger.info(f"Min Holdback Seconds: {min_holdback_seconds}, Max Holdback Seconds: {max_holdback_seconds}")
 
+            try:
+                filter_spec = CatalogFilterSpec.from_query_params(
+                    request.query_params, wkt_polygon=wkt_polygon, is_purchased=is_purchased
+                )
+            except ValueError as e:
+                return Response({"data": str(e), "status_code": 400, "error": str(e)}, status=400)
+
+            # Presigned and proxy urls in the response depend on the host the request came through
+            cache_key = get_catalog_cache_key(
+                "satellite_catalog",
+                {
+                    **{name: value for name, value in request.query_params.items() if name not in CatalogFilterSpec.PARAM_NAMES},
+                    "original_polygon": original_polygon,
+                    "host": request.get_host(),
+                    # Acquisition times in the response are converted to the user timezone, with or without a duration filter
+                    "user_timezone": user_timezone,
+                },
+                filter_spec,
+            )
+            cached_response = get_cached_catalog_response(cache_key)
+            if cached_response is not None:
+                logger.info("Satellite Capture Catalog View cached response")
+                return Response(cached_response)
+            record_filter_shape("satellite_catalog", filter_spec)
+
             service_response = get_satellite_records(
                 page_number=page_number,
                 page_size=page_size,
@@ -180,7 +214,13 @@ class SatelliteCaptureCatalogView(APIView):
                 max_illumination_elevation_angle=max_illumination_elevation_angle,
                 min_holdback_seconds=min_holdback_seconds,
                 max_holdback_seconds=max_holdback_seconds,
-                is_purchased=is_purchased
+                is_purchased=is_purchased,
+                cursor=cursor,
+                response_mode=response_mode,
+                cluster=cluster,
+                simplify_tolerance=simplify_tolerance,
+                cluster_grid_size=cluster_grid_size,
+                filter_spec=filter_spec,
             )
 
             if service_response["status_code"] != 200:
@@ -188,6 +228,12 @@ class SatelliteCaptureCatalogView(APIView):
                     service_response, status=service_response["status_code"]
                 )
 
+            # Map layer records are plain values, there is nothing to serialize or seed
+            if response_mode == "map" and source == "home" and not vendor_id:
+                logger.info("Satellite Capture Catalog View map response")
+                set_cached_catalog_response(cache_key, service_response)
+                return Response(service_response)
+
             serializer = SatelliteCaptureCatalogListSerializer(
                 service_response["data"], many=True,  context={'timezone': user_timezone}
             )
@@ -198,25 +244,62 @@ class SatelliteCaptureCatalogView(APIView):
                 run_image_seeder.delay(grouped_data)
             
             logger.info("Satellite Capture Catalog View response")
-            return Response(
-                {
-                    "data": data,
-                    "zoomed_captures_count": service_response["zoomed_captures_count"],
-                    "polygon_area_km2": service_response["polygon_area_km2"],
-                    "page_number": service_response["page_number"],
-                    "page_size": service_response["page_size"],
-                    "total_records": service_response["total_records"],
-                    "regular_captures_count": service_response["regular_captures_count"],
-                    "focused_captures_count": service_response["focused_captures_count"],
-                    "time_taken": service_response["time_taken"],
-                    "status_code": 200,
-                }
-            )
+            response_data = {
+                "data": data,
+                "zoomed_captures_count": service_response["zoomed_captures_count"],
+                "polygon_area_km2": service_response["polygon_area_km2"],
+                "page_number": service_response["page_number"],
+                "page_size": service_response["page_size"],
+                "total_records": service_response["total_records"],
+                "next_cursor": service_response["next_cursor"],
+                "regular_captures_count": service_response["regular_captures_count"],
+                "focused_captures_count": service_response["focused_captures_count"],
+                "time_taken": service_response["time_taken"],
+                "status_code": 200,
+            }
+            set_cached_catalog_response(cache_key, response_data)
+            return Response(response_data)
         except Exception as e:
             logger.error(f"Error in Satellite Capture Catalog View")
             return Response({"data": f"{str(e)}", "status_code": 500, "error": f"{str(e)}"}, status=500)
 
 
+class CatalogVectorTileView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        description="Catalog footprints of a web mercator tile as a Mapbox Vector Tile (layer catalog), with the same filters as the satellite catalog.",
+        parameters=catalog_tile_params,
+        responses={
+            200: OpenApiResponse(description="Mapbox Vector Tile"),
+            400: OpenApiResponse(description="Bad Request"),
+            500: OpenApiResponse(description="Internal server error"),
+        },
+        tags=["Satellite Capture"],
+    )
+    def get(self, request, z, x, y, *args, **kwargs):
+        logger.info("Inside Get method of Catalog Vector Tile View")
+        try:
+            # Same as the satellite catalog, purchased records are only filtered when is_purchased is given
+            try:
+                filter_spec = CatalogFilterSpec.from_query_params(request.query_params)
+            except ValueError as e:
+                return Response({"data": str(e), "status_code": 400, "error": str(e)}, status=400)
+
+            service_response = get_catalog_tile(z, x, y, filter_spec)
+            if not service_response.get("cached"):
+                record_filter_shape("catalog_tile", filter_spec)
+            if service_response["status_code"] != 200:
+                return Response(
+                    service_response, status=service_response["status_code"]
+                )
+
+            return HttpResponse(service_response["data"], content_type="application/vnd.mapbox-vector-tile")
+        except Exception as e:
+            logger.error(f"Error in Catalog Vector Tile View: {str(e)}")
+            return Response({"data": f"{str(e)}", "status_code": 500, "error": f"{str(e)}"}, status=500)
+
+
 class GetSatelliteCapturedImageByIdAndVendorView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -268,6 +351,33 @@ class GetSatelliteCapturedImageByIdAndVendorView(APIView):
 
 
 
+class CatalogRecordMetadataView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        description="Raw vendor metadata of a satellite catalog record, not part of the catalog search responses.",
+        responses={
+            200: OpenApiResponse(description="Catalog record metadata successfully retrieved."),
+            404: OpenApiResponse(description="Not found"),
+            500: OpenApiResponse(description="Internal server error"),
+        },
+        tags=["Satellite Capture"],
+    )
+    def get(self, request, catalog_id, *args, **kwargs):
+        logger.info("Inside Get method of Catalog Record Metadata View")
+        try:
+            service_response = get_catalog_record_metadata(catalog_id)
+            if service_response["status_code"] != 200:
+                return Response(
+                    service_response, status=service_response["status_code"]
+                )
+
+            return Response({"data": service_response["data"], "status_code": 200})
+        except Exception as e:
+            logger.error(f"Error in Catalog Record Metadata View: {str(e)}")
+            return Response({"data": f"{str(e)}", "status_code": 500, "error": f"{str(e)}"}, status=500)
+
+
 class GetPinSelectionAnalyticsAndLocation(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -352,6 +462,12 @@ class GetPolygonSelectionAnalyticsAndLocation(APIView):
                 )
 
             logger.info(f"WKT Polygon: {polygon_wkt}")
+            cache_key = get_catalog_cache_key("polygon_selection_analytics", {"polygon_wkt": polygon_wkt})
+            cached_response = get_cached_catalog_response(cache_key)
+            if cached_response is not None:
+                logger.info("Polygon Selection Analytics and Location View cached response")
+                return Response(cached_response)
+
             service_response = get_polygon_selection_analytics_and_location_wkt(
                 polygon_wkt=polygon_wkt
             )
@@ -362,9 +478,9 @@ class GetPolygonSelectionAnalyticsAndLocation(APIView):
                 )
 
             logger.info("Polygon Selection Analytics and Location View response")
-            return Response(
-                {"data": service_response["data"], "status_code": 200}
-            )
+            response_data = {"data": service_response["data"], "status_code": 200}
+            set_cached_catalog_response(cache_key, response_data)
+            return Response(response_data)
         except Exception as e:
             logger.error(f"Error in Polygon Selection Analytics and Location View: {str(e)}")
             return Response({"data": f"{str(e)}", "status_code": 500, "error": f"{str(e)}"}, status=500)
@@ -434,6 +550,44 @@ class GetPolygonSelectionAcquisitionCalenderDaysFrequencyView(APIView):
                 )
 
             logger.info(f"WKT Polygon: {polygon_wkt}")
+            try:
+                filter_spec = CatalogFilterSpec(
+                    start_date=start_date,
+                    end_date=end_date,
+                    wkt_polygon=polygon_wkt,
+                    vendor_id=vendor_id,
+                    vendor_name=vendor_name,
+                    min_cloud_cover=min_cloud_cover,
+                    max_cloud_cover=max_cloud_cover,
+                    min_off_nadir_angle=min_off_nadir_angle,
+                    max_off_nadir_angle=max_off_nadir_angle,
+                    min_gsd=min_gsd,
+                    max_gsd=max_gsd,
+                    user_timezone=user_timezone,
+                    user_duration_type=user_duration_type,
+                    min_azimuth_angle=min_azimuth_angle,
+                    max_azimuth_angle=max_azimuth_angle,
+                    min_illumination_azimuth_angle=min_illumination_azimuth_angle,
+                    max_illumination_azimuth_angle=max_illumination_azimuth_angle,
+                    min_illumination_elevation_angle=min_illumination_elevation_angle,
+                    max_illumination_elevation_angle=max_illumination_elevation_angle,
+                    min_holdback_seconds=min_holdback_seconds,
+                    max_holdback_seconds=max_holdback_seconds,
+                    is_purchased=is_purchased if isinstance(is_purchased, bool) else None,
+                )
+            except ValueError as e:
+                return Response({"data": str(e), "status_code": 400, "error": str(e)}, status=400)
+
+            # The calendar covers every day from start_date to end_date, the raw dates stay in the key
+            cache_key = get_catalog_cache_key(
+                "polygon_calendar_frequency", {"start_date": start_date, "end_date": end_date}, filter_spec
+            )
+            cached_response = get_cached_catalog_response(cache_key)
+            if cached_response is not None:
+                logger.info("Polygon Selection Calender Days Frequency View cached response")
+                return Response(cached_response)
+            record_filter_shape("polygon_calendar_frequency", filter_spec)
+
             service_response = get_polygon_selection_acquisition_calender_days_frequency(
                 polygon_wkt=polygon_wkt,
                 start_date=start_date,
@@ -456,7 +610,8 @@ class GetPolygonSelectionAcquisitionCalenderDaysFrequencyView(APIView):
                 max_illumination_elevation_angle=max_illumination_elevation_angle,
                 min_holdback_seconds=min_holdback_seconds,
                 max_holdback_seconds=max_holdback_seconds,
-                is_purchased=is_purchased
+                is_purchased=is_purchased,
+                filter_spec=filter_spec,
             )
 
             if service_response["status_code"] != 200:
@@ -465,9 +620,9 @@ class GetPolygonSelectionAcquisitionCalenderDaysFrequencyView(APIView):
                 )
 
             logger.info("Polygon Selection Calender Days Frequency View response")
-            return Response(
-                {"data": service_response["data"], "status_code": 200, "time_taken": service_response["time_taken"]}
-            )
+            response_data = {"data": service_response["data"], "status_code": 200, "time_taken": service_response["time_taken"]}
+            set_cached_catalog_response(cache_key, response_data)
+            return Response(response_data)
         except Exception as e:
             logger.error(f"Error in Polygon Selection Calender Days Frequency View: {str(e)}")
             return Response({"data": f"{str(e)}", "status_code": 500, "error": f"{str(e)}"}, status=500)
@@ -8,6 +8,7 @@ from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParamet
 from api.parameters.group_and_sites_parameters import *
 from rest_framework.permissions import IsAuthenticated
 from api.services.utils import get_user_id_from_token 
+from api.tasks import link_site_captures
 from rest_framework.parsers import MultiPartParser, FormParser
 import pandas as pd
 import json
@@ -200,6 +201,8 @@ class AddSiteView(APIView):
             serializer = SiteSerializer(data=request.data, context={"user_id": user_id})
             if serializer.is_valid():
                 site = serializer.save()
+                # Non-blocking function call using Celery
+                link_site_captures.delay([site.id])
                 return Response(
                     SiteSerializer(site).data, status=status.HTTP_201_CREATED
                 )
@@ -634,7 +637,7 @@ class RemoveGroupsandItsNestedGroupAndSitesView(APIView):
         ],
         responses={
             200: OpenApiResponse(
-                description="Group and its nested groups and sites removed successfully.",
+                description="Group and its nested groups and sites removed successfully, with the number of groups and group sites removed.",
             ),
             400: OpenApiResponse(description="Invalid input"),
             500: OpenApiResponse(description="Internal server error"),
@@ -654,8 +657,9 @@ class RemoveGroupsandItsNestedGroupAndSitesView(APIView):
             group_id = request.query_params.get("group_id")
             response = remove_group_and_its_sites(group_id)
             print(response)
+            # Always 200 like before, the counts are only there when the group was found and removed
             return Response(
-                {"message": "Group and its nested groups and sites removed successfully."},
+                {"message": "Group and its nested groups and sites removed successfully.", "data": response.get("data")},
                 status=status.HTTP_200_OK,
             )
         except Exception as e:
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
+from celery.schedules import crontab
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -185,8 +186,22 @@ CACHES = {
     }
 }
 
-CELERY_WORKER_POOL = "solo"
+# Vendor catalog runs fan out as separate tasks, the pool must run them in parallel and enforce time limits
+CELERY_WORKER_POOL = config("CELERY_WORKER_POOL", default="prefork")
+CELERY_WORKER_CONCURRENCY = config("CELERY_WORKER_CONCURRENCY", default=8, cast=int)
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Entries are synced into the django_celery_beat tables when beat starts, times are in CELERY_TIMEZONE
+CELERY_BEAT_SCHEDULE = {
+    "create-future-catalog-partitions": {
+        "task": "core.tasks.create_future_catalog_partitions",
+        "schedule": crontab(hour=5, minute=0),
+    },
+    "compact-site-stats": {
+        "task": "api.tasks.compact_site_stats_task",
+        # 06:00 IST is 00:30 UTC, the histograms move to the new UTC day
+        "schedule": crontab(hour=6, minute=0),
+    },
+}
 
 import os
 
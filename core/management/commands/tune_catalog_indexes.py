@@ -0,0 +1,194 @@
+import json
+from django.core.management.base import BaseCommand
+from django.db import connection
+from api.services.area_service import build_satellite_records_filters
+from api.services.catalog_filters import CatalogFilterSpec
+from api.services.catalog_workload import get_filter_shape_workload, reset_filter_shape_workload
+from core.services.catalog_partitions import CATALOG_TABLE, get_catalog_partitions
+
+BENCHMARK_PAGE_SIZE = 100  # Same as a catalog page
+
+# Indexes the catalog filters can use, each with the filter sets (shape subsets) it serves.
+# Created outside of the migrations, partition by partition with CONCURRENTLY, so the table stays writable while they build.
+CANDIDATE_INDEXES = [
+    {
+        "name": "catalog_polygon_datetime_gist",
+        "shapes": [{"polygon", "date_range"}, {"point_distance", "date_range"}],
+        "extension": "btree_gist",
+        "definition": "USING gist (location_polygon, acquisition_datetime)",
+        "description": "Footprint and date range in one GiST scan, needs btree_gist",
+    },
+    {
+        "name": "catalog_purchased_datetime",
+        "shapes": [{"is_purchased_true"}],
+        "definition": "(acquisition_datetime DESC) WHERE is_purchased",
+        "description": "Purchased records only, newest first",
+    },
+    {
+        "name": "catalog_purchased_polygon_gist",
+        "shapes": [{"is_purchased_true", "polygon"}, {"is_purchased_true", "point_distance"}],
+        "definition": "USING gist (location_polygon) WHERE is_purchased",
+        "description": "Footprints of the purchased records only",
+    },
+    {
+        "name": "catalog_datetime_cloud_cover",
+        "shapes": [{"date_range", "cloud_cover"}],
+        "definition": "(acquisition_datetime, cloud_cover_percent) INCLUDE (vendor_name)",
+        "description": "Cloud cover checked from the index, vendor name included for the cloudless vendors",
+    },
+    {
+        "name": "catalog_datetime_gsd",
+        "shapes": [{"date_range", "gsd"}],
+        "definition": "(acquisition_datetime, gsd)",
+        "description": "Resolution range within a date range",
+    },
+    {
+        "name": "catalog_datetime_off_nadir",
+        "shapes": [{"date_range", "off_nadir_angle"}],
+        "definition": "(acquisition_datetime, sun_elevation)",
+        "description": "Off nadir angle range (stored in sun_elevation) within a date range",
+    },
+    {
+        "name": "catalog_datetime_angles",
+        "shapes": [
+            {"date_range", "azimuth_angle"},
+            {"date_range", "illumination_azimuth_angle"},
+            {"date_range", "illumination_elevation_angle"},
+        ],
+        "definition": "(acquisition_datetime) INCLUDE (azimuth_angle, illumination_azimuth_angle, illumination_elevation_angle)",
+        "description": "Angle ranges checked from the index without reading the rows",
+    },
+]
+
+
+def get_candidate_share(candidate, workload):
+    """Share of the recorded queries whose filters include one of the candidate filter sets."""
+    total = sum(shape["count"] for shape in workload)
+    if not total:
+        return 0, []
+    matching = [
+        shape for shape in workload
+        if any(candidate_shape <= shape["filters"] for candidate_shape in candidate["shapes"])
+    ]
+    return sum(shape["count"] for shape in matching) / total, matching
+
+
+def get_existing_indexes():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [CATALOG_TABLE])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def create_candidate_index(candidate):
+    """
+    A partitioned table cannot be indexed CONCURRENTLY: the parent index is created ON ONLY the parent,
+    each partition is indexed concurrently and attached to it. Runs in autocommit, outside of a transaction.
+    """
+    with connection.cursor() as cursor:
+        if candidate.get("extension"):
+            cursor.execute(f"CREATE EXTENSION IF NOT EXISTS {candidate['extension']}")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {candidate['name']} ON ONLY {CATALOG_TABLE} {candidate['definition']}")
+        for partition_name, _, _ in get_catalog_partitions():
+            partition_index_name = f"{partition_name}_{candidate['name']}"[:63]
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index_name} ON {partition_name} {candidate['definition']}"
+            )
+            cursor.execute(f"ALTER INDEX {candidate['name']} ATTACH PARTITION {partition_index_name}")
+        cursor.execute(f"ANALYZE {CATALOG_TABLE}")
+
+
+def get_plan_index_names(plan):
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= get_plan_index_names(child)
+    return names
+
+
+def explain_sample_query(params, runs):
+    """
+    Replay a recorded filter set as a catalog page query with EXPLAIN ANALYZE.
+    Returns (best execution time in ms over runs, index names used by the plan).
+    """
+    captures, filters = build_satellite_records_filters(CatalogFilterSpec(**params))
+    queryset = captures.filter(filters).order_by("-acquisition_datetime")[:BENCHMARK_PAGE_SIZE]
+
+    best_time, index_names = None, set()
+    for _ in range(runs):
+        plan = json.loads(queryset.explain(format="json", analyze=True))[0]
+        if best_time is None or plan["Execution Time"] < best_time:
+            best_time, index_names = plan["Execution Time"], get_plan_index_names(plan["Plan"])
+    return best_time, index_names
+
+
+class Command(BaseCommand):
+    help = (
+        "Propose covering and partial indexes for CollectionCatalog from the filter shapes recorded on the "
+        "catalog search endpoints, optionally create them and benchmark the recorded queries before and after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-share", type=float, default=0.05, help="Minimum share of recorded queries an index must serve")
+        parser.add_argument("--apply", action="store_true", help="Create the proposed indexes")
+        parser.add_argument("--benchmark", action="store_true", help="EXPLAIN ANALYZE the sample queries before and after")
+        parser.add_argument("--runs", type=int, default=3, help="EXPLAIN ANALYZE runs per query, the fastest is kept")
+        parser.add_argument("--reset", action="store_true", help="Clear the recorded workload and exit")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            reset_filter_shape_workload()
+            self.stdout.write("Catalog filter workload cleared")
+            return
+
+        workload = get_filter_shape_workload()
+        if not workload:
+            self.stdout.write("No catalog filter workload recorded yet")
+            return
+
+        total = sum(shape["count"] for shape in workload)
+        self.stdout.write(f"{total} recorded queries, {len(workload)} filter shapes")
+        for shape in workload[:10]:
+            self.stdout.write(f"  {shape['count']:>8}  {shape['endpoint']}: {', '.join(sorted(shape['filters'])) or '-'}")
+
+        existing_indexes = get_existing_indexes()
+        proposals = []
+        for candidate in CANDIDATE_INDEXES:
+            share, matching = get_candidate_share(candidate, workload)
+            if share < options["min_share"]:
+                continue
+            is_existing = candidate["name"] in existing_indexes
+            proposals.append((candidate, matching))
+            self.stdout.write(
+                f"{'exists ' if is_existing else 'propose'} {candidate['name']} ({share:.0%} of queries): {candidate['description']}\n"
+                f"        CREATE INDEX {candidate['name']} ON {CATALOG_TABLE} {candidate['definition']};"
+            )
+
+        if not proposals:
+            self.stdout.write(f"No candidate index serves {options['min_share']:.0%} of the queries")
+            return
+
+        for candidate, matching in proposals:
+            samples = [shape for shape in matching if shape["params"] is not None][:5]
+            before = {}
+            if options["benchmark"]:
+                for shape in samples:
+                    before[id(shape)] = explain_sample_query(shape["params"], options["runs"])
+
+            if options["apply"] and candidate["name"] not in existing_indexes:
+                self.stdout.write(f"Creating {candidate['name']}...")
+                create_candidate_index(candidate)
+
+            if options["benchmark"]:
+                self.stdout.write(f"Benchmark {candidate['name']}:")
+                for shape in samples:
+                    before_time, before_indexes = before[id(shape)]
+                    after_time, after_indexes = explain_sample_query(shape["params"], options["runs"])
+                    self.stdout.write(
+                        f"  {shape['endpoint']}: {', '.join(sorted(shape['filters']))}\n"
+                        f"    before {before_time:.1f} ms using {', '.join(sorted(before_indexes)) or 'no index'}\n"
+                        f"    after  {after_time:.1f} ms using {', '.join(sorted(after_indexes)) or 'no index'}"
+                    )
+
+
+# python manage.py tune_catalog_indexes
+# python manage.py tune_catalog_indexes --min-share 0.1 --apply --benchmark
+# python manage.py tune_catalog_indexes --reset
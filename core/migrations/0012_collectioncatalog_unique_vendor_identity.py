@@ -0,0 +1,67 @@
+from django.db import migrations, models
+
+
+# Same cleanup as core.services.database_bulk_dedupe_catalog, keeps the oldest row of each duplicate group
+DEDUPE_SQL = [
+    """
+    UPDATE core_collectioncatalog SET is_purchased = TRUE
+    WHERE id IN (
+        SELECT MIN(id) FROM core_collectioncatalog
+        WHERE vendor_id IS NOT NULL
+        GROUP BY vendor_name, vendor_id
+        HAVING COUNT(*) > 1 AND BOOL_OR(is_purchased)
+    );
+    """,
+    """
+    DELETE FROM core_collectioncatalog
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY vendor_name, vendor_id ORDER BY id) AS row_number
+            FROM core_collectioncatalog
+            WHERE vendor_id IS NOT NULL
+        ) AS ranked
+        WHERE ranked.row_number > 1
+    );
+    """,
+    """
+    UPDATE core_collectioncatalog SET is_purchased = TRUE
+    WHERE id IN (
+        SELECT MIN(id) FROM core_collectioncatalog
+        WHERE acquisition_datetime IS NOT NULL AND coordinates_record_md5 IS NOT NULL
+        GROUP BY vendor_name, acquisition_datetime, coordinates_record_md5
+        HAVING COUNT(*) > 1 AND BOOL_OR(is_purchased)
+    );
+    """,
+    """
+    DELETE FROM core_collectioncatalog
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY vendor_name, acquisition_datetime, coordinates_record_md5 ORDER BY id
+            ) AS row_number
+            FROM core_collectioncatalog
+            WHERE acquisition_datetime IS NOT NULL AND coordinates_record_md5 IS NOT NULL
+        ) AS ranked
+        WHERE ranked.row_number > 1
+    );
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_collectioncatalog_is_purchased'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPE_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='collectioncatalog',
+            constraint=models.UniqueConstraint(condition=models.Q(('vendor_id__isnull', False)), fields=('vendor_name', 'vendor_id'), name='unique_catalog_vendor_id'),
+        ),
+        migrations.AddConstraint(
+            model_name='collectioncatalog',
+            constraint=models.UniqueConstraint(fields=('vendor_name', 'acquisition_datetime', 'coordinates_record_md5'), name='unique_catalog_acquisition_md5'),
+        ),
+    ]
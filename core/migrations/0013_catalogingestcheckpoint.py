@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_collectioncatalog_unique_vendor_identity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogIngestCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vendor_name', models.CharField(choices=[('airbus', 'airbus'), ('blacksky', 'blacksky'), ('planet', 'planet'), ('maxar', 'maxar'), ('capella', 'capella'), ('skyfi-umbra', 'skyfi-umbra')], max_length=50, unique=True)),
+                ('high_water_mark', models.DateTimeField(blank=True, null=True)),
+                ('cursor', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
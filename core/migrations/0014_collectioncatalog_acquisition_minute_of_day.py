@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+# Same value as CollectionCatalog.populate_derived_fields for the records ingested before the column existed
+BACKFILL_SQL = """
+    UPDATE core_collectioncatalog
+    SET acquisition_minute_of_day =
+        EXTRACT(HOUR FROM acquisition_datetime AT TIME ZONE 'UTC') * 60
+        + EXTRACT(MINUTE FROM acquisition_datetime AT TIME ZONE 'UTC')
+    WHERE acquisition_datetime IS NOT NULL AND acquisition_minute_of_day IS NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_catalogingestcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectioncatalog',
+            name='acquisition_minute_of_day',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='collectioncatalog',
+            index=models.Index(fields=['acquisition_minute_of_day'], name='core_collec_acquisi_27945f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collectioncatalog',
+            index=models.Index(fields=['vendor_name', 'acquisition_minute_of_day'], name='core_collec_vendor__60d1b3_idx'),
+        ),
+    ]
@@ -0,0 +1,156 @@
+from django.db import migrations, models
+
+
+# Creates (or returns) the partition holding the month of month_start. Rows of that month already in the
+# default partition are moved into the new table before it is attached, the default partition would
+# otherwise block the attach. Used by core.services.catalog_partitions to create the future months.
+CREATE_PARTITION_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION core_create_catalog_partition(month_start timestamptz) RETURNS text AS $$
+    DECLARE
+        range_start timestamptz := date_trunc('month', month_start AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+        range_end timestamptz := range_start + interval '1 month';
+        partition_name text := 'core_collectioncatalog_' || to_char(range_start AT TIME ZONE 'UTC', 'YYYY_MM');
+    BEGIN
+        IF to_regclass(partition_name) IS NOT NULL THEN
+            RETURN partition_name;
+        END IF;
+        EXECUTE format('CREATE TABLE %I (LIKE core_collectioncatalog INCLUDING DEFAULTS INCLUDING STORAGE)', partition_name);
+        IF to_regclass('core_collectioncatalog_default') IS NOT NULL THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM core_collectioncatalog_default WHERE acquisition_datetime >= %L AND acquisition_datetime < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                range_start, range_end, partition_name
+            );
+        END IF;
+        EXECUTE format(
+            'ALTER TABLE core_collectioncatalog ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, range_start, range_end
+        );
+        RETURN partition_name;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# Swap the table for a partitioned copy. The old table is kept as core_collectioncatalog_unpartitioned
+# until core.services.catalog_partitions.drop_unpartitioned_catalog checked the row counts.
+PARTITION_CATALOG_SQL = [
+    # Index definitions (the unique constraints are recreated with the partition key below)
+    """
+    CREATE TEMP TABLE catalog_index_definitions ON COMMIT DROP AS
+    SELECT indexname, indexdef FROM pg_indexes
+    WHERE schemaname = current_schema() AND tablename = 'core_collectioncatalog'
+        AND indexname <> 'unique_catalog_vendor_id'
+        AND indexname NOT IN (
+            SELECT conname FROM pg_constraint WHERE conrelid = 'core_collectioncatalog'::regclass
+        );
+    """,
+    # Free the index, constraint and sequence names for the new table
+    """
+    DO $$
+    DECLARE
+        index_row record;
+    BEGIN
+        FOR index_row IN
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = 'core_collectioncatalog'
+        LOOP
+            EXECUTE format('ALTER INDEX %I RENAME TO %I', index_row.indexname, left(index_row.indexname, 49) || '_unpartitioned');
+        END LOOP;
+        EXECUTE format(
+            'ALTER SEQUENCE %s RENAME TO core_collectioncatalog_unpartitioned_id_seq',
+            pg_get_serial_sequence('core_collectioncatalog', 'id')
+        );
+    END;
+    $$;
+    """,
+    "ALTER TABLE core_collectioncatalog RENAME TO core_collectioncatalog_unpartitioned;",
+    # Every ingest path sets acquisition_datetime, fall back for rows saved before it was enforced
+    """
+    UPDATE core_collectioncatalog_unpartitioned
+    SET acquisition_datetime = COALESCE(publication_datetime, created_at),
+        acquisition_minute_of_day = EXTRACT(HOUR FROM COALESCE(publication_datetime, created_at) AT TIME ZONE 'UTC') * 60
+            + EXTRACT(MINUTE FROM COALESCE(publication_datetime, created_at) AT TIME ZONE 'UTC')
+    WHERE acquisition_datetime IS NULL;
+    """,
+    # The primary key of a partitioned table must include the partition key
+    """
+    CREATE TABLE core_collectioncatalog (
+        LIKE core_collectioncatalog_unpartitioned INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE,
+        PRIMARY KEY (id, acquisition_datetime)
+    ) PARTITION BY RANGE (acquisition_datetime);
+    """,
+    "CREATE TABLE core_collectioncatalog_default PARTITION OF core_collectioncatalog DEFAULT;",
+    CREATE_PARTITION_FUNCTION_SQL,
+    # One partition per month holding data, plus the current and next three months
+    """
+    SELECT core_create_catalog_partition(month_start) FROM (
+        SELECT DISTINCT date_trunc('month', acquisition_datetime AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS month_start
+        FROM core_collectioncatalog_unpartitioned
+        UNION
+        SELECT generate_series(
+            date_trunc('month', now() AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months',
+            interval '1 month'
+        ) AT TIME ZONE 'UTC'
+    ) AS months ORDER BY month_start;
+    """,
+    "INSERT INTO core_collectioncatalog OVERRIDING SYSTEM VALUE SELECT * FROM core_collectioncatalog_unpartitioned;",
+    """
+    SELECT setval(
+        pg_get_serial_sequence('core_collectioncatalog', 'id'),
+        COALESCE((SELECT MAX(id) FROM core_collectioncatalog), 0) + 1,
+        false
+    );
+    """,
+    # Indexes on the partitioned table are created on every partition, the GiST ones included
+    """
+    DO $$
+    DECLARE
+        index_row record;
+    BEGIN
+        FOR index_row IN SELECT indexdef FROM catalog_index_definitions LOOP
+            EXECUTE index_row.indexdef;
+        END LOOP;
+    END;
+    $$;
+    """,
+    """
+    ALTER TABLE core_collectioncatalog ADD CONSTRAINT unique_catalog_acquisition_md5
+        UNIQUE (vendor_name, acquisition_datetime, coordinates_record_md5);
+    """,
+    """
+    CREATE UNIQUE INDEX unique_catalog_vendor_id ON core_collectioncatalog (vendor_name, vendor_id, acquisition_datetime)
+        WHERE vendor_id IS NOT NULL;
+    """,
+    "ANALYZE core_collectioncatalog;",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_collectioncatalog_acquisition_minute_of_day'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(PARTITION_CATALOG_SQL),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='collectioncatalog',
+                    name='acquisition_datetime',
+                    field=models.DateTimeField(),
+                ),
+                migrations.RemoveConstraint(
+                    model_name='collectioncatalog',
+                    name='unique_catalog_vendor_id',
+                ),
+                migrations.AddConstraint(
+                    model_name='collectioncatalog',
+                    constraint=models.UniqueConstraint(condition=models.Q(('vendor_id__isnull', False)), fields=('vendor_name', 'vendor_id', 'acquisition_datetime'), name='unique_catalog_vendor_id'),
+                ),
+            ],
+        ),
+    ]
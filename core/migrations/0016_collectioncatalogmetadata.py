@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+# Move the raw vendor features out of the catalog rows before the column is dropped
+COPY_METADATA_SQL = """
+    INSERT INTO core_collectioncatalogmetadata (catalog_id, metadata, created_at)
+    SELECT id, metadata, created_at FROM core_collectioncatalog
+    WHERE metadata IS NOT NULL
+    ON CONFLICT (catalog_id) DO NOTHING;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_partition_collectioncatalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionCatalogMetadata',
+            fields=[
+                ('catalog_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('metadata', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunSQL(COPY_METADATA_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.RemoveField(
+            model_name='collectioncatalog',
+            name='metadata',
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.db import models as plane_models
 from django.utils import timezone
 import json
 import hashlib
+from datetime import datetime, timezone as dt_timezone
 
 class DistinctSatelliteCaptureManager(models.Manager):
     def get_queryset(self):
@@ -118,8 +119,23 @@ class SatelliteCaptureCatalogMetadata(plane_models.Model):
     def __str__(self):
         return f"Metadata for {self.vendor_name} - {self.acquisition_datetime}"
 
+def get_minute_of_day(value):
+    """UTC minute of the day (0-1439) of a datetime or ISO string, None when it cannot be read."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(dt_timezone.utc)
+    return value.hour * 60 + value.minute
+
+
 class CollectionCatalog(models.Model):
-    acquisition_datetime = models.DateTimeField(null=True, blank=True)
+    # Partition key, the table is range partitioned by month (migration 0015, core.services.catalog_partitions)
+    acquisition_datetime = models.DateTimeField()
     cloud_cover_percent = models.FloatField(null=True, blank=True)
     vendor_id = models.CharField(max_length=255, null=True, blank=True)
     vendor_name = models.CharField(max_length=50, choices=VENDOR_CHOICES)
@@ -141,7 +157,6 @@ class CollectionCatalog(models.Model):
     illumination_elevation_angle = models.FloatField(null=True, blank=True)
     holdback_seconds = models.FloatField(null=True, blank=True)
     publication_datetime = models.DateTimeField(null=True, blank=True)
-    metadata = models.JSONField(null=True, blank=True)
     geometryCentroid_lat = models.FloatField(null=True, blank=True)
     geometryCentroid_lon = models.FloatField(null=True, blank=True)
     coordinates_record_md5 = models.CharField(max_length=32, unique=False, null=True, blank=True)
@@ -149,6 +164,8 @@ class CollectionCatalog(models.Model):
     centroid_region = models.CharField(max_length=255, null=True, blank=True)
     centroid_local = models.CharField(max_length=255, null=True, blank=True)
     is_purchased = models.BooleanField(default=False)
+    # UTC minute of the day of acquisition_datetime, for the time of day (user_duration_type) filters
+    acquisition_minute_of_day = models.SmallIntegerField(null=True, blank=True)
 
 
     class Meta:
@@ -158,14 +175,58 @@ class CollectionCatalog(models.Model):
             plane_models.Index(fields=["vendor_name", "acquisition_datetime"]),
             plane_models.Index(fields=["vendor_id", "acquisition_datetime"]),
             plane_models.Index(fields=["coordinates_record_md5"]),
+            plane_models.Index(fields=["acquisition_minute_of_day"]),
+            plane_models.Index(fields=["vendor_name", "acquisition_minute_of_day"]),
             models.Index(fields=["location_polygon"]),  # Spatial index
         ]
+        constraints = [
+            # Unique indexes of a partitioned table must include the partition key
+            plane_models.UniqueConstraint(
+                fields=["vendor_name", "vendor_id", "acquisition_datetime"],
+                condition=plane_models.Q(vendor_id__isnull=False),
+                name="unique_catalog_vendor_id",
+            ),
+            plane_models.UniqueConstraint(
+                fields=["vendor_name", "acquisition_datetime", "coordinates_record_md5"],
+                name="unique_catalog_acquisition_md5",
+            ),
+        ]
 
-    def save(self, *args, **kwargs):
+    def populate_derived_fields(self):
+        """Fill the columns computed from other fields (bulk_create skips save())"""
         if self.coordinates_record:
             json_str = json.dumps(self.coordinates_record, sort_keys=True)
             self.coordinates_record_md5 = hashlib.md5(json_str.encode()).hexdigest()
+        self.acquisition_minute_of_day = get_minute_of_day(self.acquisition_datetime)
+
+    def save(self, *args, **kwargs):
+        self.populate_derived_fields()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.vendor_name} {self.vendor_id} - {self.acquisition_datetime}"
+
+
+class CollectionCatalogMetadata(plane_models.Model):
+    # Raw vendor feature of a catalog record, only read by the detail endpoint. Not a foreign key,
+    # the partitioned catalog has no unique index on id alone
+    catalog_id = plane_models.BigIntegerField(primary_key=True)
+    metadata = plane_models.JSONField()
+    created_at = plane_models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Metadata for catalog record {self.catalog_id}"
+
+
+class CatalogIngestCheckpoint(plane_models.Model):
+    vendor_name = plane_models.CharField(max_length=50, choices=VENDOR_CHOICES, unique=True)
+    # Every window ending at or before this datetime has been searched and committed
+    high_water_mark = plane_models.DateTimeField(null=True, blank=True)
+    # Windows searched after the high-water mark: {"windows": [{"window_start", "window_end", "completed_tiles",
+    # "is_complete"}]}, null when there are none (core.utils.save_catalog_checkpoint_marks)
+    cursor = plane_models.JSONField(null=True, blank=True)
+    created_at = plane_models.DateTimeField(auto_now_add=True)
+    updated_at = plane_models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.vendor_name} - {self.high_water_mark}"
@@ -5,9 +5,26 @@ from .models import CollectionCatalog, SatelliteDateRetrievalPipelineHistory, Sa
 from django.contrib.gis.geos import Polygon
 import hashlib
 import json
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+
+# A partition reports the name of its own index, so a violation is also matched on its key columns
+CATALOG_UNIQUE_CONSTRAINT_KEYS = {
+    constraint.name: f"Key ({', '.join(constraint.fields)})"
+    for constraint in CollectionCatalog._meta.constraints
+}
+
+
+def is_duplicate_catalog_error(error):
+    """True when the IntegrityError comes from one of the catalog unique constraints"""
+    diag = getattr(error.__cause__, "diag", None)
+    if diag is None:
+        return False
+    if diag.constraint_name in CATALOG_UNIQUE_CONSTRAINT_KEYS:
+        return True
+    detail = diag.message_detail or ""
+    return any(detail.startswith(key) for key in CATALOG_UNIQUE_CONSTRAINT_KEYS.values())
+
 
-import time
 class SatelliteCaptureCatalogSerializer(serializers.ModelSerializer):
     class Meta:
         model = CollectionCatalog
@@ -33,26 +50,14 @@ class SatelliteCaptureCatalogSerializer(serializers.ModelSerializer):
         coordinates_record_md5 = hashlib.md5(json.dumps(coordinates_record, sort_keys=True).encode()).hexdigest()
         validated_data["coordinates_record_md5"] = coordinates_record_md5
 
-        # Check for duplicate record before saving
-        existing_record = CollectionCatalog.objects.filter(
-            acquisition_datetime=validated_data["acquisition_datetime"],
-            coordinates_record_md5=coordinates_record_md5
-        ).first()
-
-        if existing_record:
-            raise serializers.ValidationError(f"A record with this acquisition_datetime and coordinates_record already exists. ID: {existing_record.id} {validated_data.get('vendor_id')}")
-        
-        # check for duplicate vendor_id
-        vendor_id = validated_data.get("vendor_id")
-        if vendor_id and CollectionCatalog.objects.filter(vendor_id=vendor_id).exists():
-            raise serializers.ValidationError(f"A record with this vendor_id already exists. {vendor_id}")
-            
-        return super().create(validated_data)
-
-    def validate_vendor_id(self, value):
-        if CollectionCatalog.objects.filter(vendor_id=value).exists():
-            raise serializers.ValidationError(f"A record with this vendor_id already exists. {value}")
-        return value
+        # Duplicates are rejected by the unique constraints on vendor identity
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as e:
+            if not is_duplicate_catalog_error(e):
+                raise
+            raise serializers.ValidationError(f"A record with this vendor_id or acquisition_datetime and coordinates_record already exists. {validated_data.get('vendor_id')}", code="duplicate")
 
 class SatelliteDateRetrievalPipelineHistorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -90,21 +95,11 @@ class CollectionCatalogSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
     def create(self, validated_data):
-        coordinates_record_md5 = validated_data.get("coordinates_record_md5")
-
-        acquisition_datetime = validated_data["acquisition_datetime"]
-        vendor_id = validated_data.get("vendor_id")
-        # Optimize: Single query using `Q` object for both conditions
-        start_time = time.time()
-        existing_record = CollectionCatalog.objects.filter(
-                vendor_name=validated_data['vendor_name']
-        ).filter(
-            Q(acquisition_datetime=acquisition_datetime, coordinates_record_md5=coordinates_record_md5) |
-            Q(vendor_id=vendor_id)
-        ).exists()  # Reduce data fetched
-        # print(time.time()-start_time, "end")
-
-        if existing_record:
-            raise serializers.ValidationError(f"A record with this acquisition_datetime and coordinates_record already exists. {vendor_id}")
-        # Save record
-        return super().create(validated_data)
\ No newline at end of file
+        # Duplicates are rejected by the unique constraints on vendor identity, no read before the write
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as e:
+            if not is_duplicate_catalog_error(e):
+                raise
+            raise serializers.ValidationError(f"A record with this acquisition_datetime and coordinates_record already exists. {validated_data.get('vendor_id')}", code="duplicate")
@@ -7,7 +7,9 @@ import shutil
 from decouple import config
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core.utils import save_image_in_s3_and_get_url, process_database_catalog, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local, mark_record_as_purchased
+from core.utils import save_image_in_s3_and_get_url, process_database_catalog, process_database_catalog_stream, iter_catalog_batches, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local, mark_record_as_purchased, get_catalog_run_windows, get_completed_catalog_tiles, CatalogCheckpointMark
+from core.services.http_client import vendor_request
+from core.services.spatial_sharding import iter_sharded_features, TileFetchError
 from botocore.exceptions import NoCredentialsError
 import numpy as np
 from rasterio.transform import from_bounds
@@ -244,7 +246,7 @@ def airbus_catalog_api(bbox, start_date, end_date, current_page, access_token):
             "startPage": current_page,
             "bbox": bbox,
         }
-        response = requests.post(SEARCH_API_ENDPOINT, json=body, headers=search_headers)
+        response = vendor_request("airbus", "POST", SEARCH_API_ENDPOINT, json=body, headers=search_headers)
         if response.status_code == 200:
             response_data = response.json()
             return response_data
@@ -253,6 +255,21 @@ def airbus_catalog_api(bbox, start_date, end_date, current_page, access_token):
         return False
     
 
+def fetch_airbus_tile(bbox, start_date, end_date, access_token, max_pages=None):
+    """Pages through one tile, returns (features, is_truncated), raises TileFetchError when a page fails."""
+    tile_features = []
+    current_page = START_PAGE
+    while max_pages is None or current_page < START_PAGE + max_pages:
+        response_data = airbus_catalog_api(bbox, start_date, end_date, current_page, access_token)
+        if not response_data:
+            raise TileFetchError(f"Airbus page {current_page} failed", tile_features)
+        tile_features.extend(response_data.get("features", []))
+        if response_data.get("totalResults", 0) <= (current_page * ITEMS_PER_PAGE):
+            return tile_features, False
+        current_page += 1
+    return tile_features, True
+
+
 def fetch_and_process_airbus_products_records():
     access_token = get_acces_token()
     page = 1
@@ -302,49 +319,47 @@ def fetch_and_process_airbus_products_records():
     return features
 
 
+def iter_airbus_pages(bbox, start_date, end_date, access_token):
+    """Yields the features of each date batch tile by tile."""
+    current_date = start_date
+    global BATCH_SIZE
+    date_difference = (end_date - current_date).days + 1
+    if date_difference < BATCH_SIZE:
+        BATCH_SIZE = date_difference
+    duration = math.ceil(date_difference / BATCH_SIZE)
+    print("Batch Size: ", BATCH_SIZE, ", days: ", date_difference)
+    print("Duration :", duration, "batch")
+    while current_date <= end_date:
+        start_date_str = current_date.isoformat()
+        if (end_date - current_date).days > 1:
+            end_date_str = (
+                current_date + timedelta(days=BATCH_SIZE)
+            ).isoformat()
+        else:
+            end_date_str = end_date.isoformat()
+
+        is_complete = yield from iter_sharded_features(
+            "airbus",
+            bbox,
+            lambda tile, max_pages: fetch_airbus_tile(tile, start_date_str, end_date_str, access_token, max_pages),
+            lambda feature: feature.get("properties", {}).get("id"),
+            window=(start_date_str, end_date_str),
+            completed_tiles=get_completed_catalog_tiles("airbus", start_date_str, end_date_str),
+        )
+        if is_complete:
+            yield CatalogCheckpointMark(start_date_str, end_date_str)
+        current_date += timedelta(days=BATCH_SIZE)
+
+
 def search_images(bbox, start_date, end_date, is_bulk=False):
     """Search for images in the Airbus OneAtlas catalog."""
-    all_features = []
     access_token = get_acces_token()
     if access_token:
-        current_date = start_date
-        global BATCH_SIZE
-        date_difference = (end_date - current_date).days + 1
-        if date_difference < BATCH_SIZE:
-            BATCH_SIZE = date_difference
-        duration = math.ceil(date_difference / BATCH_SIZE)
-        print("Batch Size: ", BATCH_SIZE, ", days: ", date_difference)
-        print("Duration :", duration, "batch")
-        total_items = 0
-        while current_date <= end_date:
-            current_page = START_PAGE
-            while True:
-                start_date_str = current_date.isoformat()
-                if (end_date - current_date).days > 1:
-                    end_date_str = (
-                        current_date + timedelta(days=BATCH_SIZE)
-                    ).isoformat()
-                else:
-                    end_date_str = end_date.isoformat()
-
-                response_data = airbus_catalog_api(
-                    bbox, start_date_str, end_date_str, current_page, access_token
-                )
-                if response_data:
-                    all_features.extend(response_data.get("features", []))
-                    if response_data.get("totalResults", 0) <= (current_page * ITEMS_PER_PAGE):
-                        total_items += response_data.get("totalResults", 0)
-                        break
-                else:
-                    break
-                current_page += 1
-            current_date += timedelta(days=BATCH_SIZE)
-        
-        print("Total Items: ", len(all_features))
-        data, images = process_features(all_features)
+        pages = iter_airbus_pages(bbox, start_date, end_date, access_token)
         # download_and_upload_images(images, access_token, "airbus/thumbnails")
-        process_database_catalog(data, start_date.isoformat(), end_date.isoformat(), "airbus", is_bulk)
-        print("Completed Processing Airbus: Total Items: {}".format(total_items))
+        batches = iter_catalog_batches(pages, lambda features: process_features(features)[0])
+        process_database_catalog_stream(batches, start_date.isoformat(), end_date.isoformat(), "airbus", is_bulk)
+        print("Completed Processing Airbus")
     else:
         logging.error(f"Failed to authenticate")
         pass
@@ -352,26 +367,10 @@ def search_images(bbox, start_date, end_date, is_bulk=False):
 
 def run_airbus_catalog_api():
     BBOX = "-180,-90,180,90"
-    START_DATE = (
-        SatelliteDateRetrievalPipelineHistory.objects.filter(vendor_name="airbus")
-        .order_by("-end_datetime")
-        .first()
-    )
-    if not START_DATE:
-        START_DATE = datetime(
-            datetime.now().year,
-            datetime.now().month,
-            datetime.now().day,
-            tzinfo=pytz.utc,
-        )
-    else:
-        START_DATE = START_DATE.end_datetime
-        print(f"From DB: {START_DATE}")
-
-    END_DATE = get_utc_time()
-    START_DATE = START_DATE.replace(hour=0, minute=0, second=0, microsecond=0)
-    print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
-    response = search_images(BBOX, START_DATE, END_DATE, False)
+    response = None
+    for START_DATE, END_DATE in get_catalog_run_windows("airbus"):
+        print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
+        response = search_images(BBOX, START_DATE, END_DATE, False)
     return response
 
 def run_airbus_catalog_api_bulk():
@@ -5,7 +5,9 @@ import shutil
 from decouple import config
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core.utils import save_image_in_s3_and_get_url, process_database_catalog, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local,remove_z_from_geometry, mark_record_as_purchased
+from core.utils import save_image_in_s3_and_get_url, process_database_catalog, process_database_catalog_stream, iter_catalog_batches, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local,remove_z_from_geometry, mark_record_as_purchased, get_catalog_run_windows, get_completed_catalog_tiles, CatalogCheckpointMark
+from core.services.http_client import vendor_request
+from core.services.spatial_sharding import iter_sharded_features, TileFetchError
 from botocore.exceptions import NoCredentialsError
 import numpy as np
 from rasterio.transform import from_bounds
@@ -46,7 +48,7 @@ def get_blacksky_collections(
     if last_scene_id:
         params["searchAfterId"] = last_scene_id
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = vendor_request("blacksky", "GET", url, params=params, headers=headers)
         return response.json()
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -230,36 +232,49 @@ def convert_to_model_params(features):
     return converted_features[::-1]
 
 
-def fetch_and_process_records(auth_token, bbox, start_time, end_time, last_scene_id, is_bulk):
-    """Fetches records from the BlackSky API and processes them."""
-    all_records = []
-    last_record_scene_id = last_scene_id
-    while True:
-        if last_record_scene_id:
-            records = get_blacksky_collections(
-                auth_token,
-                bbox=bbox,
-                datetime_range=f"{start_time}/{end_time}",
-                last_scene_id=last_record_scene_id,
-            )
-        else:
-            records = get_blacksky_collections(
-                auth_token, bbox=bbox, datetime_range=f"{start_time}/{end_time}"
-            )
-        if not records.get("features", []):
-            break
+def fetch_blacksky_tile(auth_token, bbox, start_time, end_time, max_pages=None):
+    """Pages through one tile with the searchAfterId cursor, returns (features, is_truncated), raises TileFetchError when a page fails."""
+    tile_features = []
+    last_record_scene_id = None
+    page = 0
+    while max_pages is None or page < max_pages:
+        records = get_blacksky_collections(
+            auth_token,
+            bbox=bbox,
+            datetime_range=f"{start_time}/{end_time}",
+            last_scene_id=last_record_scene_id,
+        )
+        if records is None:
+            raise TileFetchError(f"BlackSky page {page + 1} failed", tile_features)
+        features = records.get("features", [])
+        if not features:
+            return tile_features, False
+
+        tile_features.extend(features)
+        last_record_scene_id = features[-1].get("id")
+        page += 1
+    return tile_features, True
+
+
+def iter_blacksky_pages(auth_token, bbox, start_time, end_time):
+    is_complete = yield from iter_sharded_features(
+        "blacksky",
+        bbox,
+        lambda tile, max_pages: fetch_blacksky_tile(auth_token, tile, start_time, end_time, max_pages),
+        lambda feature: feature.get("id"),
+        window=(start_time, end_time),
+        completed_tiles=get_completed_catalog_tiles("blacksky", start_time, end_time),
+    )
+    if is_complete:
+        yield CatalogCheckpointMark(start_time, end_time)
 
-        all_records.extend(records.get("features", []))
-        last_record = records.get("features", [])[-1]
-        last_record_scene_id = last_record.get("id")
 
-    if not all_records:
-        return 0
-    print(len(all_records))
+def fetch_and_process_records(auth_token, bbox, start_time, end_time, is_bulk):
+    """Streams records from the BlackSky API into the catalog tile by tile."""
+    pages = iter_blacksky_pages(auth_token, bbox, start_time, end_time)
     # download_and_upload_images(all_records, "blacksky/thumbnails")
-    converted_features = convert_to_model_params(all_records)
-    process_database_catalog(converted_features, start_time, end_time, "blacksky", is_bulk)
-    return len(all_records)
+    batches = iter_catalog_batches(pages, convert_to_model_params)
+    return process_database_catalog_stream(batches, start_time, end_time, "blacksky", is_bulk)
 
 
 def fetch_and_process_products_records():
@@ -333,7 +348,7 @@ def hq_product_artifacts_png(feature):
     except Exception as e:
         print(e)
 
-def main(START_DATE, END_DATE, BBOX, last_scene_id, is_bulk):
+def main(START_DATE, END_DATE, BBOX, is_bulk):
     bboxes = [BBOX]
     current_date = START_DATE
     end_date = END_DATE
@@ -345,7 +360,6 @@ def main(START_DATE, END_DATE, BBOX, last_scene_id, is_bulk):
     print("-" * columns)
     print("Batch Size: ", BATCH_SIZE, ", days: ", date_difference)
     print("Duration :", duration, "batch")
-    total_records = 0
     while current_date <= end_date:
         start_time = current_date.isoformat()
         if (end_date - current_date).days > 1:
@@ -354,46 +368,20 @@ def main(START_DATE, END_DATE, BBOX, last_scene_id, is_bulk):
             end_time = end_date.isoformat()
 
         for bbox in bboxes:
-            response = fetch_and_process_records(
-                AUTH_TOKEN, bbox, start_time, end_time, last_scene_id, is_bulk
+            fetch_and_process_records(
+                AUTH_TOKEN, bbox, start_time, end_time, is_bulk
             )
-            if response:
-                total_records += response
 
         current_date += timedelta(days=BATCH_SIZE)
     print("Completed processing BlackSky data")
-    return total_records
 
 
 def run_blacksky_catalog_api():
     BBOX = "-180,-90,180,90"
-    START_DATE = (
-        SatelliteDateRetrievalPipelineHistory.objects.filter(vendor_name="blacksky")
-        .order_by("-end_datetime")
-        .first()
-    )
-    if not START_DATE:
-        START_DATE = datetime(
-            datetime.now().year,
-            datetime.now().month,
-            datetime.now().day,
-            tzinfo=pytz.utc,
-        )
-        last_scene_id = None
-    else:
-        START_DATE = START_DATE.end_datetime
-        last_scene_id = (
-            CollectionCatalog.objects.filter(vendor_name="blacksky")
-            .order_by("-acquisition_datetime")
-            .first()
-            .vendor_id
-        )
-        print(f"From DB: {START_DATE}")
-
-    END_DATE = get_utc_time()
-    START_DATE = START_DATE.replace(hour=0, minute=0, second=0, microsecond=0)
-    print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
-    response = main(START_DATE, END_DATE, BBOX, last_scene_id, False)
+    response = None
+    for START_DATE, END_DATE in get_catalog_run_windows("blacksky"):
+        print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
+        response = main(START_DATE, END_DATE, BBOX, False)
     return response
 
 def run_blacksky_catalog_bulk_api():
@@ -406,7 +394,7 @@ def run_blacksky_catalog_bulk_api():
         END_DATE = min(START_DATE + timedelta(days=1), END_LIMIT)
         print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
         month_start_time = time.time()
-        response = main(START_DATE, END_DATE, BBOX, None, True)
+        response = main(START_DATE, END_DATE, BBOX, True)
         month_end_time = time.time()
         print(f"Time taken to process the interval: {month_end_time - month_start_time}")
 
@@ -423,7 +411,7 @@ def run_blacksky_catalog_bulk_api_for_last_35_days_from_now():
         END_DATE = min(START_DATE + timedelta(days=1), END_LIMIT)
         print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
         month_start_time = time.time()
-        response = main(START_DATE, END_DATE, BBOX, None, True)
+        response = main(START_DATE, END_DATE, BBOX, True)
         month_end_time = time.time()
         print(f"Time taken to process the interval: {month_end_time - month_start_time}")
         time.sleep(5)
@@ -12,7 +12,10 @@ from decouple import config
 from datetime import datetime
 from django.contrib.gis.geos import Polygon
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core.utils import save_image_in_s3_and_get_url, process_database_catalog, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local
+from celery.exceptions import SoftTimeLimitExceeded
+from core.utils import save_image_in_s3_and_get_url, process_database_catalog, process_database_catalog_stream, iter_catalog_batches, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local, get_catalog_run_windows, get_completed_catalog_tiles, CatalogCheckpointMark
+from core.services.http_client import vendor_request
+from core.services.spatial_sharding import fetch_sharded_features, TileFetchError
 from botocore.exceptions import NoCredentialsError
 import numpy as np
 from rasterio.transform import from_bounds
@@ -164,8 +167,8 @@ def download_and_upload_images(features, path, max_workers=5):
             except Exception as e:
                 print(f"Exception occurred for feature {feature.get('id')}: {e}")
 
-def query_api_with_retries(access_token, bbox, start_datetime, end_datetime):
-    """Query the API with retries and token refresh handling."""
+def query_api_with_retries(access_token, bbox, start_datetime, end_datetime, max_pages=None):
+    """Query the API with retries and token refresh handling, returns (features, is_truncated), raises TileFetchError when a page fails."""
     bbox = list(map(float, bbox.split(",")))
     retry_count = 0
     all_features = []
@@ -183,16 +186,18 @@ def query_api_with_retries(access_token, bbox, start_datetime, end_datetime):
                 "Authorization": f"Bearer {access_token}",
                 "Content-Type": "application/json",
             }
-            response = requests.post(next_url, json=request_body, headers=headers)
+            response = vendor_request("capella", "POST", next_url, json=request_body, headers=headers)
             response.raise_for_status()
             response_json = response.json()
             if response_json.get("features"):
                 all_features += response_json.get("features")
             if response_json.get("links") and response_json["links"][0]['rel'] == "next":
+                if max_pages is not None and page >= max_pages:
+                    return all_features, True
                 page += 1
             else:
                 break
-        return all_features
+        return all_features, False
     except requests.RequestException as e:
         logging.error(f"API request failed: {e}")
 
@@ -212,6 +217,7 @@ def query_api_with_retries(access_token, bbox, start_datetime, end_datetime):
     except Exception as e:
         import traceback
         traceback.print_exc()
+    raise TileFetchError(f"Capella page {page} failed", all_features)
 
 def process_single_feature(feature):
     try:
@@ -288,6 +294,8 @@ def filter_duplicate_records_based_on_capella_collect_id(features):
                 collect_id_dict[collect_id].append(feature)
             else:
                 collect_id_dict[collect_id] = [feature]
+        except SoftTimeLimitExceeded:
+            raise
         except Exception as e:
             logging.error(f"Error processing feature: {e}")
     
@@ -299,15 +307,8 @@ def filter_duplicate_records_based_on_capella_collect_id(features):
         filtered_features.append(feature_list[0])
     return filtered_features
 
-def search_images(start_date, end_date, bbox, is_bulk):
-    bboxes = [bbox]
-    access_token = get_access_token(USERNAME, PASSWORD)
-    token_info = get_access_token(USERNAME, PASSWORD)
-    if token_info:
-        access_token = token_info["accessToken"]
-    else:
-        logging.error("Failed to obtain access token. Exiting...")
-        return
+def iter_capella_pages(start_date, end_date, bboxes, access_token):
+    """Yields the records of each date batch, buffered per batch so collects can be grouped by collect id."""
     current_date = start_date
     global BATCH_SIZE
     date_difference = (end_date - current_date).days + 1
@@ -317,7 +318,6 @@ def search_images(start_date, end_date, bbox, is_bulk):
     print("-" * columns)
     print("Batch Size: ", BATCH_SIZE, ", days: ", date_difference)
     print("Duration :", duration, "batch")
-    total_records = []
     while current_date <= end_date:
         start_time = current_date.isoformat()
         if (end_date - current_date).days > 1:
@@ -325,47 +325,50 @@ def search_images(start_date, end_date, bbox, is_bulk):
         else:
             end_time = end_date.isoformat()
 
+        batch_records = []
+        is_complete = True
         for bbox in bboxes:
-            response = query_api_with_retries(
-                access_token,
+            response, bbox_complete = fetch_sharded_features(
+                "capella",
                 bbox,
-                start_time,
-                end_time,
+                lambda tile, max_pages: query_api_with_retries(access_token, tile, start_time, end_time, max_pages),
+                lambda feature: feature.get("id"),
             )
+            is_complete &= bbox_complete
             if response:
-                total_records += response
+                batch_records += response
+
+        print("Total Records: ", len(batch_records))
+        batch_records = filter_duplicate_records_based_on_capella_collect_id(batch_records)
+        print("Unique Records: ", len(batch_records))
+        yield batch_records
+        # The batch is buffered for the collect id grouping, so there are no tile marks: a window with a
+        # failed tile stays open and is searched again as a whole next run
+        if is_complete:
+            yield CatalogCheckpointMark(start_time, end_time)
 
         current_date += timedelta(days=BATCH_SIZE)
 
-    print("Total Records: ", len(total_records))
-    total_records = filter_duplicate_records_based_on_capella_collect_id(total_records)
-    print("Unique Records: ", len(total_records))
-    converted_records = process_features(total_records)
+def search_images(start_date, end_date, bbox, is_bulk):
+    bboxes = [bbox]
+    access_token = get_access_token(USERNAME, PASSWORD)
+    token_info = get_access_token(USERNAME, PASSWORD)
+    if token_info:
+        access_token = token_info["accessToken"]
+    else:
+        logging.error("Failed to obtain access token. Exiting...")
+        return
+    pages = iter_capella_pages(start_date, end_date, bboxes, access_token)
     # download_and_upload_images(converted_records, "capella/thumbnails")
-    process_database_catalog(converted_records, start_date.isoformat(), end_date.isoformat(), 'capella', is_bulk)
+    batches = iter_catalog_batches(pages, process_features)
+    process_database_catalog_stream(batches, start_date.isoformat(), end_date.isoformat(), 'capella', is_bulk)
 
 def run_capella_catalog_api():
     BBOX = "-180,-90,180,90"
-    START_DATE = (
-        SatelliteDateRetrievalPipelineHistory.objects.filter(vendor_name="capella")
-        .order_by("-end_datetime")
-        .first()
-    )
-    if not START_DATE:
-        START_DATE = datetime(
-            datetime.now().year,
-            datetime.now().month,
-            datetime.now().day,
-            tzinfo=pytz.utc,
-        )
-    else:
-        START_DATE = START_DATE.end_datetime
-        print(f"From DB: {START_DATE}")
-
-    END_DATE = get_utc_time()
-    START_DATE = START_DATE.replace(hour=0, minute=0, second=0, microsecond=0)
-    print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
-    response = search_images(START_DATE, END_DATE, BBOX, False)
+    response = None
+    for START_DATE, END_DATE in get_catalog_run_windows("capella"):
+        print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
+        response = search_images(START_DATE, END_DATE, BBOX, False)
     return response
 
 
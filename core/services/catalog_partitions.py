@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+from decouple import config
+from django.db import connection
+
+CATALOG_TABLE = "core_collectioncatalog"
+DEFAULT_PARTITION = "core_collectioncatalog_default"
+UNPARTITIONED_TABLE = "core_collectioncatalog_unpartitioned"
+CATALOG_PARTITION_MONTHS_AHEAD = config("CATALOG_PARTITION_MONTHS_AHEAD", default=3, cast=int)
+
+
+def get_month_start(value, months=0):
+    """First instant (UTC) of the month of value, shifted by months."""
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def get_partition_name(month_start):
+    return f"{CATALOG_TABLE}_{month_start.year}_{month_start.month:02d}"
+
+
+def create_catalog_partition(month_start):
+    """
+    Create the partition of the month of month_start unless it exists, rows of that month sitting in
+    the default partition are moved into it. Returns the partition name.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT core_create_catalog_partition(%s)", [get_month_start(month_start)])
+        return cursor.fetchone()[0]
+
+
+def ensure_future_catalog_partitions(months_ahead=CATALOG_PARTITION_MONTHS_AHEAD):
+    """
+    Create the partitions of the current month and the next months_ahead months, so ingest never
+    lands in the default partition. Safe to run any number of times, returns the partitions created.
+    """
+    created_partitions = []
+    existing_partitions = {name for name, _, _ in get_catalog_partitions()}
+    now = datetime.now(timezone.utc)
+    for months in range(months_ahead + 1):
+        month_start = get_month_start(now, months)
+        if get_partition_name(month_start) not in existing_partitions:
+            created_partitions.append(create_catalog_partition(month_start))
+    if created_partitions:
+        print(f"Created catalog partitions: {', '.join(created_partitions)}")
+    return created_partitions
+
+
+def get_catalog_partitions():
+    """List of (partition name, bound expression, estimated rows), oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples::bigint
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [CATALOG_TABLE],
+        )
+        return cursor.fetchall()
+
+
+def move_default_partition_rows():
+    """Give every month found in the default partition its own partition, returns the partitions created."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', acquisition_datetime AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}")
+        months = [row[0].replace(tzinfo=timezone.utc) for row in cursor.fetchall()]
+    return [create_catalog_partition(month_start) for month_start in sorted(months)]
+
+
+def vacuum_catalog_partitions(months=2, reindex=False):
+    """
+    VACUUM ANALYZE (and optionally REINDEX CONCURRENTLY) the partitions of the last months only,
+    older months do not change once their ingest windows have passed.
+    Must run outside of a transaction.
+    """
+    now = datetime.now(timezone.utc)
+    existing_partitions = {name for name, _, _ in get_catalog_partitions()}
+    with connection.cursor() as cursor:
+        for offset in range(months):
+            partition_name = get_partition_name(get_month_start(now, -offset))
+            if partition_name not in existing_partitions:
+                continue
+            print(f"Vacuuming {partition_name}...")
+            cursor.execute(f"VACUUM ANALYZE {partition_name}")
+            if reindex:
+                cursor.execute(f"REINDEX TABLE CONCURRENTLY {partition_name}")
+
+
+def drop_unpartitioned_catalog():
+    """Drop the table kept by migration 0015 once the partitioned table holds at least as many rows."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [UNPARTITIONED_TABLE])
+        if cursor.fetchone()[0] is None:
+            print(f"{UNPARTITIONED_TABLE} already dropped")
+            return False
+
+        cursor.execute(f"SELECT COUNT(*) FROM {UNPARTITIONED_TABLE}")
+        unpartitioned_count = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) FROM {CATALOG_TABLE}")
+        partitioned_count = cursor.fetchone()[0]
+        if partitioned_count < unpartitioned_count:
+            print(f"Not dropping {UNPARTITIONED_TABLE}: {unpartitioned_count} rows, partitioned table has {partitioned_count}")
+            return False
+
+        cursor.execute(f"DROP TABLE {UNPARTITIONED_TABLE}")
+        print(f"Dropped {UNPARTITIONED_TABLE} ({unpartitioned_count} rows, partitioned table has {partitioned_count})")
+        return True
+
+
+if __name__ == "__main__":
+    ensure_future_catalog_partitions()
+
+
+# from core.services.catalog_partitions import *
+# ensure_future_catalog_partitions()
+# get_catalog_partitions()
+# move_default_partition_rows()
+# vacuum_catalog_partitions(months=2, reindex=True)
+# drop_unpartitioned_catalog()
@@ -5,10 +5,9 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from shapely.geometry import Polygon
 import json
-import geopandas as gpd
-from shapely.geometry import Point
+from core.services.geocoder import reverse_geocode_points
 
-BATCH_SIZE = 100  # Number of records per batch
+BATCH_SIZE = 1000  # Number of records per batch
 THREAD_COUNT = os.cpu_count()  # Number of threads to use (adjust based on your system's resources)
 
 
@@ -32,19 +31,9 @@ def process_batch(offset, batch_number, total_batches):
             if not records:
                 return 0  # No records left to process
             
-            base_dir = os.getcwd() # Construct absolute paths dynamically
-            states_shapefile = os.path.join(base_dir, "static", "shapesFiles", "state_provinces", "ne_10m_admin_1_states_provinces.shp")
-            marine_shapefile = os.path.join(base_dir, "static", "shapesFiles", "marine_polys", "ne_10m_geography_marine_polys.shp")
-
-            # check if the shapefiles exist
-            if not os.path.exists(states_shapefile) or not os.path.exists(marine_shapefile):
-                raise FileNotFoundError("Shapefiles not found.")
-
-            states = gpd.read_file(states_shapefile)
-            marine = gpd.read_file(marine_shapefile)
-            
-
-            update_data = []
+            record_ids = []
+            lats = []
+            lons = []
 
             for record in records:
                 record_id = record[0]
@@ -52,28 +41,21 @@ def process_batch(offset, batch_number, total_batches):
 
                 try:
                     polygon = Polygon(coordinate_record["coordinates"][0])  # Ensure GeoJSON format
-                    lat, lon = polygon.centroid.y, polygon.centroid.x
-                    point = Point(lon, lat)
-
-                    match = states[states.geometry.intersects(point)]
-                    if not match.empty:
-                        region = match.iloc[0]["admin"]
-                        local = match.iloc[0]["gn_name"]
-                        update_data.append((region, local, record_id))
-                        continue 
-
-                    match = marine[marine.geometry.intersects(point)]
-                    if not match.empty:
-                        region = match.iloc[0]["name_en"]
-                        local = f"{lat}, {lon}"
-                        update_data.append((region, local, record_id))
-                        continue
-                    update_data.append(("International Waters", f"{lat}, {lon}", record_id))
+                    centroid = polygon.centroid
+                    lats.append(centroid.y)
+                    lons.append(centroid.x)
+                    record_ids.append(record_id)
                 except Exception as e:
                     import traceback
                     traceback.print_exc()
                     print(f"Error processing record ID {record_id}: {e}")
 
+            # Shapefiles are loaded once per process, the whole batch is geocoded in one spatial join
+            update_data = [
+                (region, local, record_id)
+                for (region, local), record_id in zip(reverse_geocode_points(lats, lons), record_ids)
+            ]
+
             if update_data:
                 query = "UPDATE core_collectioncatalog SET centroid_region=%s, centroid_local=%s WHERE id=%s"
                 cursor.executemany(query, update_data)
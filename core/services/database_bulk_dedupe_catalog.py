@@ -0,0 +1,102 @@
+from django.db import connections, transaction
+
+# Each identity key of core_collectioncatalog, the oldest row (lowest id) of a duplicate group is kept
+DUPLICATE_KEYS = {
+    "vendor_id": {
+        "partition": "vendor_name, vendor_id",
+        "condition": "vendor_id IS NOT NULL",
+    },
+    "acquisition_md5": {
+        "partition": "vendor_name, acquisition_datetime, coordinates_record_md5",
+        "condition": "acquisition_datetime IS NOT NULL AND coordinates_record_md5 IS NOT NULL",
+    },
+}
+
+
+def count_duplicates(cursor, partition, condition):
+    """Count the rows that would be removed for one identity key."""
+    cursor.execute(
+        f"""
+        SELECT COALESCE(SUM(duplicates), 0) FROM (
+            SELECT COUNT(*) - 1 AS duplicates
+            FROM core_collectioncatalog
+            WHERE {condition}
+            GROUP BY {partition}
+            HAVING COUNT(*) > 1
+        ) AS duplicate_groups;
+        """
+    )
+    return cursor.fetchone()[0]
+
+
+def remove_duplicates(cursor, partition, condition):
+    """Keep the oldest row of each duplicate group, carrying the purchased flag over before deleting the rest."""
+    cursor.execute(
+        f"""
+        UPDATE core_collectioncatalog SET is_purchased = TRUE
+        WHERE id IN (
+            SELECT MIN(id)
+            FROM core_collectioncatalog
+            WHERE {condition}
+            GROUP BY {partition}
+            HAVING COUNT(*) > 1 AND BOOL_OR(is_purchased)
+        );
+        """
+    )
+    # The raw vendor features and site links of the removed rows go with them
+    cursor.execute(
+        f"""
+        WITH deleted AS (
+            DELETE FROM core_collectioncatalog
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY id) AS row_number
+                    FROM core_collectioncatalog
+                    WHERE {condition}
+                ) AS ranked
+                WHERE ranked.row_number > 1
+            )
+            RETURNING id
+        ), deleted_metadata AS (
+            DELETE FROM core_collectioncatalogmetadata WHERE catalog_id IN (SELECT id FROM deleted)
+        ), deleted_site_captures AS (
+            DELETE FROM api_sitecapture WHERE catalog_id IN (SELECT id FROM deleted)
+        )
+        SELECT COUNT(*) FROM deleted;
+        """
+    )
+    return cursor.fetchone()[0]
+
+
+def dedupe_catalog(dry_run=True):
+    """Remove duplicate catalog records so the unique constraints on vendor identity can be created."""
+    try:
+        db_conn = connections["default"]
+        total_removed = 0
+
+        with transaction.atomic(), db_conn.cursor() as cursor:
+            for key_name, key in DUPLICATE_KEYS.items():
+                if dry_run:
+                    duplicates = count_duplicates(cursor, key["partition"], key["condition"])
+                    print(f"{key_name}: {duplicates} duplicate records would be removed")
+                    total_removed += duplicates
+                else:
+                    removed = remove_duplicates(cursor, key["partition"], key["condition"])
+                    print(f"{key_name}: removed {removed} duplicate records")
+                    total_removed += removed
+
+        print(f"Total duplicate records {'found' if dry_run else 'removed'}: {total_removed}")
+        return total_removed
+
+    except Exception as e:
+        print(f"Error while removing duplicate catalog records: {e}")
+        return 0
+
+
+if __name__ == "__main__":
+    dedupe_catalog(dry_run=True)
+
+
+# from core.services.database_bulk_dedupe_catalog import dedupe_catalog
+# dedupe_catalog(dry_run=True)
+# dedupe_catalog(dry_run=False)
@@ -0,0 +1,72 @@
+import json
+import copy
+import time
+from datetime import datetime, timedelta
+from django.db import transaction
+from core.services.blacksky_catalog_api import process_single_feature
+from core.utils import bulk_save_catalog_records, save_catalog_records_per_row
+
+RECORD_COUNT = 2000  # Number of synthetic records per run
+EXAMPLE_RECORD_PATH = "static/vendor_records_example/Blacksky.json"
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the benchmark inserts."""
+
+
+def generate_features(record_count):
+    """Build unique model params from the BlackSky example record, shifting time and footprint per copy."""
+    with open(EXAMPLE_RECORD_PATH, "r") as f:
+        example_record = json.load(f)
+
+    base_datetime = datetime.fromisoformat(example_record["properties"]["datetime"].replace("Z", "+00:00"))
+    features = []
+    for index in range(record_count):
+        record = copy.deepcopy(example_record)
+        offset = (index % 1000) * 0.01
+        record["id"] = f"benchmark-{index}-{example_record['id']}"
+        record["properties"]["datetime"] = (base_datetime - timedelta(seconds=index)).isoformat().replace("+00:00", "Z")
+        record["geometry"]["coordinates"] = [
+            [[lon + offset, lat] for lon, lat in ring] for ring in record["geometry"]["coordinates"]
+        ]
+        model_params = process_single_feature(record)
+        if model_params:
+            model_params["centroid_region"] = "Benchmark"
+            model_params["centroid_local"] = "Benchmark"
+            features.append(model_params)
+    return features
+
+
+def time_insert(name, save_function, features):
+    """Run one insert path inside a transaction that is always rolled back."""
+    start_time = time.time()
+    try:
+        with transaction.atomic():
+            valid, duplicate, invalid = save_function(features)
+            elapsed = time.time() - start_time
+            raise RollbackBenchmark()
+    except RollbackBenchmark:
+        pass
+    print(f"{name}: {len(features)} records in {elapsed:.2f}s ({len(features) / elapsed:.0f} records/s), Valid: {valid}, Duplicate: {duplicate}, Invalid: {invalid}")
+    return elapsed
+
+
+def run_insert_benchmark(record_count=RECORD_COUNT):
+    """Compare the per-row serializer save with the set-based bulk insert on the same records."""
+    try:
+        features = generate_features(record_count)
+        print(f"Generated {len(features)} records")
+
+        per_row_time = time_insert("Per row insert", save_catalog_records_per_row, features)
+        bulk_time = time_insert("Bulk insert", bulk_save_catalog_records, features)
+        print(f"Speedup: {per_row_time / bulk_time:.1f}x")
+    except Exception as e:
+        print(f"Error while running insert benchmark: {e}")
+
+
+if __name__ == "__main__":
+    run_insert_benchmark()
+
+
+# from core.services.database_bulk_insert_benchmark import run_insert_benchmark
+# run_insert_benchmark()
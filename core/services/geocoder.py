@@ -0,0 +1,219 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from decouple import config
+
+STATES_SHAPEFILE = os.path.join("static", "shapesFiles", "state_provinces", "ne_10m_admin_1_states_provinces.shp")
+MARINE_SHAPEFILE = os.path.join("static", "shapesFiles", "marine_polys", "ne_10m_geography_marine_polys.shp")
+REGION_GRID_PATH = config("REGION_GRID_PATH", default=os.path.join("static", "shapesFiles", "region_grid", "region_grid.int16"))
+REGION_GRID_RESOLUTION = config("REGION_GRID_RESOLUTION", default=0.05, cast=float)  # Degrees per cell
+DEFAULT_REGION = "International Waters"
+UNKNOWN_REGION = "Unknown"
+
+# Region grid cell values, positive values index the region table
+GRID_NO_REGION = 0
+GRID_BOUNDARY = -1
+
+_layers = None
+_grid = None
+_lock = threading.Lock()
+
+
+def load_geocoder_layers():
+    """
+    Read the states and marine shapefiles once per process and build their spatial indexes.
+    Returns (states, marine) GeoDataFrames holding only the columns used by the geocoder.
+    """
+    global _layers
+    with _lock:
+        if _layers is None:
+            base_dir = os.getcwd()
+            states_shapefile = os.path.join(base_dir, STATES_SHAPEFILE)
+            marine_shapefile = os.path.join(base_dir, MARINE_SHAPEFILE)
+
+            if not os.path.exists(states_shapefile) or not os.path.exists(marine_shapefile):
+                raise FileNotFoundError("Shapefiles not found.")
+
+            states = gpd.read_file(states_shapefile)[["admin", "gn_name", "geometry"]]
+            marine = gpd.read_file(marine_shapefile)[["name_en", "geometry"]]
+
+            # The STRtree is built lazily on first access, build it here while holding the lock
+            states.sindex
+            marine.sindex
+            _layers = (states, marine)
+        return _layers
+
+
+def get_region_grid_metadata_path(grid_path):
+    return os.path.splitext(grid_path)[0] + ".json"
+
+
+def load_region_grid():
+    """
+    Memory map the precomputed region grid once per process.
+    Returns (grid, regions, resolution), or None when the grid has not been built.
+    """
+    global _grid
+    with _lock:
+        if _grid is None:
+            grid_path = os.path.join(os.getcwd(), REGION_GRID_PATH)
+            metadata_path = get_region_grid_metadata_path(grid_path)
+            if not os.path.exists(grid_path) or not os.path.exists(metadata_path):
+                _grid = False
+            else:
+                with open(metadata_path, "r") as f:
+                    metadata = json.load(f)
+                grid = np.memmap(grid_path, dtype=np.int16, mode="r", shape=(metadata["rows"], metadata["cols"]))
+                _grid = (grid, metadata["regions"], metadata["resolution"])
+        return _grid or None
+
+
+def build_region_grid(resolution=REGION_GRID_RESOLUTION, grid_path=REGION_GRID_PATH):
+    """
+    Rasterize the states and marine polygons into a global int16 grid stored next to a json region table.
+
+    A cell holds the table index of the first state (file order) covering its center, else the first
+    marine polygon, else GRID_NO_REGION. Cells crossed by any polygon edge are GRID_BOUNDARY so points
+    falling in them are resolved with the exact polygon test. Rebuild after replacing the shapefiles.
+    """
+    from rasterio.features import rasterize
+    from rasterio.transform import from_origin
+
+    try:
+        states, marine = load_geocoder_layers()
+        if len(states) + len(marine) >= np.iinfo(np.int16).max:
+            raise ValueError("Too many polygons for an int16 region grid.")
+
+        rows = int(round(180 / resolution))
+        cols = int(round(360 / resolution))
+        transform = from_origin(-180, 90, resolution, resolution)
+        print(f"Building {rows}x{cols} region grid at {resolution} degrees...")
+
+        regions = [None]
+        for admin, gn_name in zip(states["admin"], states["gn_name"]):
+            regions.append([admin, gn_name])
+        for name_en in marine["name_en"]:
+            regions.append([name_en, None])
+
+        # Later shapes overwrite earlier ones, rasterize in reverse so the first polygon of a layer wins
+        state_shapes = [(geometry, index + 1) for index, geometry in enumerate(states.geometry) if geometry is not None]
+        marine_shapes = [(geometry, len(states) + index + 1) for index, geometry in enumerate(marine.geometry) if geometry is not None]
+        grid = rasterize(reversed(state_shapes), out_shape=(rows, cols), transform=transform, fill=GRID_NO_REGION, dtype="int16")
+        marine_grid = rasterize(reversed(marine_shapes), out_shape=(rows, cols), transform=transform, fill=GRID_NO_REGION, dtype="int16")
+        grid = np.where(grid == GRID_NO_REGION, marine_grid, grid)
+
+        boundaries = [
+            (geometry.boundary, 1)
+            for geometry in list(states.geometry) + list(marine.geometry)
+            if geometry is not None
+        ]
+        is_boundary = rasterize(boundaries, out_shape=(rows, cols), transform=transform, fill=0, all_touched=True, dtype="uint8")
+        grid[is_boundary == 1] = GRID_BOUNDARY
+
+        grid_path = os.path.join(os.getcwd(), grid_path)
+        os.makedirs(os.path.dirname(grid_path), exist_ok=True)
+        output = np.memmap(grid_path, dtype=np.int16, mode="w+", shape=(rows, cols))
+        output[:] = grid
+        output.flush()
+        with open(get_region_grid_metadata_path(grid_path), "w") as f:
+            json.dump({"resolution": resolution, "rows": rows, "cols": cols, "regions": regions}, f)
+
+        boundary_cells = int((grid == GRID_BOUNDARY).sum())
+        print(f"Region grid written to {grid_path}, {boundary_cells}/{rows * cols} boundary cells")
+        return grid_path
+    except Exception as e:
+        print(f"Error while building region grid: {e}")
+        return None
+
+
+def first_matches(points, layer):
+    """Spatial join points against a layer, keeping the first layer row (file order) hit by each point."""
+    joined = gpd.sjoin(points, layer, how="inner", predicate="intersects")
+    joined = joined.sort_values("index_right", kind="stable")
+    return joined[~joined.index.duplicated(keep="first")]
+
+
+def geocode_exact(lats, lons, point_index, regions, locals_):
+    """Resolve the points at point_index against the polygons, writing into regions and locals_."""
+    states, marine = load_geocoder_layers()
+    points = gpd.GeoDataFrame(
+        index=point_index,
+        geometry=gpd.points_from_xy(lons[point_index], lats[point_index]),
+        crs=states.crs,
+    )
+
+    state_matches = first_matches(points, states)
+    regions[state_matches.index.to_numpy()] = state_matches["admin"].to_numpy()
+    for index, local in zip(state_matches.index, state_matches["gn_name"]):
+        locals_[index] = local
+
+    remaining = points.drop(index=state_matches.index)
+    if not remaining.empty:
+        marine_matches = first_matches(remaining, marine)
+        regions[marine_matches.index.to_numpy()] = marine_matches["name_en"].to_numpy()
+
+
+def geocode_grid(lats, lons, point_index, regions, locals_, region_grid):
+    """
+    Resolve the points at point_index with a grid cell lookup, writing into regions and locals_.
+    Returns the index of the points that fell in boundary cells and still need the exact test.
+    """
+    grid, grid_regions, resolution = region_grid
+    rows = np.clip(((90 - lats[point_index]) / resolution).astype(np.int64), 0, grid.shape[0] - 1)
+    cols = np.clip(((lons[point_index] + 180) / resolution).astype(np.int64), 0, grid.shape[1] - 1)
+    cells = np.asarray(grid[rows, cols])
+
+    for index, cell in zip(point_index[cells > GRID_NO_REGION], cells[cells > GRID_NO_REGION]):
+        region, local = grid_regions[cell]
+        regions[index] = region
+        if local is not None:
+            locals_[index] = local
+    return point_index[cells == GRID_BOUNDARY]
+
+
+def reverse_geocode_points(lats, lons):
+    """
+    Reverse geocode arrays of latitudes and longitudes in one pass.
+
+    Points inside a state or province get (admin, gn_name), points in a marine polygon get
+    (name_en, "lat, lon"), anything else is "International Waters". Points that are not numbers come
+    back as "Unknown". Same results as bungalowbe.utils.reverse_geocode_shapefile, one spatial join per
+    layer instead of a full polygon scan per point.
+
+    When the region grid has been built (build_region_grid), points are looked up in it and only the
+    points in cells crossed by a polygon edge go through the spatial join, the shapefiles are not read
+    at all until such a point shows up.
+
+    :param lats: Sequence of latitudes.
+    :param lons: Sequence of longitudes.
+    :return: List of (region, local) tuples in input order.
+    """
+    lats = pd.to_numeric(pd.Series(list(lats), dtype=object), errors="coerce").to_numpy(dtype=float)
+    lons = pd.to_numeric(pd.Series(list(lons), dtype=object), errors="coerce").to_numpy(dtype=float)
+    locals_ = [f"{lat}, {lon}" for lat, lon in zip(lats, lons)]
+    regions = np.full(len(lats), DEFAULT_REGION, dtype=object)
+
+    is_valid = ~(np.isnan(lats) | np.isnan(lons))
+    regions[~is_valid] = UNKNOWN_REGION
+    point_index = np.flatnonzero(is_valid)
+
+    region_grid = load_region_grid()
+    if region_grid and len(point_index):
+        point_index = geocode_grid(lats, lons, point_index, regions, locals_, region_grid)
+
+    if len(point_index):
+        geocode_exact(lats, lons, point_index, regions, locals_)
+
+    return list(zip(regions.tolist(), locals_))
+
+
+if __name__ == "__main__":
+    build_region_grid()
+
+
+# from core.services.geocoder import reverse_geocode_points, build_region_grid
+# build_region_grid()
+# reverse_geocode_points([34.0549, 0.0], [-118.2426, -30.0])
@@ -0,0 +1,67 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from decouple import config
+
+# Max in-flight requests per vendor, shared by every thread of the worker process
+VENDOR_MAX_CONCURRENCY = {
+    "blacksky": config("BLACKSKY_MAX_CONCURRENCY", default=4, cast=int),
+    "airbus": config("AIRBUS_MAX_CONCURRENCY", default=4, cast=int),
+    "planet": config("PLANET_MAX_CONCURRENCY", default=4, cast=int),
+    "capella": config("CAPELLA_MAX_CONCURRENCY", default=4, cast=int),
+    "maxar": config("MAXAR_MAX_CONCURRENCY", default=4, cast=int),
+    "skyfi-umbra": config("SKYFI_MAX_CONCURRENCY", default=5, cast=int),
+}
+DEFAULT_MAX_CONCURRENCY = 4
+REQUEST_TIMEOUT = (10, 120)  # (connect, read) seconds
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 1
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+_sessions = {}
+_semaphores = {}
+_lock = threading.Lock()
+
+
+def build_vendor_session(max_concurrency):
+    """Session with a keep-alive connection pool sized to the vendor concurrency and retries on throttling."""
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        allowed_methods=None,  # Catalog searches are read-only, POST included
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_vendor_session(vendor_name):
+    """Return the process wide session of a vendor, connections stay alive across pages, windows and tasks."""
+    with _lock:
+        if vendor_name not in _sessions:
+            max_concurrency = VENDOR_MAX_CONCURRENCY.get(vendor_name, DEFAULT_MAX_CONCURRENCY)
+            _sessions[vendor_name] = build_vendor_session(max_concurrency)
+            _semaphores[vendor_name] = threading.BoundedSemaphore(max_concurrency)
+        return _sessions[vendor_name]
+
+
+def vendor_request(vendor_name, method, url, **kwargs):
+    """
+    Send a request through the vendor session, waiting for a free slot when the vendor concurrency limit is reached.
+    Same signature and return value as requests.request.
+    Raises requests.HTTPError when a throttled or 5xx response is still failing once the retries are exhausted,
+    other statuses are returned to the caller as is.
+    """
+    session = get_vendor_session(vendor_name)
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    with _semaphores[vendor_name]:
+        response = session.request(method, url, **kwargs)
+    if response.status_code in RETRY_STATUS_FORCELIST:
+        response.raise_for_status()
+    return response
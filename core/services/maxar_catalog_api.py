@@ -11,7 +11,9 @@ from core.models import SatelliteDateRetrievalPipelineHistory
 from core.serializers import SatelliteDateRetrievalPipelineHistorySerializer, SatelliteCaptureCatalogSerializer, CollectionCatalog
 import pytz
 from core.services.utils import calculate_area_from_geojson
-from core.utils import save_image_in_s3_and_get_url, process_database_catalog, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local
+from core.utils import save_image_in_s3_and_get_url, process_database_catalog, process_database_catalog_stream, iter_catalog_batches, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local, get_catalog_run_windows, get_completed_catalog_tiles, CatalogCheckpointMark
+from core.services.http_client import vendor_request
+from core.services.spatial_sharding import iter_sharded_features, TileFetchError
 from botocore.exceptions import NoCredentialsError
 from PIL import Image
 import io
@@ -41,7 +43,7 @@ def get_maxar_collections(
 
     headers = {"Accept": "application/json", "MAXAR-API-KEY": AUTH_TOKEN}
     try:
-        response = requests.request("GET", url, headers=headers)
+        response = vendor_request("maxar", "GET", url, headers=headers)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.HTTPError as http_err:
@@ -176,29 +178,40 @@ def download_thumbnails(features, path):
                 pass
 
 
-def fetch_and_process_records(bbox, start_time, end_time):
-    """Fetches records from the Maxar API and processes them."""
+def fetch_maxar_tile(bbox, start_time, end_time, max_pages=None):
+    """Pages through one tile, returns (features, is_truncated), raises TileFetchError when a page fails."""
     page = 1
-    all_features = []
+    tile_features = []
 
-    while True:
+    while max_pages is None or page <= max_pages:
         records = get_maxar_collections(
             bbox=bbox, datetime_range=f"{start_time}/{end_time}", page=page
         )
         if not records:
-            break
+            raise TileFetchError(f"Maxar page {page} failed", tile_features)
 
-        features = records.get("features", [])
-        all_features.extend(features)
+        tile_features.extend(records.get("features", []))
 
         if not any(link.get("rel") == "next" for link in records.get("links", [])):
-            break
+            return tile_features, False
 
         page += 1
 
-    return all_features
+    return tile_features, True
 
-def main(START_DATE, END_DATE, BBOX, is_bulk):
+
+def fetch_and_process_records(bbox, start_time, end_time):
+    """Yields the Maxar records of a date batch tile by tile."""
+    return iter_sharded_features(
+        "maxar",
+        bbox,
+        lambda tile, max_pages: fetch_maxar_tile(tile, start_time, end_time, max_pages),
+        lambda feature: feature.get("id"),
+        window=(start_time, end_time),
+        completed_tiles=get_completed_catalog_tiles("maxar", start_time, end_time),
+    )
+
+def iter_maxar_pages(START_DATE, END_DATE, BBOX):
     bboxes = [BBOX]
     current_date = START_DATE
     end_date = END_DATE
@@ -212,7 +225,6 @@ def main(START_DATE, END_DATE, BBOX, is_bulk):
     print("-" * columns)
     print("Batch Size: ", BATCH_SIZE, ", days: ", date_difference)
     print("Duration :", duration, "batch")
-    all_features = []
 
     while current_date <= end_date:
         start_time = current_date
@@ -226,44 +238,28 @@ def main(START_DATE, END_DATE, BBOX, is_bulk):
         
         print(f"Start Time: {start_time}, End Time: {end_time} Running...")
 
+        is_complete = True
         for bbox in bboxes:
-            response = fetch_and_process_records(bbox, start_time, end_time)
-            print(f"Total records: {len(response)}")
-            if response:
-                all_features.extend(response)
+            is_complete &= yield from fetch_and_process_records(bbox, start_time, end_time)
+        if is_complete:
+            yield CatalogCheckpointMark(start_time, end_time)
 
         current_date += timedelta(days=BATCH_SIZE)
 
-    converted_features = process_features(all_features)
-    print(f"Total records: {len(all_features)}, Converted records: {len(converted_features)}")
+def main(START_DATE, END_DATE, BBOX, is_bulk):
+    pages = iter_maxar_pages(START_DATE, END_DATE, BBOX)
     # download_thumbnails(converted_features, "maxar/thumbnails")
-    process_database_catalog(converted_features, START_DATE.isoformat(), END_DATE.isoformat(), "maxar", is_bulk)
-    print("Completed", len(converted_features))
+    batches = iter_catalog_batches(pages, process_features)
+    process_database_catalog_stream(batches, START_DATE.isoformat(), END_DATE.isoformat(), "maxar", is_bulk)
+    print("Completed")
 
 
 def run_maxar_catalog_api():
     BBOX = "-180,-90,180,90"
-    START_DATE = (
-        SatelliteDateRetrievalPipelineHistory.objects.filter(vendor_name="maxar")
-        .order_by("-end_datetime")
-        .first()
-    )
-    if not START_DATE:
-        START_DATE = datetime(
-            datetime.now().year,
-            datetime.now().month,
-            datetime.now().day,
-            tzinfo=pytz.utc,
-        )
-    else:
-        START_DATE = START_DATE.end_datetime
-        print(f"From DB: {START_DATE}")
-
-    END_DATE = get_utc_time()
-    START_DATE = START_DATE.replace(hour=0, minute=0, second=0, microsecond=0)
-    print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
-
-    response = main(START_DATE, END_DATE, BBOX, False)
+    response = None
+    for START_DATE, END_DATE in get_catalog_run_windows("maxar"):
+        print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
+        response = main(START_DATE, END_DATE, BBOX, False)
     return response
 
 def run_maxar_catalog_bulk_api():
@@ -26,7 +26,9 @@ from rasterio.transform import from_bounds
 from decouple import config
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core.utils import save_image_in_s3_and_get_url, process_database_catalog, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local
+from core.utils import save_image_in_s3_and_get_url, process_database_catalog, process_database_catalog_stream, iter_catalog_batches, get_holdback_seconds, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local, get_catalog_run_windows, get_completed_catalog_tiles, CatalogCheckpointMark
+from core.services.http_client import vendor_request
+from core.services.spatial_sharding import iter_sharded_features, TileFetchError
 from botocore.exceptions import NoCredentialsError
 import numpy as np
 from rasterio.transform import from_bounds
@@ -82,7 +84,7 @@ def query_planet_data(aoi_geojson, start_date, end_date, item_type):
     }
 
     try:
-        response = requests.post(search_endpoint, headers=headers, json=request_payload)
+        response = vendor_request("planet", "POST", search_endpoint, headers=headers, json=request_payload)
         return response.json()
     except requests.RequestException as e:
         # print(f"Failed to fetch data: {str(e)}")
@@ -94,7 +96,7 @@ def query_planet_paginated_data(next_url):
         'Authorization': 'api-key ' + API_KEY
     }
     try:
-        response = requests.get(next_url, headers=headers)
+        response = vendor_request("planet", "GET", next_url, headers=headers)
         return response.json()
     except requests.RequestException as e:
         # print(f"Failed to fetch data: {str(e)}")
@@ -267,7 +269,26 @@ def process_features(features):
     converted_features = get_centroid_region_and_local(converted_features)
     return converted_features[::-1]
 
-def main(START_DATE, END_DATE, BBOX, is_bulk):
+def fetch_planet_tile(bbox, start_time, end_time, max_pages=None):
+    """Follows the _next links of one tile, returns (features, is_truncated), raises TileFetchError when a page fails."""
+    features = query_planet_data(bbox_to_geojson(bbox), start_time, end_time, ITEM_TYPE)
+    if not features:
+        raise TileFetchError("Planet search failed")
+    tile_features = list(features.get("features", []))
+    page = 1
+    while features.get("features") and features.get("_links", {}).get("_next"):
+        if max_pages is not None and page >= max_pages:
+            return tile_features, True
+        features = query_planet_paginated_data(features["_links"]["_next"])
+        if not features:
+            raise TileFetchError(f"Planet page {page + 1} failed", tile_features)
+        tile_features.extend(features.get("features", []))
+        page += 1
+    return tile_features, False
+
+
+def iter_planet_pages(START_DATE, END_DATE, BBOX):
+    """Yields the features of each date batch tile by tile."""
     bboxes = [BBOX]
     current_date = START_DATE
     end_date = END_DATE
@@ -278,7 +299,6 @@ def main(START_DATE, END_DATE, BBOX, is_bulk):
         BATCH_SIZE = date_difference
     duration = math.ceil(date_difference / BATCH_SIZE)
 
-    all_features = []  # Collect all features for all dates
     print("-"*columns)
     print("Batch Size: ", BATCH_SIZE, ", days: ", date_difference)
     print("Duration :", duration, "batch")
@@ -289,24 +309,27 @@ def main(START_DATE, END_DATE, BBOX, is_bulk):
         else:
             end_time = end_date.isoformat()
 
+        is_complete = True
         for bbox in bboxes:
-            features = query_planet_data(bbox, start_time, end_time, ITEM_TYPE)
-            all_features.extend(features['features'])
-            while True:
-                try:
-                    if features['features'] and features.get("_links", {}).get("_next"):
-                        features = query_planet_paginated_data(features["_links"]["_next"])
-                        all_features.extend(features['features'])
-                    else:
-                        break
-                except Exception as e:
-                    break
+            is_complete &= yield from iter_sharded_features(
+                "planet",
+                bbox,
+                lambda tile, max_pages: fetch_planet_tile(tile, start_time, end_time, max_pages),
+                lambda feature: feature.get("id"),
+                window=(start_time, end_time),
+                completed_tiles=get_completed_catalog_tiles("planet", start_time, end_time),
+            )
+        if is_complete:
+            yield CatalogCheckpointMark(start_time, end_time)
 
         current_date += timedelta(days=BATCH_SIZE)
-    print(f"Total features: {len(all_features)}")
-    converted_features = process_features(all_features)
+
+
+def main(START_DATE, END_DATE, BBOX, is_bulk):
+    pages = iter_planet_pages(START_DATE, END_DATE, BBOX)
     # download_and_upload_images(all_features, "planet/thumbnails")
-    process_database_catalog(converted_features, START_DATE.isoformat(), END_DATE.isoformat(), "planet", is_bulk)
+    batches = iter_catalog_batches(pages, process_features)
+    process_database_catalog_stream(batches, START_DATE.isoformat(), END_DATE.isoformat(), "planet", is_bulk)
 
 
 def bbox_to_geojson(bbox_str):
@@ -330,33 +353,15 @@ def bbox_to_geojson(bbox_str):
 
 def run_planet_catalog_api():
     BBOX = "-180,-90,180,90"
-    BBOX = bbox_to_geojson(BBOX)
-    START_DATE = (
-        SatelliteDateRetrievalPipelineHistory.objects.filter(vendor_name="planet")
-        .order_by("-end_datetime")
-        .first()
-    )
-    if not START_DATE:
-        START_DATE = datetime(
-            datetime.now().year,
-            datetime.now().month,
-            datetime.now().day,
-            tzinfo=pytz.utc,
-        )
-    else:
-        START_DATE = START_DATE.end_datetime
-        print(f"From DB: {START_DATE}")
-
-    END_DATE = get_utc_time()
-    START_DATE = START_DATE.replace(hour=0, minute=0, second=0, microsecond=0)
-    print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
-    response = main(START_DATE, END_DATE, BBOX, False)
+    response = None
+    for START_DATE, END_DATE in get_catalog_run_windows("planet"):
+        print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
+        response = main(START_DATE, END_DATE, BBOX, False)
     return response
 
 
 def run_planet_catalog_bulk_api():
     BBOX = "-180,-90,180,90"
-    BBOX = bbox_to_geojson(BBOX)
     START_DATE = datetime(2024, 1, 1, tzinfo=pytz.utc)
     END_LIMIT = datetime(2024, 1, 2, tzinfo=pytz.utc)
 
@@ -375,7 +380,6 @@ def run_planet_catalog_bulk_api():
 
 def run_planet_catalog_bulk_api_for_last_35_days_from_now():
     BBOX = "-180,-90,180,90"
-    BBOX = bbox_to_geojson(BBOX)
     START_DATE = (datetime.now(pytz.utc) - timedelta(days=35)).replace(hour=0, minute=0, second=0, microsecond=0)
     END_LIMIT = datetime.now(pytz.utc).replace(hour=0, minute=0, second=0, microsecond=0)
 
@@ -0,0 +1,287 @@
+from datetime import timedelta
+from decouple import config
+from django.db import connection, transaction
+from django.utils import timezone
+from api.models import Site, SiteCapture, SiteStats
+from core.models import CollectionCatalog
+
+SITE_LINK_BATCH_SIZE = 20  # Sites per backfill transaction
+SITE_STATS_BATCH_SIZE = config("SITE_STATS_BATCH_SIZE", default=500, cast=int)  # Sites per compaction statement
+SITE_STATS_HISTOGRAM_DAYS = config("SITE_STATS_HISTOGRAM_DAYS", default=90, cast=int)
+CLEAR_CLOUD_COVER_PERCENT = 30
+# A capture committed after a new site's backfill snapshot, by an ingest transaction that matched the sites
+# before the site existed, is in neither path. The compaction links again the sites backfilled in the last
+# SITE_RELINK_HOURS against the captures stored up to SITE_RELINK_MARGIN_MINUTES before their backfill.
+SITE_RELINK_HOURS = config("SITE_RELINK_HOURS", default=48, cast=int)
+SITE_RELINK_MARGIN_MINUTES = config("SITE_RELINK_MARGIN_MINUTES", default=60, cast=int)
+
+# Link every (site, capture) pair whose footprints intersect, soft deleted sites included so a
+# restored site is still complete. Already linked pairs are skipped.
+LINK_SITE_CAPTURES_SQL = """
+    INSERT INTO {site_capture_table} (site_id, catalog_id, acquisition_datetime, cloud_cover_percent)
+    SELECT site.id, capture.id, capture.acquisition_datetime, capture.cloud_cover_percent
+    FROM {catalog_table} capture
+    JOIN {site_table} site ON ST_Intersects(capture.location_polygon, site.location_polygon)
+    WHERE {condition}
+    ON CONFLICT (site_id, catalog_id) DO NOTHING
+    RETURNING site_id
+"""
+
+# Empty SiteStats rows for the sites that have none yet, so every site of a refresh has a row to lock
+CREATE_SITE_STATS_SQL = """
+    INSERT INTO {site_stats_table} (
+        site_id, acquisition_count, frequency, gap, daily_histogram, updated_at
+    )
+    SELECT site.id, 0, 0, 0, '{{}}', now()
+    FROM {site_table} site
+    WHERE site.id = ANY(%(site_ids)s)
+    ORDER BY site.id
+    ON CONFLICT (site_id) DO NOTHING
+"""
+
+# Rebuild the SiteStats rows of a set of sites from their links in one statement: count, most recent
+# and most recent clear capture (window ranks), latest day frequency and gap, and the daily histogram
+# ending on the refresh day. Dates are UTC, like acquisition_datetime__date.
+REFRESH_SITE_STATS_SQL = """
+    WITH sites AS (
+        SELECT id FROM unnest(%(site_ids)s::bigint[]) AS site(id)
+    ), matches AS (
+        SELECT
+            site_id,
+            catalog_id,
+            acquisition_datetime,
+            cloud_cover_percent,
+            ROW_NUMBER() OVER (
+                PARTITION BY site_id ORDER BY acquisition_datetime DESC, catalog_id DESC
+            ) AS recent_rank,
+            ROW_NUMBER() OVER (
+                PARTITION BY site_id, cloud_cover_percent <= %(clear_cloud_cover)s
+                ORDER BY acquisition_datetime DESC, catalog_id DESC
+            ) AS clear_rank,
+            MAX(acquisition_datetime) OVER (PARTITION BY site_id) AS latest_datetime
+        FROM {site_capture_table}
+        WHERE site_id = ANY(%(site_ids)s)
+    ), totals AS (
+        SELECT
+            site_id,
+            COUNT(*) AS acquisition_count,
+            MAX(catalog_id) FILTER (WHERE recent_rank = 1) AS most_recent_catalog_id,
+            MAX(acquisition_datetime) AS most_recent_datetime,
+            MAX(catalog_id) FILTER (WHERE clear_rank = 1 AND cloud_cover_percent <= %(clear_cloud_cover)s) AS most_recent_clear_catalog_id,
+            MAX(acquisition_datetime) FILTER (WHERE cloud_cover_percent <= %(clear_cloud_cover)s) AS most_recent_clear_datetime,
+            COUNT(*) FILTER (WHERE acquisition_datetime::date = latest_datetime::date) AS latest_day_count,
+            COUNT(DISTINCT acquisition_datetime) FILTER (WHERE acquisition_datetime::date = latest_datetime::date) AS latest_day_acquisitions,
+            MIN(acquisition_datetime) FILTER (WHERE acquisition_datetime::date = latest_datetime::date) AS first_latest_capture,
+            MAX(acquisition_datetime) FILTER (WHERE acquisition_datetime::date < latest_datetime::date) AS last_prior_capture
+        FROM matches
+        GROUP BY site_id
+    ), daily AS (
+        SELECT site_id, acquisition_datetime::date AS date, COUNT(*) AS count
+        FROM {site_capture_table}
+        WHERE site_id = ANY(%(site_ids)s) AND acquisition_datetime >= %(histogram_start)s::date
+        GROUP BY 1, 2
+    ), histograms AS (
+        SELECT sites.id AS site_id, array_agg(COALESCE(daily.count, 0) ORDER BY day_index) AS daily_histogram
+        FROM sites
+        CROSS JOIN generate_series(0, %(histogram_days)s - 1) AS day_index
+        LEFT JOIN daily ON daily.site_id = sites.id AND daily.date = %(histogram_start)s::date + day_index
+        GROUP BY sites.id
+    )
+    INSERT INTO {site_stats_table} (
+        site_id, acquisition_count, most_recent_catalog_id, most_recent_datetime, most_recent_clear_catalog_id,
+        most_recent_clear_datetime, frequency, gap, histogram_start, daily_histogram, updated_at
+    )
+    SELECT
+        sites.id,
+        COALESCE(totals.acquisition_count, 0),
+        totals.most_recent_catalog_id,
+        totals.most_recent_datetime,
+        totals.most_recent_clear_catalog_id,
+        totals.most_recent_clear_datetime,
+        COALESCE(totals.latest_day_count::float / NULLIF(totals.latest_day_acquisitions, 0), 0),
+        COALESCE(EXTRACT(EPOCH FROM totals.first_latest_capture - totals.last_prior_capture) / 86400, 0),
+        %(histogram_start)s::date,
+        histograms.daily_histogram,
+        now()
+    FROM sites
+    JOIN {site_table} site ON site.id = sites.id
+    LEFT JOIN totals ON totals.site_id = sites.id
+    JOIN histograms ON histograms.site_id = sites.id
+    ON CONFLICT (site_id) DO UPDATE SET
+        acquisition_count = EXCLUDED.acquisition_count,
+        most_recent_catalog_id = EXCLUDED.most_recent_catalog_id,
+        most_recent_datetime = EXCLUDED.most_recent_datetime,
+        most_recent_clear_catalog_id = EXCLUDED.most_recent_clear_catalog_id,
+        most_recent_clear_datetime = EXCLUDED.most_recent_clear_datetime,
+        frequency = EXCLUDED.frequency,
+        gap = EXCLUDED.gap,
+        histogram_start = EXCLUDED.histogram_start,
+        daily_histogram = EXCLUDED.daily_histogram,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def execute_link_site_captures(condition, params):
+    """Returns the ids of the sites that got new links."""
+    sql = LINK_SITE_CAPTURES_SQL.format(
+        site_capture_table=SiteCapture._meta.db_table,
+        catalog_table=CollectionCatalog._meta.db_table,
+        site_table=Site._meta.db_table,
+        condition=condition,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def get_histogram_start(histogram_days=SITE_STATS_HISTOGRAM_DAYS):
+    """First day of the histograms built today, the last entry is today (UTC)."""
+    return timezone.now().date() - timedelta(days=histogram_days - 1)
+
+
+def lock_site_stats(site_ids):
+    """
+    Create the missing SiteStats rows and lock all of them until the end of the transaction, in site id order
+    so concurrent ingest chunks touching the same sites queue up instead of deadlocking.
+    """
+    sql = CREATE_SITE_STATS_SQL.format(
+        site_stats_table=SiteStats._meta.db_table,
+        site_table=Site._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"site_ids": site_ids})
+    return list(
+        SiteStats.objects.select_for_update()
+        .filter(site_id__in=site_ids)
+        .order_by("site_id")
+        .values_list("site_id", flat=True)
+    )
+
+
+def refresh_site_stats(site_ids, histogram_days=SITE_STATS_HISTOGRAM_DAYS):
+    """
+    Rebuild the SiteStats rows of the given sites from their SiteCapture links, must run in a transaction.
+    The rows are locked first: a chunk that links captures to the same site waits for this transaction, and
+    its rebuild, a separate statement with a fresh snapshot (READ COMMITTED), sees the links committed here.
+    """
+    if not site_ids:
+        return 0
+    site_ids = sorted(site_ids)
+    lock_site_stats(site_ids)
+    sql = REFRESH_SITE_STATS_SQL.format(
+        site_capture_table=SiteCapture._meta.db_table,
+        site_stats_table=SiteStats._meta.db_table,
+        site_table=Site._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {
+                "site_ids": site_ids,
+                "clear_cloud_cover": CLEAR_CLOUD_COVER_PERCENT,
+                "histogram_start": get_histogram_start(histogram_days),
+                "histogram_days": histogram_days,
+            },
+        )
+        return cursor.rowcount
+
+
+def link_captures_to_sites(catalog_ids, start_datetime, end_datetime):
+    """
+    Match newly ingested captures against every site and refresh the stats of the sites they touch,
+    called in the ingest transaction. The acquisition range (covering all the captures) limits the
+    catalog side to their partitions. Returns the ids of the sites that got new captures.
+    """
+    if not catalog_ids:
+        return set()
+    site_ids = execute_link_site_captures(
+        "capture.id = ANY(%(catalog_ids)s) AND capture.acquisition_datetime BETWEEN %(start)s AND %(end)s",
+        {"catalog_ids": list(catalog_ids), "start": start_datetime, "end": end_datetime},
+    )
+    refresh_site_stats(site_ids)
+    return site_ids
+
+
+def link_sites_to_captures(site_ids, replace=False):
+    """
+    Backfill the links and stats of new sites against the whole catalog, with replace=True the existing
+    links are dropped first (site geometry edited). Returns the number of sites that got links.
+    """
+    if not site_ids:
+        return 0
+    with transaction.atomic():
+        if replace:
+            SiteCapture.objects.filter(site_id__in=site_ids).delete()
+        linked_site_ids = execute_link_site_captures("site.id = ANY(%(site_ids)s)", {"site_ids": list(site_ids)})
+        refresh_site_stats(site_ids)
+        Site.objects.filter(id__in=site_ids).update(captures_linked_at=timezone.now())
+    return len(linked_site_ids)
+
+
+def link_unlinked_sites(batch_size=SITE_LINK_BATCH_SIZE):
+    """
+    Backfill every site that has never been linked, batch by batch. Returns the number of sites that got links.
+    Errors are raised, the batches already committed keep their captures_linked_at and are not linked again.
+    """
+    total_linked = 0
+    site_ids = list(Site.objects.filter(captures_linked_at__isnull=True).order_by("id").values_list("id", flat=True))
+    print(f"{len(site_ids)} sites to link")
+    for i in range(0, len(site_ids), batch_size):
+        batch_site_ids = site_ids[i:i + batch_size]
+        linked = link_sites_to_captures(batch_site_ids)
+        total_linked += linked
+        print(f"Linked sites {batch_site_ids[0]}-{batch_site_ids[-1]}: {linked} with captures")
+    print(f"Total sites linked: {total_linked}")
+    return total_linked
+
+
+def relink_recent_sites(batch_size=SITE_LINK_BATCH_SIZE):
+    """
+    Link the sites backfilled in the last SITE_RELINK_HOURS again against the captures stored since shortly
+    before their backfill, picking up the captures whose ingest transaction was still open at the time.
+    Returns the ids of the sites that got new links.
+    """
+    site_ids = list(
+        Site.objects.filter(captures_linked_at__gte=timezone.now() - timedelta(hours=SITE_RELINK_HOURS))
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    relinked_site_ids = set()
+    for i in range(0, len(site_ids), batch_size):
+        batch_site_ids = site_ids[i:i + batch_size]
+        with transaction.atomic():
+            linked_site_ids = execute_link_site_captures(
+                "site.id = ANY(%(site_ids)s) AND capture.created_at >= site.captures_linked_at - %(margin)s",
+                {"site_ids": batch_site_ids, "margin": timedelta(minutes=SITE_RELINK_MARGIN_MINUTES)},
+            )
+            refresh_site_stats(linked_site_ids)
+        relinked_site_ids |= linked_site_ids
+    print(f"Relinked {len(site_ids)} recent sites, {len(relinked_site_ids)} got missed captures")
+    return relinked_site_ids
+
+
+def compact_site_stats(batch_size=SITE_STATS_BATCH_SIZE):
+    """
+    Nightly rebuild of every SiteStats row, moving the histograms of sites without new captures
+    forward to today and correcting any drift. The recently backfilled sites are linked again first.
+    Returns the number of rows rebuilt, errors are raised to the task.
+    """
+    relink_recent_sites()
+    total_refreshed = 0
+    site_ids = list(Site.objects.order_by("id").values_list("id", flat=True))
+    for i in range(0, len(site_ids), batch_size):
+        with transaction.atomic():
+            total_refreshed += refresh_site_stats(site_ids[i:i + batch_size])
+    print(f"Site stats compacted: {total_refreshed} sites")
+    return total_refreshed
+
+
+if __name__ == "__main__":
+    link_unlinked_sites()
+
+
+# from core.services.site_captures import link_unlinked_sites, link_sites_to_captures, relink_recent_sites, compact_site_stats
+# link_unlinked_sites()
+# relink_recent_sites()
+# link_sites_to_captures([1, 2, 3], replace=True)
+# compact_site_stats()
@@ -37,7 +37,8 @@ from decouple import config
 from datetime import datetime, timezone
 from django.contrib.gis.geos import Polygon
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core.utils import save_image_in_s3_and_get_url, get_holdback_seconds, process_database_catalog, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local
+from core.utils import save_image_in_s3_and_get_url, get_holdback_seconds, process_database_catalog, process_database_catalog_stream, iter_catalog_batches, get_centroid_and_region_and_location_polygon, get_centroid_region_and_local, get_catalog_run_windows, get_completed_catalog_tiles, CatalogCheckpointMark
+from core.services.http_client import vendor_request
 from botocore.exceptions import NoCredentialsError
 import numpy as np
 from rasterio.transform import from_bounds
@@ -263,7 +264,7 @@ def search_skyfi_archive(aoi, from_date, to_date):
             "providers": ["UMBRA"],
 
         }
-        response = requests.post(url, json=payload, headers=headers)
+        response = vendor_request("skyfi-umbra", "POST", url, json=payload, headers=headers)
         if response.status_code == 200:
             archives = response.json()
             if "archives" in archives and archives["archives"]:
@@ -275,25 +276,22 @@ def search_skyfi_archive(aoi, from_date, to_date):
                 next_page = archives["nextPage"]
             else:
                 break
-        elif response.status_code == 429:
-            time.sleep(1)
         else:
             break
     return all_archives
 
 
-def worker(start_date, end_date, aoi, results):
+def worker(start_date, end_date, aoi):
     try:
-        archives = search_skyfi_archive(aoi, start_date, end_date)
-        if archives:
-            results.extend(archives)
+        return search_skyfi_archive(aoi, start_date, end_date)
     except Exception as e:
         print(e)
         time.sleep(1)
+        return None
 
 
-def skyfi_executor(START_DATE, END_DATE, LAND_POLYGONS_WKT,IS_BULK):
-    results = []
+def iter_skyfi_pages(START_DATE, END_DATE, LAND_POLYGONS_WKT):
+    """Yields the archives of each land polygon as soon as its search completes."""
     current_date = START_DATE
     end_date = END_DATE
 
@@ -314,48 +312,46 @@ def skyfi_executor(START_DATE, END_DATE, LAND_POLYGONS_WKT,IS_BULK):
             end_time = end_date.isoformat()
         print("Start Time: ", start_time, "End Time: ", end_time)
 
+        completed_tiles = get_completed_catalog_tiles("skyfi-umbra", start_time, end_time)
+        is_complete = True
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(worker, start_time, end_time, bbox, results)
-                for bbox in LAND_POLYGONS_WKT
-            ]
+            futures = {
+                executor.submit(worker, start_time, end_time, bbox): str(index)
+                for index, bbox in enumerate(LAND_POLYGONS_WKT)
+                if str(index) not in completed_tiles
+            }
             for future in concurrent.futures.as_completed(futures):
-                future.result()
+                archives = future.result()
+                if archives:
+                    yield archives
+                # A failed land polygon stays out of the checkpoint so a resumed run searches it again
+                if archives is not None:
+                    yield CatalogCheckpointMark(start_time, end_time, futures[future])
+                else:
+                    is_complete = False
+        if is_complete:
+            yield CatalogCheckpointMark(start_time, end_time)
 
         current_date += timedelta(days=BATCH_SIZE)
 
-    print("Total records: ", len(results))
-    converted_features = convert_to_model_params(results)
+
+def skyfi_executor(START_DATE, END_DATE, LAND_POLYGONS_WKT,IS_BULK):
+    pages = iter_skyfi_pages(START_DATE, END_DATE, LAND_POLYGONS_WKT)
     # download_and_upload_images(converted_features, "skyfi/thumbnails")
-    process_database_catalog(
-        converted_features, START_DATE.isoformat(), end_date.isoformat(), "skyfi-umbra", IS_BULK
+    batches = iter_catalog_batches(pages, convert_to_model_params)
+    process_database_catalog_stream(
+        batches, START_DATE.isoformat(), END_DATE.isoformat(), "skyfi-umbra", IS_BULK
     )
 
 
 def run_skyfi_catalog_api():
-    START_DATE = (
-        SatelliteDateRetrievalPipelineHistory.objects.filter(vendor_name="skyfi-umbra")
-        .order_by("-end_datetime")
-        .first()
-    )
-    if not START_DATE:
-        START_DATE = datetime(
-            datetime.now().year,
-            datetime.now().month,
-            datetime.now().day,
-            tzinfo=pytz.utc,
-        )
-    else:
-        START_DATE = START_DATE.end_datetime
-        print(f"From DB: {START_DATE}")
-
-    END_DATE = get_utc_time()
-    START_DATE = START_DATE.replace(hour=0, minute=0, second=0, microsecond=0)
-    print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
     land_polygons_wkt = []
     with open("core/services/land_polygons.json", "r") as file:
         land_polygons_wkt = json.load(file)
-    response = skyfi_executor(START_DATE, END_DATE, land_polygons_wkt, False)
+    response = None
+    for START_DATE, END_DATE in get_catalog_run_windows("skyfi-umbra"):
+        print(f"Start Date: {START_DATE}, End Date: {END_DATE}")
+        response = skyfi_executor(START_DATE, END_DATE, land_polygons_wkt, False)
     return response
 
 def run_skfyfi_catalog_api_bulk():
@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from decouple import config
+from core.services.http_client import VENDOR_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+from core.utils import CatalogCheckpointMark
+
+SHARD_GRID_ROWS = config("SHARD_GRID_ROWS", default=2, cast=int)
+SHARD_GRID_COLS = config("SHARD_GRID_COLS", default=4, cast=int)
+SHARD_MAX_DEPTH = config("SHARD_MAX_DEPTH", default=4, cast=int)  # 90x90 degree tiles split down to ~5.6 degrees
+SHARD_MAX_PAGES_PER_TILE = config("SHARD_MAX_PAGES_PER_TILE", default=5, cast=int)
+
+
+class TileFetchError(Exception):
+    """A page of a tile could not be fetched, features holds the pages fetched before it."""
+
+    def __init__(self, message, features=None):
+        super().__init__(message)
+        self.features = features or []
+
+
+def parse_bbox(bbox):
+    min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def format_bbox(min_lon, min_lat, max_lon, max_lat):
+    return f"{round(min_lon, 6)},{round(min_lat, 6)},{round(max_lon, 6)},{round(max_lat, 6)}"
+
+
+def split_bbox(bbox, rows, cols):
+    """Split a "min_lon,min_lat,max_lon,max_lat" bbox into a rows x cols grid of bbox strings."""
+    min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    lon_step = (max_lon - min_lon) / cols
+    lat_step = (max_lat - min_lat) / rows
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            tiles.append(
+                format_bbox(
+                    min_lon + col * lon_step,
+                    min_lat + row * lat_step,
+                    max_lon if col == cols - 1 else min_lon + (col + 1) * lon_step,
+                    max_lat if row == rows - 1 else min_lat + (row + 1) * lat_step,
+                )
+            )
+    return tiles
+
+
+def subdivide_bbox(bbox):
+    """Split a tile into its four quadrants."""
+    return split_bbox(bbox, 2, 2)
+
+
+def iter_sharded_features(
+    vendor_name,
+    bbox,
+    fetch_tile,
+    get_feature_id,
+    max_pages=SHARD_MAX_PAGES_PER_TILE,
+    max_depth=SHARD_MAX_DEPTH,
+    rows=SHARD_GRID_ROWS,
+    cols=SHARD_GRID_COLS,
+    window=None,
+    completed_tiles=None,
+):
+    """
+    Run a vendor search over a grid of tiles concurrently, yielding the new features of each tile as it completes.
+
+    fetch_tile(tile_bbox, max_pages) returns (features, is_truncated), is_truncated meaning the tile
+    still had pages left after max_pages, and raises TileFetchError when a page fails. A truncated tile is split into quadrants that are searched
+    again, so dense areas get small tiles and empty oceans stay one request. Tiles at max_depth page
+    through all their results. Footprints crossing tile edges come back more than once, only the first
+    copy of each vendor id is yielded.
+
+    With a (window_start, window_end) window, a CatalogCheckpointMark follows the features of every fully
+    searched tile, and tiles listed in completed_tiles (committed by an earlier run of the same window) are skipped.
+    The features fetched before a failed page are yielded, but the tile gets no mark and is searched again next run.
+    Returns True when every tile was searched without error.
+    """
+    completed_tiles = completed_tiles or set()
+    seen_feature_ids = set()
+    max_workers = VENDOR_MAX_CONCURRENCY.get(vendor_name, DEFAULT_MAX_CONCURRENCY)
+    tiles_searched = 0
+    failed_tiles = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {
+            executor.submit(fetch_tile, tile, max_pages if max_depth > 0 else None): (tile, 0)
+            for tile in split_bbox(bbox, rows, cols)
+            if tile not in completed_tiles
+        }
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tile, depth = pending.pop(future)
+                    tiles_searched += 1
+                    is_complete = True
+                    try:
+                        features, is_truncated = future.result()
+                    except TileFetchError as e:
+                        print(f"Error while searching {vendor_name} tile {tile}: {e}")
+                        failed_tiles += 1
+                        features, is_truncated, is_complete = e.features, False, False
+                    except Exception as e:
+                        print(f"Error while searching {vendor_name} tile {tile}: {e}")
+                        failed_tiles += 1
+                        continue
+
+                    # Queue the quadrants before yielding so they are fetched while the caller processes this tile
+                    if is_truncated:
+                        child_depth = depth + 1
+                        child_max_pages = max_pages if child_depth < max_depth else None
+                        for child_tile in subdivide_bbox(tile):
+                            if child_tile not in completed_tiles:
+                                pending[executor.submit(fetch_tile, child_tile, child_max_pages)] = (child_tile, child_depth)
+
+                    new_features = []
+                    for feature in features:
+                        feature_id = get_feature_id(feature)
+                        if feature_id is None:
+                            new_features.append(feature)
+                        elif feature_id not in seen_feature_ids:
+                            seen_feature_ids.add(feature_id)
+                            new_features.append(feature)
+                    if new_features:
+                        yield new_features
+                    if window and is_complete and not is_truncated:
+                        yield CatalogCheckpointMark(window[0], window[1], tile)
+        except BaseException:
+            # Time limit or closed generator: drop the queued tiles instead of fetching them on shutdown
+            for future in pending:
+                future.cancel()
+            raise
+
+    print(f"{vendor_name}: searched {tiles_searched} tiles, {len(seen_feature_ids)} unique features, {failed_tiles} failed")
+    return failed_tiles == 0
+
+
+def fetch_sharded_features(vendor_name, bbox, fetch_tile, get_feature_id, **kwargs):
+    """Same search as iter_sharded_features, merged into a single list. Returns (features, is_complete)."""
+    merged_features = []
+    pages = iter_sharded_features(vendor_name, bbox, fetch_tile, get_feature_id, **kwargs)
+    while True:
+        try:
+            features = next(pages)
+        except StopIteration as stop:
+            return merged_features, stop.value
+        if not isinstance(features, CatalogCheckpointMark):
+            merged_features.extend(features)
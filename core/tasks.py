@@ -1,5 +1,7 @@
 # core/tasks.py
-from celery import shared_task
+from celery import shared_task, chord
+from celery.exceptions import SoftTimeLimitExceeded
+from decouple import config
 from core.services.blacksky_catalog_api import run_blacksky_catalog_api, run_blacksky_catalog_bulk_api_for_last_35_days_from_now, fetch_and_process_products_records
 from core.services.airbus_catalog_api import run_airbus_catalog_api, run_airbus_catalog_api_bulk_for_last_35_days_from_now, fetch_and_process_airbus_products_records
 from core.services.planet_catalog_api import run_planet_catalog_api, run_planet_catalog_bulk_api_for_last_35_days_from_now
@@ -7,45 +9,95 @@ from core.services.capella_master_collector import run_capella_catalog_api, run_
 from core.services.skyfi_catalog_api import run_skyfi_catalog_api, run_skfyfi_catalog_api_bulk_for_last_35_days_from_now
 from core.services.maxar_catalog_api import run_maxar_catalog_api, run_maxar_catalog_bulk_api_for_last_35_days_from_now
 from api.services.group_and_sites_service import check_updates_in_notification_enabled_groups_for_active_users
-
+from core.services.catalog_partitions import ensure_future_catalog_partitions
+
+
+
+VENDOR_CATALOG_RUNNERS = {
+    "blacksky": run_blacksky_catalog_api,
+    "airbus": run_airbus_catalog_api,
+    "planet": run_planet_catalog_api,
+    "capella": run_capella_catalog_api,
+    "maxar": run_maxar_catalog_api,
+    "skyfi-umbra": run_skyfi_catalog_api,
+}
+
+VENDOR_CATALOG_BULK_RUNNERS = {
+    "blacksky": run_blacksky_catalog_bulk_api_for_last_35_days_from_now,
+    "airbus": run_airbus_catalog_api_bulk_for_last_35_days_from_now,
+    "planet": run_planet_catalog_bulk_api_for_last_35_days_from_now,
+    "capella": run_capella_catalog_bulk_api_for_last_35_days_from_now,
+    "maxar": run_maxar_catalog_bulk_api_for_last_35_days_from_now,
+    "skyfi-umbra": run_skfyfi_catalog_api_bulk_for_last_35_days_from_now,
+}
+
+# Soft time budget per vendor run in seconds, the hard limit adds VENDOR_HARD_TIME_LIMIT_GRACE on top
+VENDOR_TIME_LIMITS = {
+    "blacksky": config("BLACKSKY_CATALOG_TIME_LIMIT", default=20 * 60, cast=int),
+    "airbus": config("AIRBUS_CATALOG_TIME_LIMIT", default=20 * 60, cast=int),
+    "planet": config("PLANET_CATALOG_TIME_LIMIT", default=30 * 60, cast=int),
+    "capella": config("CAPELLA_CATALOG_TIME_LIMIT", default=20 * 60, cast=int),
+    "maxar": config("MAXAR_CATALOG_TIME_LIMIT", default=20 * 60, cast=int),
+    "skyfi-umbra": config("SKYFI_CATALOG_TIME_LIMIT", default=40 * 60, cast=int),
+}
+VENDOR_BULK_TIME_LIMIT = config("VENDOR_CATALOG_BULK_TIME_LIMIT", default=6 * 60 * 60, cast=int)
+VENDOR_HARD_TIME_LIMIT_GRACE = 60
 
 
 @shared_task
-def run_all_catalogs():
+def run_vendor_catalog(vendor_name, is_bulk=False):
+    runners = VENDOR_CATALOG_BULK_RUNNERS if is_bulk else VENDOR_CATALOG_RUNNERS
     try:
-        run_blacksky_catalog_api()
+        runners[vendor_name]()
+        return {"vendor_name": vendor_name, "status": "completed"}
+    except SoftTimeLimitExceeded:
+        print(f"Time budget exceeded while running {vendor_name} catalog")
+        return {"vendor_name": vendor_name, "status": "timed_out"}
     except Exception as e:
-        print(f"Error occurred while running BlackSky API: {e}")
+        print(f"Error occurred while running {vendor_name} catalog: {e}")
+        return {"vendor_name": vendor_name, "status": "failed", "error": str(e)}
 
-    try:
-        run_airbus_catalog_api()
-    except Exception as e:
-        print(f"Error occurred while running Airbus API: {e}")
 
+@shared_task
+def run_notification_sweep(vendor_results=None):
+    print(f"Vendor catalog runs finished: {vendor_results}")
     try:
-        run_planet_catalog_api()
+        check_updates_in_notification_enabled_groups_for_active_users()
     except Exception as e:
-        print(f"Error occurred while running Planet API: {e}")
+        print(f"Error occurred while checking updates in notification enabled groups: {e}")
+    return vendor_results
 
-    try:
-        run_capella_catalog_api()
-    except Exception as e:
-        print(f"Error occurred while running Capella API: {e}")
 
-    try:
-        run_maxar_catalog_api()
-    except Exception as e:
-        print(f"Error occurred while running Maxar API: {e}")
+@shared_task
+def run_notification_sweep_after_failure(request, exc, traceback):
+    """
+        Errback of the chord body, a vendor task killed at its hard time limit fails the chord and skips run_notification_sweep
+    """
+    print(f"Vendor catalog chord {request.id} failed: {exc}")
+    run_notification_sweep.delay()
+
+
+def dispatch_vendor_catalogs(is_bulk=False):
+    """
+        Run every vendor as its own task with its own time budget, the notification sweep runs once all of them finish
+        The soft limit ends a vendor run with a "timed_out" result, a run killed at the hard limit still triggers the sweep through the errback
+    """
+    vendor_tasks = []
+    for vendor_name in VENDOR_CATALOG_RUNNERS:
+        soft_time_limit = VENDOR_BULK_TIME_LIMIT if is_bulk else VENDOR_TIME_LIMITS[vendor_name]
+        vendor_tasks.append(
+            run_vendor_catalog.si(vendor_name, is_bulk).set(
+                soft_time_limit=soft_time_limit,
+                time_limit=soft_time_limit + VENDOR_HARD_TIME_LIMIT_GRACE,
+            )
+        )
+    return chord(vendor_tasks)(run_notification_sweep.s().on_error(run_notification_sweep_after_failure.s()))
 
-    try:
-        run_skyfi_catalog_api()
-    except Exception as e:
-        print(f"Error occurred while running SkyFi API: {e}")
 
-    try:
-        check_updates_in_notification_enabled_groups_for_active_users()
-    except Exception as e:
-        print(f"Error occurred while checking updates in notification enabled groups: {e}")
+@shared_task
+def run_all_catalogs():
+    result = dispatch_vendor_catalogs()
+    return f"Dispatched vendor catalog runs: {result.id}"
 
 
 @shared_task
@@ -69,38 +121,15 @@ def run_skyfi_umbra_catalog():
 
 @shared_task
 def run_all_catalogs_bulk_last_35_days():
-    try:
-        run_blacksky_catalog_bulk_api_for_last_35_days_from_now()
-    except Exception as e:
-        print(f"Error occurred while running BlackSky API: {e}")
-
-    try:
-        run_airbus_catalog_api_bulk_for_last_35_days_from_now()
-    except Exception as e:
-        print(f"Error occurred while running Airbus API: {e}")
-
-    try:
-        run_planet_catalog_bulk_api_for_last_35_days_from_now()
-    except Exception as e:
-        print(f"Error occurred while running Planet API: {e}")
-
-    try:
-        run_capella_catalog_bulk_api_for_last_35_days_from_now()
-    except Exception as e:
-        print(f"Error occurred while running Capella API: {e}")
+    result = dispatch_vendor_catalogs(is_bulk=True)
+    return f"Dispatched vendor bulk catalog runs: {result.id}"
 
-    try:
-        run_maxar_catalog_bulk_api_for_last_35_days_from_now()
-    except Exception as e:
-        print(f"Error occurred while running Maxar API: {e}")
-
-    try:
-        run_skfyfi_catalog_api_bulk_for_last_35_days_from_now()
-    except Exception as e:
-        print(f"Error occurred while running SkyFi API: {e}")
 
+@shared_task
+def create_future_catalog_partitions():
+    """Daily in CELERY_BEAT_SCHEDULE, catalog partitions exist CATALOG_PARTITION_MONTHS_AHEAD months ahead of ingest"""
     try:
-        check_updates_in_notification_enabled_groups_for_active_users()
+        created_partitions = ensure_future_catalog_partitions()
+        return f"Created catalog partitions: {', '.join(created_partitions) or 'none'}"
     except Exception as e:
-        print(f"Error occurred while checking updates in notification enabled groups: {e}")
-    
\ No newline at end of file
+        print(f"Error occurred while creating catalog partitions: {e}")
@@ -1,3 +1,231 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.gis.geos import Polygon
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from rest_framework import serializers
+
+from core.serializers import CollectionCatalogSerializer
+
+from core.services import capella_master_collector
+from core.services.spatial_sharding import TileFetchError
+from core.models import CatalogIngestCheckpoint, CollectionCatalog, SatelliteDateRetrievalPipelineHistory
+from core.utils import (
+    CATALOG_CHECKPOINT_OVERLAP_MINUTES,
+    CatalogCheckpointMark,
+    get_catalog_run_windows,
+    get_completed_catalog_tiles,
+    insert_catalog_records_chunk,
+    iter_catalog_batches,
+    save_catalog_checkpoint_marks,
+)
+
+
+def make_catalog_record(vendor_id, acquisition_datetime, offset=0, vendor_name="planet"):
+    coordinates = [[offset, 0], [offset, 1], [offset + 1, 1], [offset + 1, 0], [offset, 0]]
+    record = CollectionCatalog(
+        vendor_name=vendor_name,
+        vendor_id=vendor_id,
+        acquisition_datetime=acquisition_datetime,
+        location_polygon=Polygon(coordinates),
+        coordinates_record={"type": "Polygon", "coordinates": [coordinates]},
+    )
+    record.populate_derived_fields()
+    return record
+
+
+class CatalogDedupeTests(TestCase):
+    def setUp(self):
+        self.acquisition_datetime = datetime(2024, 5, 1, 10, 30, tzinfo=timezone.utc)
+
+    def test_same_vendor_id_is_refused(self):
+        make_catalog_record("scene-1", self.acquisition_datetime).save()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_catalog_record("scene-1", self.acquisition_datetime, offset=5).save()
+
+    def test_same_footprint_without_vendor_id_is_refused(self):
+        make_catalog_record(None, self.acquisition_datetime).save()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_catalog_record(None, self.acquisition_datetime).save()
+
+    def test_same_vendor_id_of_another_vendor_is_kept(self):
+        make_catalog_record("scene-1", self.acquisition_datetime).save()
+        make_catalog_record("scene-1", self.acquisition_datetime, offset=5, vendor_name="maxar").save()
+
+        self.assertEqual(CollectionCatalog.objects.count(), 2)
+
+    def test_chunk_counts_only_the_inserted_rows(self):
+        first_chunk = [
+            make_catalog_record("scene-1", self.acquisition_datetime),
+            make_catalog_record("scene-2", self.acquisition_datetime, offset=2),
+        ]
+        self.assertEqual(insert_catalog_records_chunk(first_chunk), 2)
+
+        # scene-2 was stored by an earlier chunk (or a concurrent worker), the constraint skips it
+        second_chunk = [
+            make_catalog_record("scene-2", self.acquisition_datetime, offset=2),
+            make_catalog_record("scene-3", self.acquisition_datetime, offset=4),
+        ]
+        self.assertEqual(insert_catalog_records_chunk(second_chunk), 1)
+        self.assertEqual(CollectionCatalog.objects.count(), 3)
+
+    def test_chunk_of_stored_records_inserts_nothing(self):
+        insert_catalog_records_chunk([make_catalog_record("scene-1", self.acquisition_datetime)])
+
+        self.assertEqual(insert_catalog_records_chunk([make_catalog_record("scene-1", self.acquisition_datetime)]), 0)
+
+    def test_serializer_reports_a_duplicate(self):
+        record = make_catalog_record("scene-1", self.acquisition_datetime)
+        record.save()
+        fields = {field.name: getattr(record, field.name) for field in CollectionCatalog._meta.concrete_fields if field.name != "id"}
+
+        with self.assertRaises(serializers.ValidationError) as raised:
+            CollectionCatalogSerializer().create(fields)
+        self.assertEqual(raised.exception.get_codes(), ["duplicate"])
+
+    def test_serializer_reraises_other_integrity_errors(self):
+        with mock.patch.object(serializers.ModelSerializer, "create", side_effect=IntegrityError("null value in column")):
+            with self.assertRaises(IntegrityError):
+                CollectionCatalogSerializer().create({"vendor_id": "scene-1"})
+
+
+@mock.patch("core.utils.get_utc_time", return_value=datetime(2024, 5, 10, 12, 0, tzinfo=timezone.utc))
+class CatalogCheckpointTests(TestCase):
+    def setUp(self):
+        self.high_water_mark = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        CatalogIngestCheckpoint.objects.create(vendor_name="planet", high_water_mark=self.high_water_mark)
+        self.first_window = ("2024-05-01T00:00:00+00:00", "2024-05-04T00:00:00+00:00")
+        self.second_window = ("2024-05-04T00:00:00+00:00", "2024-05-07T00:00:00+00:00")
+
+    def get_checkpoint(self):
+        return CatalogIngestCheckpoint.objects.get(vendor_name="planet")
+
+    def test_completed_tiles_are_resumed(self, _):
+        save_catalog_checkpoint_marks("planet", [CatalogCheckpointMark(*self.first_window, tile="0,0,1,1")])
+
+        self.assertEqual(get_completed_catalog_tiles("planet", *self.first_window), {"0,0,1,1"})
+        self.assertEqual(get_completed_catalog_tiles("planet", *self.second_window), set())
+        self.assertEqual(self.get_checkpoint().high_water_mark, self.high_water_mark)
+
+    def test_complete_window_moves_the_high_water_mark(self, _):
+        save_catalog_checkpoint_marks("planet", [CatalogCheckpointMark(*self.first_window)])
+
+        checkpoint = self.get_checkpoint()
+        self.assertEqual(checkpoint.high_water_mark, datetime(2024, 5, 4, tzinfo=timezone.utc))
+        self.assertIsNone(checkpoint.cursor)
+
+    def test_high_water_mark_waits_for_an_open_window(self, _):
+        save_catalog_checkpoint_marks(
+            "planet",
+            [CatalogCheckpointMark(*self.first_window, tile="0,0,1,1"), CatalogCheckpointMark(*self.second_window)],
+        )
+        self.assertEqual(self.get_checkpoint().high_water_mark, self.high_water_mark)
+
+        overlap_start = self.high_water_mark - timedelta(minutes=CATALOG_CHECKPOINT_OVERLAP_MINUTES)
+        self.assertEqual(
+            get_catalog_run_windows("planet"),
+            [
+                (overlap_start, datetime(2024, 5, 1, tzinfo=timezone.utc)),
+                (datetime(2024, 5, 1, tzinfo=timezone.utc), datetime(2024, 5, 4, tzinfo=timezone.utc)),
+                (datetime(2024, 5, 7, tzinfo=timezone.utc), datetime(2024, 5, 10, 12, 0, tzinfo=timezone.utc)),
+            ],
+        )
+
+        # Once the open window completes both windows are behind the high-water mark
+        save_catalog_checkpoint_marks("planet", [CatalogCheckpointMark(*self.first_window)])
+        checkpoint = self.get_checkpoint()
+        self.assertEqual(checkpoint.high_water_mark, datetime(2024, 5, 7, tzinfo=timezone.utc))
+        self.assertIsNone(checkpoint.cursor)
+
+    def test_window_that_failed_before_any_tile_is_searched_again(self, _):
+        # The first window never committed anything, only the second one completed
+        save_catalog_checkpoint_marks("planet", [CatalogCheckpointMark(*self.second_window)])
+
+        self.assertEqual(self.get_checkpoint().high_water_mark, self.high_water_mark)
+        run_windows = get_catalog_run_windows("planet")
+        self.assertIn(
+            (self.high_water_mark - timedelta(minutes=CATALOG_CHECKPOINT_OVERLAP_MINUTES), datetime(2024, 5, 4, tzinfo=timezone.utc)),
+            run_windows,
+        )
+        self.assertNotIn((datetime(2024, 5, 4, tzinfo=timezone.utc), datetime(2024, 5, 7, tzinfo=timezone.utc)), run_windows)
+
+    def test_high_water_mark_does_not_pass_now(self, _):
+        save_catalog_checkpoint_marks("planet", [CatalogCheckpointMark("2024-05-01T00:00:00+00:00", "2024-05-12T00:00:00+00:00")])
+
+        self.assertEqual(self.get_checkpoint().high_water_mark, datetime(2024, 5, 10, 12, 0, tzinfo=timezone.utc))
+
+    def test_legacy_cursor_is_an_open_window(self, _):
+        CatalogIngestCheckpoint.objects.filter(vendor_name="planet").update(
+            cursor={"window_start": self.first_window[0], "window_end": self.first_window[1], "completed_tiles": ["0,0,1,1"]}
+        )
+
+        self.assertEqual(get_completed_catalog_tiles("planet", *self.first_window), {"0,0,1,1"})
+        self.assertIn(
+            (datetime(2024, 5, 1, tzinfo=timezone.utc), datetime(2024, 5, 4, tzinfo=timezone.utc)),
+            get_catalog_run_windows("planet"),
+        )
+
+    def test_first_run_anchors_the_high_water_mark(self, _):
+        SatelliteDateRetrievalPipelineHistory.objects.create(
+            vendor_name="maxar",
+            start_datetime=datetime(2024, 5, 7, tzinfo=timezone.utc),
+            end_datetime=datetime(2024, 5, 8, 15, 20, tzinfo=timezone.utc),
+            message={},
+        )
+
+        self.assertEqual(
+            get_catalog_run_windows("maxar"),
+            [(datetime(2024, 5, 8, tzinfo=timezone.utc), datetime(2024, 5, 10, 12, 0, tzinfo=timezone.utc))],
+        )
+        self.assertEqual(
+            CatalogIngestCheckpoint.objects.get(vendor_name="maxar").high_water_mark,
+            datetime(2024, 5, 8, tzinfo=timezone.utc),
+        )
+
+
+class CatalogBatchTests(TestCase):
+    def test_marks_of_a_batch_without_records_are_dropped(self):
+        mark = CatalogCheckpointMark("2024-05-01T00:00:00+00:00", "2024-05-04T00:00:00+00:00", tile="0,0,1,1")
+
+        batches = list(iter_catalog_batches([[{"id": 1}], mark], lambda features: [], batch_size=10))
+
+        self.assertEqual(batches, [([], [])])
+
+    def test_window_mark_flushes_the_batch(self):
+        mark = CatalogCheckpointMark("2024-05-01T00:00:00+00:00", "2024-05-04T00:00:00+00:00")
+
+        batches = list(iter_catalog_batches([[{"id": 1}], mark, [{"id": 2}]], lambda features: features, batch_size=10))
+
+        self.assertEqual(batches, [([{"id": 1}], [mark]), ([{"id": 2}], [])])
+
+
+@mock.patch.object(capella_master_collector, "BATCH_SIZE", 28)
+class CapellaCheckpointTests(TestCase):
+    def search_window(self, fetch_tile):
+        with mock.patch.object(capella_master_collector, "query_api_with_retries", side_effect=fetch_tile):
+            return list(capella_master_collector.iter_capella_pages(
+                datetime(2024, 5, 1, tzinfo=timezone.utc),
+                datetime(2024, 5, 2, tzinfo=timezone.utc),
+                ["0,0,8,2"],
+                "token",
+            ))
+
+    def test_searched_window_is_marked_complete(self):
+        pages = self.search_window(lambda token, tile, start, end, max_pages: ([], False))
+
+        self.assertEqual([page.tile for page in pages if isinstance(page, CatalogCheckpointMark)], [None])
+
+    def test_failed_tile_keeps_the_window_open(self):
+        def fetch_tile(token, tile, start, end, max_pages):
+            if tile.startswith("0.0,0.0,"):
+                raise TileFetchError("Capella page 1 failed")
+            return [{"id": tile, "properties": {"capella:collect_id": tile}}], False
+
+        pages = self.search_window(fetch_tile)
 
-# Create your tests here.
+        self.assertFalse(any(isinstance(page, CatalogCheckpointMark) for page in pages))
+        # The features of the other tiles are still ingested
+        self.assertEqual(len(pages[0]), 7)
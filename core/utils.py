@@ -2,12 +2,11 @@ import boto3
 from botocore.exceptions import NoCredentialsError
 from decouple import config
 from core.models import SatelliteDateRetrievalPipelineHistory
-from bungalowbe.utils import reverse_geocode_shapefile
 from django.contrib.gis.geos import Polygon
 import hashlib
 import json
 import os
-import geopandas as gpd
+from core.services.geocoder import reverse_geocode_points
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
@@ -47,35 +46,483 @@ from core.serializers import (
     SatelliteDateRetrievalPipelineHistorySerializer,
     CollectionCatalogSerializer,
 )
-from datetime import datetime
-from bungalowbe.utils import convert_iso_to_datetime
-from core.models import CollectionCatalog
+from datetime import datetime, timedelta
+from bungalowbe.utils import convert_iso_to_datetime, get_utc_time
+from core.models import CollectionCatalog, CollectionCatalogMetadata, CatalogIngestCheckpoint
+from core.services.site_captures import link_captures_to_sites
 from django.db import transaction
+from django.db.models import Q
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+from celery.exceptions import SoftTimeLimitExceeded
 import time
+
+CATALOG_BULK_INSERT = config("CATALOG_BULK_INSERT", default=True, cast=bool)
+CATALOG_BULK_INSERT_CHUNK_SIZE = config("CATALOG_BULK_INSERT_CHUNK_SIZE", default=500, cast=int)
+CATALOG_DUPLICATE_LOOKUP_CHUNK_SIZE = config("CATALOG_DUPLICATE_LOOKUP_CHUNK_SIZE", default=5000, cast=int)
+CATALOG_STREAM_BATCH_SIZE = config("CATALOG_STREAM_BATCH_SIZE", default=1000, cast=int)
+# Re-search this much before the high-water mark on each run to pick up captures published late,
+# searches filter on acquisition time and vendors publish hours (holdback) after acquisition
+CATALOG_CHECKPOINT_OVERLAP_MINUTES = config("CATALOG_CHECKPOINT_OVERLAP_MINUTES", default=1440, cast=int)
+CATALOG_GENERATION_KEY = "catalog_generation:{vendor_name}"
+
+
+def get_catalog_generations(vendor_names):
+    """
+        Generation counter of each vendor catalog, part of the cache keys of responses built from the catalog
+        A vendor that never ingested anything since the cache was flushed is at generation 0
+    """
+    try:
+        keys = {CATALOG_GENERATION_KEY.format(vendor_name=vendor_name): vendor_name for vendor_name in vendor_names}
+        generations = cache.get_many(list(keys))
+        return {vendor_name: generations.get(key, 0) for key, vendor_name in keys.items()}
+    except Exception as e:
+        print(f"Error in get_catalog_generations: {e}")
+        return {vendor_name: 0 for vendor_name in vendor_names}
+
+
+def bump_catalog_generation(vendor_name):
+    """
+        Invalidate the cached catalog responses that include this vendor, called once its new records are committed
+    """
+    try:
+        key = CATALOG_GENERATION_KEY.format(vendor_name=vendor_name)
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+    except SoftTimeLimitExceeded:
+        raise
+    except Exception as e:
+        print(f"Error in bump_catalog_generation: {e}")
+        return None
+
+
+def get_catalog_record_keys(vendor_name, vendor_id, acquisition_datetime, coordinates_record_md5):
+    """
+        Identity keys of a catalog record, a record is a duplicate if any of them is already known
+    """
+    keys = {("md5", vendor_name, acquisition_datetime, coordinates_record_md5)}
+    if vendor_id:
+        keys.add(("vendor_id", vendor_name, vendor_id))
+    return keys
+
+
+def get_existing_catalog_keys(vendor_names, vendor_ids, coordinates_record_md5s):
+    """
+        Fetch the identity keys already stored in the catalog for the given candidates in one query
+    """
+    existing_keys = set()
+    if not vendor_ids and not coordinates_record_md5s:
+        return existing_keys
+
+    existing_records = CollectionCatalog.objects.filter(vendor_name__in=vendor_names).filter(
+        Q(vendor_id__in=vendor_ids) | Q(coordinates_record_md5__in=coordinates_record_md5s)
+    ).values_list("vendor_name", "vendor_id", "acquisition_datetime", "coordinates_record_md5")
+    for vendor_name, vendor_id, acquisition_datetime, coordinates_record_md5 in existing_records:
+        existing_keys |= get_catalog_record_keys(vendor_name, vendor_id, acquisition_datetime, coordinates_record_md5)
+    return existing_keys
+
+
+def get_feature_catalog_keys(feature):
+    """
+        Identity keys of an incoming feature (model params dict) before it reaches the serializer
+    """
+    acquisition_datetime = feature.get("acquisition_datetime")
+    if isinstance(acquisition_datetime, str):
+        acquisition_datetime = convert_iso_to_datetime(acquisition_datetime.replace("Z", "+00:00"))
+
+    coordinates_record_md5 = feature.get("coordinates_record_md5")
+    if not coordinates_record_md5 and feature.get("coordinates_record"):
+        coordinates_record_md5 = hashlib.md5(json.dumps(feature["coordinates_record"], sort_keys=True).encode()).hexdigest()
+
+    return get_catalog_record_keys(feature.get("vendor_name"), feature.get("vendor_id"), acquisition_datetime, coordinates_record_md5)
+
+
+def filter_existing_catalog_records(features, chunk_size=CATALOG_DUPLICATE_LOOKUP_CHUNK_SIZE):
+    """
+        Drop the features that are already in the catalog using one lookup query per chunk
+        Returns (new_features, duplicate_count)
+    """
+    new_features = []
+    duplicate_features = 0
+
+    for i in range(0, len(features), chunk_size):
+        chunk = features[i:i + chunk_size]
+        try:
+            chunk_keys = [get_feature_catalog_keys(feature) for feature in chunk]
+            vendor_names = {feature.get("vendor_name") for feature in chunk}
+            vendor_ids = {key[2] for keys in chunk_keys for key in keys if key[0] == "vendor_id"}
+            coordinates_record_md5s = {key[3] for keys in chunk_keys for key in keys if key[0] == "md5" and key[3]}
+            existing_keys = get_existing_catalog_keys(vendor_names, vendor_ids, coordinates_record_md5s)
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            # Let the insert path handle the chunk if the lookup fails
+            print(f"Error in filter_existing_catalog_records: {e}")
+            new_features.extend(chunk)
+            continue
+
+        for feature, keys in zip(chunk, chunk_keys):
+            if keys & existing_keys:
+                duplicate_features += 1
+            else:
+                new_features.append(feature)
+
+    return new_features, duplicate_features
+
+
+def get_catalog_record_ids(records):
+    """
+        Ids of the stored rows matching unsaved records by identity key, None for the ones not found
+        bulk_create with ignore_conflicts does not return the ids of the inserted rows
+    """
+    vendor_ids = {record.vendor_id for record in records if record.vendor_id}
+    coordinates_record_md5s = {record.coordinates_record_md5 for record in records if record.coordinates_record_md5}
+    acquisition_datetimes = [record.acquisition_datetime for record in records]
+
+    # The acquisition range limits the lookup to the partitions of the chunk
+    stored_records = CollectionCatalog.objects.filter(
+        vendor_name__in={record.vendor_name for record in records},
+        acquisition_datetime__gte=min(acquisition_datetimes),
+        acquisition_datetime__lte=max(acquisition_datetimes),
+    ).filter(
+        Q(vendor_id__in=vendor_ids) | Q(coordinates_record_md5__in=coordinates_record_md5s)
+    ).values_list("id", "vendor_name", "vendor_id", "acquisition_datetime", "coordinates_record_md5")
+
+    ids_by_key = {}
+    for record_id, vendor_name, vendor_id, acquisition_datetime, coordinates_record_md5 in stored_records:
+        for key in get_catalog_record_keys(vendor_name, vendor_id, acquisition_datetime, coordinates_record_md5):
+            ids_by_key[key] = record_id
+
+    record_ids = []
+    for record in records:
+        keys = get_catalog_record_keys(record.vendor_name, record.vendor_id, record.acquisition_datetime, record.coordinates_record_md5)
+        record_ids.append(next((ids_by_key[key] for key in keys if key in ids_by_key), None))
+    return record_ids
+
+
+def insert_catalog_records_chunk(records, metadatas=None):
+    """
+        Insert a chunk of validated records with a single INSERT ... ON CONFLICT DO NOTHING
+        Rows already caught by filter_existing_catalog_records are not in the chunk, the unique
+        constraints on vendor identity skip the ones a concurrent worker inserted in the meantime
+        metadatas holds the raw vendor feature of each record, stored in CollectionCatalogMetadata
+        The inserted rows are matched against the sites (SiteCapture) and the SiteStats of the
+        matched sites are refreshed in the same transaction
+        Returns the number of rows actually inserted, the skipped conflicts are duplicates
+    """
+    with transaction.atomic():
+        # ignore_conflicts gives no rowcount, the rows stored before the insert tell the skipped ones apart
+        existing_ids = set(get_catalog_record_ids(records))
+        CollectionCatalog.objects.bulk_create(records, ignore_conflicts=True)
+        record_ids = [
+            record_id if record_id not in existing_ids else None
+            for record_id in get_catalog_record_ids(records)
+        ]
+        if metadatas and any(metadata is not None for metadata in metadatas):
+            CollectionCatalogMetadata.objects.bulk_create(
+                [
+                    CollectionCatalogMetadata(catalog_id=record_id, metadata=metadata)
+                    for record_id, metadata in zip(record_ids, metadatas)
+                    if record_id is not None and metadata is not None
+                ],
+                ignore_conflicts=True,
+            )
+        inserted_ids = [record_id for record_id in record_ids if record_id is not None]
+        if inserted_ids:
+            acquisition_datetimes = [record.acquisition_datetime for record in records]
+            link_captures_to_sites(inserted_ids, min(acquisition_datetimes), max(acquisition_datetimes))
+    return len(set(inserted_ids))
+
+
+def bulk_save_catalog_records(features, chunk_size=CATALOG_BULK_INSERT_CHUNK_SIZE):
+    """
+        Validate the features in memory and insert them chunk by chunk
+        Returns (valid, duplicate, invalid) counts
+    """
+    valid_features = 0
+    duplicate_features = 0
+    invalid_features = 0
+    seen_keys = set()
+    pending_records = []
+    pending_metadatas = []
+
+    for feature in features:
+        try:
+            serializer = CollectionCatalogSerializer(data=feature)
+            if not serializer.is_valid():
+                print(f"Error in serializer: {serializer.errors}")
+                invalid_features += 1
+                continue
+
+            record = CollectionCatalog(**serializer.validated_data)
+            record.populate_derived_fields()
+            keys = get_catalog_record_keys(record.vendor_name, record.vendor_id, record.acquisition_datetime, record.coordinates_record_md5)
+            # Same record returned twice in one batch (overlapping pages or windows)
+            if keys & seen_keys:
+                duplicate_features += 1
+                continue
+            seen_keys |= keys
+            pending_records.append(record)
+            pending_metadatas.append(feature.get("metadata"))
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            print(f"Error in bulk_save_catalog_records: {e}")
+            invalid_features += 1
+            continue
+
+        if len(pending_records) >= chunk_size:
+            inserted_features = insert_catalog_records_chunk(pending_records, pending_metadatas)
+            valid_features += inserted_features
+            duplicate_features += len(pending_records) - inserted_features
+            pending_records = []
+            pending_metadatas = []
+
+    if pending_records:
+        inserted_features = insert_catalog_records_chunk(pending_records, pending_metadatas)
+        valid_features += inserted_features
+        duplicate_features += len(pending_records) - inserted_features
+
+    return valid_features, duplicate_features, invalid_features
+
+
+def save_catalog_records_per_row(features):
+    """
+        Save the features one by one through the serializer
+        Returns (valid, duplicate, invalid) counts
+    """
+    valid_features = 0
+    duplicate_features = 0
+    invalid_features = 0
+
+    for feature in features:
+        try:
+            serializer = CollectionCatalogSerializer(data=feature)
+            if serializer.is_valid():
+                with transaction.atomic():
+                    record = serializer.save()
+                    if feature.get("metadata") is not None:
+                        CollectionCatalogMetadata.objects.create(catalog_id=record.id, metadata=feature["metadata"])
+                    link_captures_to_sites([record.id], record.acquisition_datetime, record.acquisition_datetime)
+                valid_features += 1
+            else:
+                print(f"Error in serializer: {serializer.errors}")
+                invalid_features += 1
+        except ValidationError as e:
+            if "duplicate" in e.get_codes():
+                duplicate_features += 1
+            else:
+                invalid_features += 1
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            invalid_features += 1
+    return valid_features, duplicate_features, invalid_features
+
+
+def ingest_catalog_batch(features):
+    """
+        Drop the known features of a batch and save the rest
+        Returns (valid, duplicate, invalid) counts
+    """
+    # Overlapping windows return mostly known records, drop them before any serializer work
+    new_features, known_features = filter_existing_catalog_records(features)
+
+    if CATALOG_BULK_INSERT:
+        valid_features, duplicate_features, invalid_features = bulk_save_catalog_records(new_features)
+    else:
+        valid_features, duplicate_features, invalid_features = save_catalog_records_per_row(new_features)
+    return valid_features, duplicate_features + known_features, invalid_features
+
+
+class CatalogCheckpointMark:
+    """
+        Yielded by a vendor page generator between pages
+        With a tile: every feature of that tile of the window has been yielded
+        Without a tile: every feature of the window has been yielded
+    """
+
+    def __init__(self, window_start, window_end, tile=None):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.tile = tile
+
+
+def iter_catalog_batches(pages, normalize, batch_size=CATALOG_STREAM_BATCH_SIZE):
+    """
+        Regroup raw vendor pages into batches of at least batch_size features and normalize them one batch at a time
+        normalize is the collector conversion to model params (including reverse geocoding)
+        Yields (features, checkpoint_marks), the marks only cover features of the same or earlier batches
+        A batch that normalizes to nothing loses its marks, its tiles and window are searched again next run
+    """
+    pending_features = []
+    pending_marks = []
+
+    def flush():
+        features = normalize(pending_features) if pending_features else []
+        if pending_features and not features:
+            print(f"No records out of a batch of {len(pending_features)} features, its checkpoint marks are dropped")
+            return [], []
+        return features, pending_marks
+
+    for page in pages:
+        if isinstance(page, CatalogCheckpointMark):
+            pending_marks.append(page)
+            # A finished window is checkpointed right away
+            if page.tile is None:
+                yield flush()
+                pending_features, pending_marks = [], []
+            continue
+
+        pending_features.extend(page)
+        if len(pending_features) >= batch_size:
+            yield flush()
+            pending_features, pending_marks = [], []
+    if pending_features or pending_marks:
+        yield flush()
+
+
+def get_catalog_checkpoint_windows(checkpoint):
+    """
+        Windows recorded in the vendor checkpoint cursor, oldest first:
+        [{"window_start", "window_end", "completed_tiles", "is_complete"}]
+        Open windows still have tiles to search, complete ones wait for an older open window to complete
+    """
+    cursor = checkpoint.cursor if checkpoint else None
+    if not cursor:
+        return []
+    # Cursor saved before several windows were tracked: a single open window
+    if "windows" not in cursor:
+        return [{**cursor, "is_complete": False}]
+    return sorted(cursor["windows"], key=lambda window: convert_iso_to_datetime(window["window_start"]))
+
+
+def get_completed_catalog_tiles(vendor_name, window_start, window_end):
+    """
+        Tiles of the window already committed by a previous run that stopped mid-window
+    """
+    checkpoint = CatalogIngestCheckpoint.objects.filter(vendor_name=vendor_name).first()
+    for window in get_catalog_checkpoint_windows(checkpoint):
+        if window["window_start"] == window_start and window["window_end"] == window_end:
+            return set(window.get("completed_tiles", []))
+    return set()
+
+
+def save_catalog_checkpoint_marks(vendor_name, marks):
+    """
+        Move the vendor checkpoint forward, called in the transaction of the batch the marks follow
+        The high-water mark only moves over complete windows that start at or before it, so it never
+        passes a window with tiles left to search, or a window that failed before committing any tile
+    """
+    checkpoint, _ = CatalogIngestCheckpoint.objects.select_for_update().get_or_create(vendor_name=vendor_name)
+    windows = get_catalog_checkpoint_windows(checkpoint)
+    for mark in marks:
+        window = next(
+            (
+                window for window in windows
+                if window["window_start"] == mark.window_start and window["window_end"] == mark.window_end
+            ),
+            None,
+        )
+        if window is None:
+            window = {"window_start": mark.window_start, "window_end": mark.window_end, "completed_tiles": [], "is_complete": False}
+            windows.append(window)
+
+        if mark.tile is None:
+            window["is_complete"] = True
+        elif mark.tile not in window["completed_tiles"]:
+            window["completed_tiles"].append(mark.tile)
+
+    windows = sorted(windows, key=lambda window: convert_iso_to_datetime(window["window_start"]))
+    while windows and windows[0]["is_complete"]:
+        window_start = convert_iso_to_datetime(windows[0]["window_start"])
+        if checkpoint.high_water_mark and window_start > checkpoint.high_water_mark:
+            break
+        # The last date batch of a run can end after now, only what has been searched counts
+        window_end = min(convert_iso_to_datetime(windows[0]["window_end"]), get_utc_time())
+        if not checkpoint.high_water_mark or window_end > checkpoint.high_water_mark:
+            checkpoint.high_water_mark = window_end
+        windows.pop(0)
+    checkpoint.cursor = {"windows": windows} if windows else None
+    checkpoint.save()
+
+
+def get_catalog_run_windows(vendor_name):
+    """
+        (start, end) windows of the next incremental run of a vendor
+        Open windows are resumed on the exact same bounds so their completed tiles can be skipped, the gaps
+        between the recorded windows (windows that failed before committing a tile) are searched again,
+        then the run goes on to now
+        The search starts CATALOG_CHECKPOINT_OVERLAP_MINUTES before the high-water mark, searches filter on
+        acquisition time and vendors publish captures hours after their acquisition
+        Vendors without a checkpoint start from midnight of the last history end_datetime
+    """
+    end_datetime = get_utc_time()
+    checkpoint = CatalogIngestCheckpoint.objects.filter(vendor_name=vendor_name).first()
+
+    if not checkpoint or not checkpoint.high_water_mark:
+        last_history = SatelliteDateRetrievalPipelineHistory.objects.filter(vendor_name=vendor_name).order_by("-end_datetime").first()
+        start_datetime = last_history.end_datetime if last_history else end_datetime
+        start_datetime = start_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Anchor the high-water mark so a first run that fails on its first window does not skip it
+        checkpoint, _ = CatalogIngestCheckpoint.objects.update_or_create(
+            vendor_name=vendor_name, defaults={"high_water_mark": start_datetime}
+        )
+        position = start_datetime
+    else:
+        position = checkpoint.high_water_mark - timedelta(minutes=CATALOG_CHECKPOINT_OVERLAP_MINUTES)
+
+    run_windows = []
+    for window in get_catalog_checkpoint_windows(checkpoint):
+        window_start = convert_iso_to_datetime(window["window_start"])
+        window_end = convert_iso_to_datetime(window["window_end"])
+        if window_start > position:
+            run_windows.append((position, window_start))
+        if not window["is_complete"]:
+            run_windows.append((window_start, window_end))
+        position = max(position, window_end)
+
+    if position < end_datetime:
+        run_windows.append((position, end_datetime))
+    return run_windows
+
+
 def process_database_catalog(features, start_time, end_time, vendor_name, is_bulk= False):
     """
         Process the database catalog for the given features
     """
-    print(f"Database Processing {vendor_name} catalog for {start_time} to {end_time} with {len(features)} records")
+    return process_database_catalog_stream([(features, [])], start_time, end_time, vendor_name, is_bulk)
+
+
+def process_database_catalog_stream(batches, start_time, end_time, vendor_name, is_bulk= False):
+    """
+        Process the database catalog batch by batch, each batch is in the catalog before the next one is fetched
+        batches: iterable of (model params, checkpoint marks), usually iter_catalog_batches over vendor pages
+        The vendor checkpoint moves forward in the same transaction as the batch (incremental runs only)
+    """
+    print(f"Database Processing {vendor_name} catalog for {start_time} to {end_time}")
     try:
+        total_features = 0
         valid_features = 0
+        duplicate_features = 0
         invalid_features = 0
-        valid_records = []
 
-        for feature in features:
-            try:
-                serializer = CollectionCatalogSerializer(data=feature)
-                if serializer.is_valid():
-                    serializer.save()
-                    valid_features += 1
-                    valid_records.append(serializer.data)
-                else:
-                    print(f"Error in serializer: {serializer.errors}")
-                    invalid_features += 1
-            except Exception as e:
-                invalid_features += 1
-        
-        print(f"Total records: {len(features)}, Valid records: {(valid_features)}, Invalid records: {(invalid_features)}")
+        for features, checkpoint_marks in batches:
+            with transaction.atomic():
+                batch_valid, batch_duplicate, batch_invalid = ingest_catalog_batch(features) if features else (0, 0, 0)
+                if checkpoint_marks and not is_bulk:
+                    save_catalog_checkpoint_marks(vendor_name, checkpoint_marks)
+            if not features:
+                continue
+            if batch_valid:
+                bump_catalog_generation(vendor_name)
+            total_features += len(features)
+            valid_features += batch_valid
+            duplicate_features += batch_duplicate
+            invalid_features += batch_invalid
+            print(f"{vendor_name} batch: {len(features)} records, Valid: {batch_valid}, Duplicate: {batch_duplicate}, Invalid: {batch_invalid}")
+
+        print(f"Total records: {total_features}, Valid records: {(valid_features)}, Duplicate records: {(duplicate_features)}, Invalid records: {(invalid_features)}")
 
         if is_bulk:
             return "Bulk Inserted"
@@ -92,8 +539,9 @@ def process_database_catalog(features, start_time, end_time, vendor_name, is_bul
                         "end_datetime": end_time,
                         "vendor_name": vendor_name,
                         "message": {
-                            "total_records": len(features),
+                            "total_records": total_features,
                             "valid_records": valid_features,
+                            "duplicate_records": duplicate_features,
                             "invalid_records": invalid_features,
                         },
                     }
@@ -117,30 +565,24 @@ def process_database_catalog(features, start_time, end_time, vendor_name, is_bul
                     )
                     
                 return "No records Found"
+            except SoftTimeLimitExceeded:
+                raise
             except Exception as e:
                 print(f"Error in history serializer: {e}")
                 return "Error in history serializer"
 
-
-        # sort the valid records based on acquisition datetime
-        valid_records = sorted(valid_records, key=lambda x: x["acquisition_datetime"])
-
-        try:
-            last_acquisition_datetime = valid_records[0]["acquisition_datetime"]
-            last_acquisition_datetime = datetime.strftime(
-                last_acquisition_datetime, "%Y-%m-%d %H:%M:%S%z"
-            )
-        except Exception as e:
-            last_acquisition_datetime = end_time
-
+        # end_datetime is the end of the searched range. The earliest acquisition time was meant to be stored
+        # here, but it was formatted from the serialized string and always fell back to end_time, so the
+        # value is unchanged and get_catalog_run_windows keeps resuming from the end of the last run
         history_serializer = SatelliteDateRetrievalPipelineHistorySerializer(
             data={
                 "start_datetime": convert_iso_to_datetime(start_time),
-                "end_datetime": convert_iso_to_datetime(last_acquisition_datetime),
+                "end_datetime": convert_iso_to_datetime(end_time),
                 "vendor_name": vendor_name,
                 "message": {
-                    "total_records": len(features),
+                    "total_records": total_features,
                     "valid_records": (valid_features),
+                    "duplicate_records": (duplicate_features),
                     "invalid_records": (invalid_features),
                 },
             }
@@ -149,6 +591,9 @@ def process_database_catalog(features, start_time, end_time, vendor_name, is_bul
             history_serializer.save()
         else:
             print(f"Error in history serializer: {history_serializer.errors}")
+    except SoftTimeLimitExceeded:
+        # Let the vendor task end on its time budget, the committed batches and checkpoint stay
+        raise
     except Exception as e:
         print(f"Error in process_database_catalog: {e}")
 
@@ -182,31 +627,26 @@ def get_centroid_and_region_and_location_polygon(coordinates_record):
         return {}
 
 def get_centroid_region_and_local(features):
+    """
+        Set centroid_region and centroid_local on the features that have a centroid (Polygon footprints)
+        Every feature is returned, a geocoding error only leaves the regions unset
+    """
     try:
-        base_dir = os.getcwd() 
-        states_shapefile = os.path.join(base_dir, "static", "shapesFiles", "state_provinces", "ne_10m_admin_1_states_provinces.shp")
-        marine_shapefile = os.path.join(base_dir, "static", "shapesFiles", "marine_polys", "ne_10m_geography_marine_polys.shp")
-
-        if not os.path.exists(states_shapefile) or not os.path.exists(marine_shapefile):
-            raise FileNotFoundError("Shapefiles not found.")
-
-        batch_size = 50
-        for i in range(0, len(features), batch_size):
-            try:
-                states = gpd.read_file(states_shapefile)
-                marine = gpd.read_file(marine_shapefile)
-
-                batch = features[i:i + batch_size]
-                for feature in batch:
-                    feature["centroid_region"], feature["centroid_local"] = reverse_geocode_shapefile(
-                        feature["geometryCentroid_lat"], feature["geometryCentroid_lon"], states, marine
-                    )
-            except Exception as e:
-                print(f"Error in get_centroid_region_and_local: {e}")
-                continue
-        return features
+        located_features = [
+            feature for feature in features
+            if feature.get("geometryCentroid_lat") is not None and feature.get("geometryCentroid_lon") is not None
+        ]
+        locations = reverse_geocode_points(
+            [feature["geometryCentroid_lat"] for feature in located_features],
+            [feature["geometryCentroid_lon"] for feature in located_features],
+        )
+        for feature, (region, local) in zip(located_features, locations):
+            feature["centroid_region"], feature["centroid_local"] = region, local
+    except SoftTimeLimitExceeded:
+        raise
     except Exception as e:
-        return []
+        print(f"Error in get_centroid_region_and_local: {e}")
+    return features
 
 def remove_z_from_geometry(geometry):
     """
@@ -239,6 +679,7 @@ def mark_record_as_purchased(features):
                     continue
                 record.is_purchased = True
                 record.save()
+                bump_catalog_generation(record.vendor_name)
             except Exception as e:
                 print(f"Error in mark_record_as_purchased: {e}")
     except Exception as e: